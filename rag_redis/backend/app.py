@@ -1,18 +1,36 @@
+import asyncio
+import json
 import logging
+import time
+from typing import Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from contextlib import asynccontextmanager
 
+from backend.services.redis_pool import RedisPool
 from backend.services.redis_service import RedisService
 from backend.services.memory_service import MemoryService
+from backend.services.llm_scheduler import AdmissionRejected
 from backend.services.llm_service import LLMService
 from backend.services.cache_service import CacheService
+from backend.services.answer_cache import AnswerCache
+from backend.services.single_flight import SingleFlight
 from backend.services.rag_service import RAGService
 from backend.services.document_service import DocumentService
-
-from backend.utils.utils import timer
+from backend.services.embedding_service import EmbeddingService
+from backend.services.ingestion_service import IngestionService, IngestPathError
+from backend.config import settings
+
+from backend.utils.metrics import (
+    HTTP_DURATION,
+    render_metrics,
+    request_timing_scope,
+    server_timing_header,
+)
 
 from backend.logging_config import setup_logging
 
@@ -24,35 +42,75 @@ logger = logging.getLogger(__name__)
 redis_service = None
 llm_service = None
 cache_service = None
+memory_service = None
+rag_service = None
 
+# Warm-up state
+is_ready = False
+warmup_task = None
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global redis_service, llm_service, cache_service
+
+async def warm_up():
+    global is_ready
 
     try:
+        await asyncio.to_thread(EmbeddingService().warmup, settings.warmup_batch_size)
 
-        redis_service = RedisService()
-        llm_service = LLMService()
-        cache_service = CacheService()
-        
         if redis_service.is_connected():
-            existing_docs = redis_service.similarity_search("test", top_k=1)
-            if not existing_docs:
+            if redis_service.document_count() == 0:
                 document_service = DocumentService()
                 sample_docs = document_service.get_sample_documents()
-                redis_service.add_documents(sample_docs)
+                await asyncio.to_thread(redis_service.add_documents, sample_docs)
                 logger.info("Documents Initialized")
             else:
                 logger.info("Documents already exist, skipping initialization")
 
+        try:
+            await llm_service.warmup()
+        except Exception as e:
+            # Serving can continue; the first request will load the model instead.
+            logger.error(f"Error warming up Ollama: {str(e)}")
+
+        is_ready = True
+        logger.info("Warm-up finished, service is ready")
+
+    except Exception as e:
+        logger.error(f"Error during warm-up: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global redis_service, llm_service, cache_service, memory_service, rag_service
+    global warmup_task
+
+    try:
+
+        redis_service = RedisService()
+        llm_service = LLMService()
+        cache_service = CacheService()
+        memory_service = MemoryService()
+        rag_service = RAGService()
+
+        llm_service.start_health_checks()
         logger.info("All services initialized successfully")
 
+        # The embedding model is loaded above, while RedisService is built (a
+        # new index also probes it for its dimensions), so startup waits for
+        # it. What runs in the background is the rest: the first forward pass,
+        # sample documents and the Ollama model load. /ready reports 503 until
+        # it finishes.
+        warmup_task = asyncio.create_task(warm_up())
+
     except Exception as e:
         logger.error(f"Error initializing services: {str(e)}")
 
     yield
     logger.info("Shutting down services")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if llm_service is not None:
+        await llm_service.stop_health_checks()
+    await RedisPool().aclose()
 
 
 app = FastAPI(
@@ -70,6 +128,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    start = time.perf_counter()
+    with request_timing_scope() as timings:
+        response = await call_next(request)
+        elapsed = time.perf_counter() - start
+
+        route = request.scope.get("route")
+        HTTP_DURATION.labels(
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=response.status_code,
+        ).observe(elapsed)
+
+        if settings.server_timing_enabled or request.headers.get("x-debug-timing"):
+            response.headers["Server-Timing"] = server_timing_header(
+                {**timings, "total": elapsed}
+            )
+
+    return response
+
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/")
 async def root():
     try:        
@@ -91,34 +177,178 @@ async def root():
         }
 
 
+@app.get("/ready")
+async def ready():
+    if not is_ready:
+        raise HTTPException(status_code=503, detail="Service is warming up")
+
+    return {"status": "ready"}
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "llm_scheduler": llm_service.scheduler.stats() if llm_service else None,
+        "ollama": llm_service.router.stats() if llm_service else None,
+        "answer_cache": AnswerCache().stats(),
+        "single_flight": SingleFlight().stats(),
+        "llm_cache": cache_service.get_stats() if cache_service else None,
+        "embedding_cache": EmbeddingService().get_cache_stats(),
+        "embedding_batcher": EmbeddingService().get_batcher_stats(),
+    }
+
+
+class ChatBatchItem(BaseModel):
+    question: str
+    session_id: str = "default"
+    use_memory: bool = True
+    use_vector_search: bool = True
+    source: Optional[str] = None
+    category: Optional[str] = None
+    topic: Optional[str] = None
+
+
+class ChatBatchRequest(BaseModel):
+    items: List[ChatBatchItem]
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str]
+    k: int = 10
+    source: Optional[str] = None
+    category: Optional[str] = None
+    topic: Optional[str] = None
+    ef_runtime: Optional[int] = None
+
+
+def check_batch_size(size: int) -> None:
+    if size > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {size} items exceeds the limit of {settings.batch_max_items}",
+        )
+
+
+def admission_error(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def request_deadline(timeout: Optional[float]) -> Optional[float]:
+    return time.monotonic() + timeout if timeout else None
+
+
+def metadata_filters(
+    source: Optional[str], category: Optional[str], topic: Optional[str]
+) -> Dict[str, str]:
+    filters = {"source": source, "category": category, "topic": topic}
+    return {name: value for name, value in filters.items() if value}
+
+
 @app.post("/chat")
-@timer
 async def chat(
     question: str,
     session_id: str = "default",
     use_memory: bool = True,
     use_vector_search: bool = True,
+    source: Optional[str] = None,
+    category: Optional[str] = None,
+    topic: Optional[str] = None,
+    timeout: Optional[float] = Query(default=None, gt=0),
 ):
+    """``timeout`` bounds, in seconds, how long the request may queue for the LLM."""
     try:
-        rag_service = RAGService(session_id)
-        response = rag_service.generate(
+        response = await rag_service.generate(
             question=question,
+            session_id=session_id,
             use_memory=use_memory,
             use_vector_search=use_vector_search,
+            filters=metadata_filters(source, category, topic),
+            deadline=request_deadline(timeout),
         )
 
         return {**response}
 
+    except AdmissionRejected as e:
+        raise admission_error(e)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest):
+    check_batch_size(len(request.items))
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG service not available")
+
+    items = [
+        {
+            "question": item.question,
+            "session_id": item.session_id,
+            "use_memory": item.use_memory,
+            "use_vector_search": item.use_vector_search,
+            "filters": metadata_filters(item.source, item.category, item.topic),
+        }
+        for item in request.items
+    ]
+    results = await rag_service.generate_batch(items, request.max_concurrency)
+    return {
+        "results": results,
+        "succeeded": sum(1 for result in results if result.get("success")),
+        "failed": sum(1 for result in results if not result.get("success")),
+    }
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    question: str,
+    session_id: str = "default",
+    use_memory: bool = True,
+    use_vector_search: bool = True,
+    source: Optional[str] = None,
+    category: Optional[str] = None,
+    topic: Optional[str] = None,
+    timeout: Optional[float] = Query(default=None, gt=0),
+):
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG service not available")
+
+    # Once the stream starts the status is fixed at 200, so an already full
+    # queue is rejected here; later rejections arrive as an error event.
+    try:
+        llm_service.scheduler.check()
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+    deadline = request_deadline(timeout)
+
+    async def event_stream():
+        async for event in rag_service.stream(
+            question=question,
+            session_id=session_id,
+            use_memory=use_memory,
+            use_vector_search=use_vector_search,
+            filters=metadata_filters(source, category, topic),
+            deadline=deadline,
+        ):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/clear-memory/{session_id}")
 async def clear_memory(session_id: str):
     try:
-        memory_service = MemoryService(session_id)
-        memory_service.clear_memory()
+        await memory_service.clear_memory(session_id)
         return {"message": f"Memory cleared for session: {session_id}"}
 
     except Exception as e:
@@ -130,6 +360,7 @@ async def clear_memory(session_id: str):
 async def clear_cache():
     try:
         cache_service.clear_cache()
+        await AnswerCache().clear()
         return {"message": "Cache cleared successfully"}
 
     except Exception as e:
@@ -138,15 +369,39 @@ async def clear_cache():
 
 
 @app.get("/search")
-async def search_documents(query: str, k: int = 10):
+async def search_documents(
+    query: str,
+    k: int = 10,
+    source: Optional[str] = None,
+    category: Optional[str] = None,
+    topic: Optional[str] = None,
+    hybrid: bool = False,
+    ef_runtime: Optional[int] = None,
+):
     try:
         if not redis_service:
             raise HTTPException(status_code=503, detail="Redis service not available")
 
-        results = redis_service.similarity_search_with_score(query, top_k=k)
+        filters = metadata_filters(source, category, topic)
+        # Identical searches in flight together share one embedding and query.
+        single_flight = SingleFlight()
+        results, _ = await single_flight.do(
+            single_flight.make_key(
+                "search",
+                AnswerCache.normalize_question(query),
+                k,
+                filters,
+                hybrid,
+                ef_runtime,
+            ),
+            lambda: redis_service.asimilarity_search_with_score(
+                query, top_k=k, filters=filters, hybrid=hybrid, ef_runtime=ef_runtime
+            ),
+        )
 
         return {
             "query": query,
+            "filters": filters,
             "results": [
                 {"content": doc.page_content, "metadata": doc.metadata, "score": score}
                 for doc, score in results
@@ -157,6 +412,68 @@ async def search_documents(query: str, k: int = 10):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/search/batch")
+async def search_batch(request: SearchBatchRequest):
+    check_batch_size(len(request.queries))
+    if not redis_service:
+        raise HTTPException(status_code=503, detail="Redis service not available")
+
+    try:
+        filters = metadata_filters(request.source, request.category, request.topic)
+        items = await redis_service.abatch_similarity_search_with_score(
+            request.queries, top_k=request.k, filters=filters, ef_runtime=request.ef_runtime
+        )
+
+        return {
+            "filters": filters,
+            "results": [
+                {
+                    "query": query,
+                    **(
+                        {
+                            "results": [
+                                {
+                                    "content": doc.page_content,
+                                    "metadata": doc.metadata,
+                                    "score": score,
+                                }
+                                for doc, score in item["results"]
+                            ]
+                        }
+                        if "results" in item
+                        else {"error": item["error"]}
+                    ),
+                }
+                for query, item in zip(request.queries, items)
+            ],
+        }
+    except Exception as e:
+        logger.error(f"Error in batch search: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/documents/ingest")
+async def ingest_documents(
+    paths: List[str] = Body(..., embed=True),
+    batch_size: Optional[int] = None,
+):
+    try:
+        if not redis_service:
+            raise HTTPException(status_code=503, detail="Redis service not available")
+
+        ingestion_service = IngestionService()
+        return await asyncio.to_thread(
+            ingestion_service.ingest, paths, batch_size=batch_size
+        )
+    except HTTPException:
+        raise
+    except IngestPathError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error ingesting documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
 
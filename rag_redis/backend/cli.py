@@ -0,0 +1,78 @@
+import argparse
+import json
+import logging
+
+from backend.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def ingest(args: argparse.Namespace) -> None:
+    from backend.services.ingestion_service import IngestionService
+
+    ingestion_service = IngestionService()
+    if args.workers:
+        ingestion_service.workers = args.workers
+
+    metadata = json.loads(args.metadata) if args.metadata else None
+    stats = ingestion_service.ingest(
+        args.paths,
+        batch_size=args.batch_size,
+        metadata=metadata,
+    )
+    print(json.dumps(stats, indent=2))
+
+
+def reindex(args: argparse.Namespace) -> None:
+    from backend.services.index_service import IndexService
+
+    stats = IndexService().reindex(
+        algorithm=args.algorithm,
+        distance_metric=args.distance_metric,
+        datatype=args.dtype,
+        m=args.m,
+        ef_construction=args.ef_construction,
+        ef_runtime=args.ef_runtime,
+        epsilon=args.epsilon,
+        batch_size=args.batch_size,
+        drop_old=args.drop_old,
+    )
+    print(json.dumps(stats, indent=2))
+
+
+def main() -> None:
+    setup_logging()
+
+    parser = argparse.ArgumentParser(prog="python -m backend.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Bulk ingest text files")
+    ingest_parser.add_argument("paths", nargs="+", help="Files or directories")
+    ingest_parser.add_argument("--batch-size", type=int)
+    ingest_parser.add_argument("--workers", type=int)
+    ingest_parser.add_argument("--metadata", help="JSON metadata applied to every file")
+    ingest_parser.set_defaults(func=ingest)
+
+    reindex_parser = subparsers.add_parser(
+        "reindex",
+        help="Rebuild the vector index with new parameters and swap the alias to it",
+    )
+    reindex_parser.add_argument("--algorithm", choices=["HNSW", "FLAT"], type=str.upper)
+    reindex_parser.add_argument("--distance-metric", choices=["COSINE", "IP", "L2"], type=str.upper)
+    reindex_parser.add_argument("--dtype", choices=["FLOAT32", "FLOAT16"], type=str.upper)
+    reindex_parser.add_argument("--m", type=int)
+    reindex_parser.add_argument("--ef-construction", type=int)
+    reindex_parser.add_argument("--ef-runtime", type=int)
+    reindex_parser.add_argument("--epsilon", type=float)
+    reindex_parser.add_argument("--batch-size", type=int, default=500)
+    reindex_parser.add_argument(
+        "--drop-old", action="store_true", help="Delete the previous index and its keys"
+    )
+    reindex_parser.set_defaults(func=reindex)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -6,20 +8,77 @@ class Settings(BaseSettings):
     redis_url: str = "redis://localhost:6379"
     redis_cache_ttl: int = 3600  # 1 hour
     redis_distance_threshold: float = 0.2
+    exact_cache_ttl: int = 3600  # 1 hour
+    exact_cache_size: int = 5000  # in-process LRU entries
+    answer_cache_enabled: bool = True
+    answer_cache_ttl: int = 3600  # 1 hour
+    answer_cache_prefix: str = "answer_cache:"
+    redis_max_connections: int = 50
+    redis_pool_timeout: int = 5  # seconds to wait for a free pooled connection
 
     # Ollama Configuration
     ollama_base_url: str = "http://localhost:11434"
     # ollama_model: str = "gpt-oss:20b"
     ollama_model: str = "llama2"
+    ollama_keep_alive: str = "30m"  # keep the model resident between requests
+    ollama_base_urls: str = ""  # comma separated; replaces ollama_base_url when set
+    ollama_health_interval: float = 10.0  # seconds between /api/tags probes
+    ollama_health_timeout: float = 2.0
+    ollama_failure_threshold: int = 2  # consecutive failures before leaving rotation
+    ollama_hedge_enabled: bool = False
+    ollama_hedge_percentile: float = 95.0  # hedge once TTFT exceeds this percentile
+    ollama_hedge_min_samples: int = 20  # TTFT samples needed before hedging starts
+
+    # LLM Admission Configuration
+    llm_max_concurrency: int = 4  # per backend; match OLLAMA_NUM_PARALLEL
+    llm_max_queue: int = 64  # waiting generations before rejecting with 429
+    llm_queue_timeout: float = 30.0  # default seconds a request may wait for a slot
+    llm_batch_queue_timeout: float = 300.0  # same, for /chat/batch items
 
     # Vector Store Configuration
     index_name: str = "documents"
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
-    indexing: str = "HNSW"
+    indexing: str = "HNSW"  # "HNSW" or "FLAT"
+    distance_metric: str = "COSINE"  # COSINE, IP or L2
+    vector_datatype: str = "FLOAT32"  # FLOAT32 or FLOAT16
+    embedding_dimensions: Optional[int] = None  # probed from the model when unset
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 200
+    hnsw_ef_runtime: int = 10
+    hnsw_epsilon: float = 0.01
+    index_refresh_interval: float = 5.0  # seconds between checks of the alias target
+
+    # Embedding Backend Configuration
+    embedding_backend: str = "torch"  # "torch" or "onnx"
+    embedding_onnx_quantize: bool = False
+    embedding_onnx_quantization: str = "avx2"  # arm64, avx2, avx512, avx512_vnni
+
+    # Embedding Cache Configuration
+    embedding_cache_enabled: bool = True
+    embedding_cache_size: int = 10000  # in-process LRU entries
+    embedding_cache_ttl: int = 86400  # 1 day
+
+    # Embedding Micro-batching Configuration
+    embedding_batching_enabled: bool = True
+    embedding_batch_max_size: int = 32
+    embedding_batch_window_ms: float = 5.0
 
     # Memory Configuration
     memory_key: str = "chat_history"
+    memory_key_prefix: str = "chat_history:"
     memory_ttl: int = 1800  # 30 minutes
+    memory_mode: str = "bounded"  # "bounded" or "full"
+    memory_max_turns: int = 6  # turns kept verbatim in bounded mode
+    memory_summary_batch_turns: int = 4  # older turns folded per summary update
+    memory_max_tokens: int = 1024  # cap on summary + verbatim history
+    memory_summary_max_tokens: int = 256  # cap on the rolling summary, at most half of the above
+    memory_summary_timeout: float = 120.0  # cap on one summary generation, after its queue wait
+    memory_max_messages: int = 200  # ring-buffer cap per session list, 0 for none
+    memory_serializer: str = "msgpack"  # "msgpack" or "json"; reads accept both
+    memory_compress_min_bytes: int = 1024  # zlib messages larger than this, 0 to disable
+    # Sessions written by RedisChatMessageHistory before the list layout are read
+    # and moved over on first access; safe to turn off once memory_ttl has passed.
+    memory_legacy_fallback: bool = True
 
     # Performance Configuration
     max_tokens: int = 1000
@@ -29,6 +88,39 @@ class Settings(BaseSettings):
     chunk_size: int = 1000
     chunk_overlap: int = 200
 
+    # Retrieval
+    retrieval_strategy: str = "similarity"  # "similarity" or "mmr"
+    retrieval_top_k: int = 10
+    retrieval_fetch_k: int = 20  # candidates considered by MMR
+    retrieval_score_threshold: Optional[float] = 0.7  # max cosine distance, None disables
+    retrieval_mmr_lambda: float = 0.5  # 1.0 = pure relevance, 0.0 = pure diversity
+    retrieval_max_context_tokens: int = 1500  # 0 disables the budget
+    retrieval_hybrid: bool = False  # fuse BM25 full-text results with KNN
+    retrieval_rrf_k: int = 60  # reciprocal rank fusion constant
+
+    # Ingestion Configuration
+    ingest_batch_size: int = 64
+    ingest_workers: int = 4
+    ingest_root: str = "data"  # only files under this directory can be ingested
+
+    # Batch Endpoint Configuration
+    batch_max_items: int = 1000
+    batch_max_concurrency: int = 4  # concurrent LLM calls per /chat/batch request
+
+    # Single-flight Configuration
+    single_flight_enabled: bool = True  # coalesce identical in-flight requests
+    single_flight_distributed: bool = False  # also coalesce across workers via Redis
+    single_flight_lock_prefix: str = "single_flight:"
+    single_flight_lock_ttl_ms: int = 30000  # lock expiry if its holder dies
+    single_flight_wait_timeout: float = 30.0  # seconds to wait on another worker
+    single_flight_poll_ms: int = 50
+
+    # Metrics Configuration
+    server_timing_enabled: bool = False  # always send the Server-Timing header
+
+    # Warm-up Configuration
+    warmup_batch_size: int = 8
+
     # Models Folder
     cache_folder: str = "models"
 
@@ -38,11 +38,23 @@ def setup_logging():
         "backend.app",
         "backend.services.docker_service",
         "backend.services.redis_service",
+        "backend.services.index_service",
+        "backend.services.redis_pool",
         "backend.services.memory_service",
         "backend.services.llm_service",
+        "backend.services.llm_scheduler",
+        "backend.services.ollama_router",
         "backend.services.rag_service",
+        "backend.services.retrieval_service",
         "backend.services.cache_service",
+        "backend.services.answer_cache",
+        "backend.services.single_flight",
         "backend.services.document_service",
+        "backend.services.embedding_service",
+        "backend.services.embedding_batcher",
+        "backend.services.ingestion_service",
+        "backend.cli",
+        "backend.utils.metrics",
     ]
 
     for logger_name in loggers_to_configure:
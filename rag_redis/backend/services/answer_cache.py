@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain.schema import Document
+
+from backend.services.redis_pool import RedisPool
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Questions that lean on earlier turns. Their answer depends on history, so it
+# joins the key; everything else shares answers across sessions. A pronoun alone
+# is not enough ("how does it work" is a follow-up, "what is a vector database
+# and how does it work" is not), so pronouns only count at the start of the
+# question or in a short question with no noun phrase of its own.
+CONTINUATION_PATTERN = re.compile(
+    r"^(and|also|but|so|then|what about|how about|why not|same|more|elaborate|"
+    r"continue|tell me more)\b"
+    r"|^explain (that|this|it)( again| further| more| better)?$"
+)
+REFERENCE_PATTERN = re.compile(
+    r"\b(you (said|say|mentioned)|(your|the) (last|previous) answer|"
+    r"(mentioned|said) (earlier|above|before))\b"
+)
+LEADING_PRONOUN_PATTERN = re.compile(r"^(it|its|they|them|their|he|she|this|that|these|those)\b")
+PRONOUN_PATTERN = re.compile(
+    r"\b(it|its|they|them|their|he|she|him|her)\b"
+    # Demonstratives only when they stand for something ("why is that", "what
+    # does this mean"), not as determiners ("this error").
+    r"|\b(that|this|these|those)\b(?=$|\s+(is|was|are|were|does|do|did|mean|means|"
+    r"work|works|one|ones|part|case)\b)"
+)
+# Questions about the user or the conversation itself ("what is my name", "what
+# did I ask before") can only be answered from this session's history, however
+# they are phrased, so any first-person or conversation cue keys on history.
+PERSONAL_PATTERN = re.compile(
+    r"\b(i|i'm|i've|i'd|me|my|mine|myself|we|we're|us|our|ours)\b"
+    r"|\b(earlier|before|previously|so far|last time|remind me|(our|this|the) "
+    r"(conversation|chat|discussion))\b"
+)
+SHORT_QUESTION_WORDS = 8
+
+
+class AnswerCache:
+    """RAG-level answer cache keyed on what the answer actually depends on.
+
+    The key is the normalized question plus a fingerprint of the retrieved chunk
+    ids, rather than the rendered prompt, so sessions with different histories can
+    share an answer. History only joins the key when the question looks like a
+    follow-up or refers to the user or the conversation.
+    """
+
+    _instance: Optional["AnswerCache"] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(AnswerCache, cls).__new__(cls)
+            instance.enabled = settings.answer_cache_enabled
+            instance.ttl = settings.answer_cache_ttl
+            instance.key_prefix = settings.answer_cache_prefix
+            instance.redis_client = RedisPool().async_client
+            instance._lock = threading.Lock()
+            instance._stats = {"hits": 0, "misses": 0, "history_keyed": 0}
+            cls._instance = instance
+            logger.info("AnswerCache initialized")
+
+        return cls._instance
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        normalized = " ".join(question.lower().split())
+        return normalized.rstrip("?!. ")
+
+    @staticmethod
+    def is_follow_up(question: str) -> bool:
+        normalized = AnswerCache.normalize_question(question)
+        if CONTINUATION_PATTERN.search(normalized) or REFERENCE_PATTERN.search(normalized):
+            return True
+        if PERSONAL_PATTERN.search(normalized):
+            return True
+        if LEADING_PRONOUN_PATTERN.search(normalized):
+            return True
+        return (
+            len(normalized.split()) <= SHORT_QUESTION_WORDS
+            and PRONOUN_PATTERN.search(normalized) is not None
+        )
+
+    @staticmethod
+    def context_fingerprint(documents: List[Document]) -> str:
+        # Chunk ids are content addressed; documents loaded before they existed
+        # fall back to a hash of their text.
+        ids = sorted(
+            doc.metadata.get("chunk_id")
+            or hashlib.sha256(doc.page_content.encode()).hexdigest()[:32]
+            for doc in documents
+        )
+        return hashlib.sha256("|".join(ids).encode()).hexdigest()
+
+    def make_key(
+        self,
+        question: str,
+        documents: List[Document],
+        chat_history: str = "",
+        model: str = "",
+        variant: str = "",
+    ) -> str:
+        parts = [
+            model,
+            variant,
+            self.normalize_question(question),
+            self.context_fingerprint(documents),
+        ]
+        if chat_history and self.is_follow_up(question):
+            parts.append(hashlib.sha256(chat_history.encode()).hexdigest())
+            with self._lock:
+                self._stats["history_keyed"] += 1
+
+        digest = hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+        return f"{self.key_prefix}{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        try:
+            value = await self.redis_client.get(key)
+        except Exception as e:
+            logger.error(f"Error reading answer cache: {str(e)}")
+            value = None
+
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+
+        if value is None:
+            return None
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def peek(self, key: str) -> Optional[str]:
+        """Read without counting a hit or miss, for callers polling a key."""
+        if not self.enabled:
+            return None
+
+        try:
+            value = await self.redis_client.get(key)
+        except Exception as e:
+            logger.error(f"Error reading answer cache: {str(e)}")
+            return None
+
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, answer: str) -> None:
+        if not self.enabled or not answer:
+            return
+
+        try:
+            await self.redis_client.set(key, answer, ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing answer cache: {str(e)}")
+
+    async def clear(self) -> int:
+        deleted = 0
+        batch = []
+        async for key in self.redis_client.scan_iter(
+            match=f"{self.key_prefix}*", count=1000
+        ):
+            batch.append(key)
+            if len(batch) >= 1000:
+                deleted += await self.redis_client.delete(*batch)
+                batch = []
+        if batch:
+            deleted += await self.redis_client.delete(*batch)
+
+        logger.info(f"Cleared {deleted} cached answers")
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -1,14 +1,214 @@
+import hashlib
+import json
 import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
 
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
 from langchain_redis.cache import RedisSemanticCache
 from langchain.globals import set_llm_cache
 
 from backend.services.embedding_service import EmbeddingService
+from backend.services.redis_pool import RedisPool
 from backend.config import settings
+from backend.utils.metrics import stage
 
 logger = logging.getLogger(__name__)
 
 
+class TieredLLMCache(BaseCache):
+    """Exact-match tier (in-process LRU, then Redis) in front of a semantic cache.
+
+    The exact tier is keyed by a hash of the whitespace-normalized prompt and the
+    llm_string LangChain builds from the model's parameters (model, temperature,
+    num_predict, ...), so a hit never touches the embedding model.
+    """
+
+    def __init__(
+        self,
+        semantic_cache: Optional[BaseCache],
+        max_size: int,
+        exact_ttl: int,
+        key_prefix: str = "llmcache:exact",
+    ):
+        self.semantic_cache = semantic_cache
+        self.max_size = max_size
+        self.exact_ttl = exact_ttl
+        self.key_prefix = key_prefix
+
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "exact_memory_hits": 0,
+            "exact_redis_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+        }
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        normalized = " ".join(prompt.split())
+        digest = hashlib.sha256(f"{normalized}\x00{llm_string}".encode()).hexdigest()
+        return f"{self.key_prefix}:{digest}"
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _lru_get(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return value
+
+    def _lru_put(self, key: str, value: RETURN_VAL_TYPE) -> None:
+        with self._lock:
+            self._lru[key] = (time.monotonic() + self.exact_ttl, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def _serialize(self, value: RETURN_VAL_TYPE) -> str:
+        return json.dumps([dumps(generation) for generation in value])
+
+    def _deserialize(self, raw: bytes) -> RETURN_VAL_TYPE:
+        return [loads(generation) for generation in json.loads(raw)]
+
+    def _exact_lookup(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self._lru_get(key)
+        if value is not None:
+            self._count("exact_memory_hits")
+            return value
+
+        try:
+            raw = RedisPool().client.get(key)
+            if raw:
+                value = self._deserialize(raw)
+                self._lru_put(key, value)
+                self._count("exact_redis_hits")
+                return value
+        except Exception as e:
+            logger.warning(f"Exact cache read failed: {str(e)}")
+        return None
+
+    async def _aexact_lookup(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self._lru_get(key)
+        if value is not None:
+            self._count("exact_memory_hits")
+            return value
+
+        try:
+            raw = await RedisPool().async_client.get(key)
+            if raw:
+                value = self._deserialize(raw)
+                self._lru_put(key, value)
+                self._count("exact_redis_hits")
+                return value
+        except Exception as e:
+            logger.warning(f"Exact cache read failed: {str(e)}")
+        return None
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        with stage("llm_cache_exact"):
+            value = self._exact_lookup(key)
+        if value is not None:
+            return value
+
+        if self.semantic_cache is not None:
+            with stage("llm_cache_semantic"):
+                value = self.semantic_cache.lookup(prompt, llm_string)
+            if value is not None:
+                self._lru_put(key, value)
+                self._count("semantic_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        with stage("llm_cache_exact"):
+            value = await self._aexact_lookup(key)
+        if value is not None:
+            return value
+
+        if self.semantic_cache is not None:
+            with stage("llm_cache_semantic"):
+                value = await self.semantic_cache.alookup(prompt, llm_string)
+            if value is not None:
+                self._lru_put(key, value)
+                self._count("semantic_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        self._lru_put(key, return_val)
+        try:
+            RedisPool().client.set(key, self._serialize(return_val), ex=self.exact_ttl)
+        except Exception as e:
+            logger.warning(f"Exact cache write failed: {str(e)}")
+
+        if self.semantic_cache is not None:
+            self.semantic_cache.update(prompt, llm_string, return_val)
+
+    async def aupdate(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ) -> None:
+        key = self._key(prompt, llm_string)
+        self._lru_put(key, return_val)
+        try:
+            await RedisPool().async_client.set(
+                key, self._serialize(return_val), ex=self.exact_ttl
+            )
+        except Exception as e:
+            logger.warning(f"Exact cache write failed: {str(e)}")
+
+        if self.semantic_cache is not None:
+            await self.semantic_cache.aupdate(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._lru.clear()
+
+        client = RedisPool().client
+        keys = list(client.scan_iter(match=f"{self.key_prefix}:*", count=1000))
+        for start in range(0, len(keys), 1000):
+            client.delete(*keys[start : start + 1000])
+
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._lru)
+
+        lookups = sum(
+            stats[k]
+            for k in ("exact_memory_hits", "exact_redis_hits", "semantic_hits", "misses")
+        )
+        if lookups:
+            stats["exact_hit_rate"] = round(
+                (stats["exact_memory_hits"] + stats["exact_redis_hits"]) / lookups, 4
+            )
+            stats["semantic_hit_rate"] = round(stats["semantic_hits"] / lookups, 4)
+        else:
+            stats["exact_hit_rate"] = stats["semantic_hit_rate"] = 0.0
+        return stats
+
+
 class CacheService:
     def __init__(self):
         self.redis_url = settings.redis_url
@@ -19,21 +219,30 @@ class CacheService:
         self.embeddings = embedding_service.embeddings
 
         self.semantic_cache = RedisSemanticCache(
-            redis_url=self.redis_url,
+            redis_client=RedisPool().client,
             embeddings=self.embeddings,
             distance_threshold=self.distance_threshold,
             ttl=self.ttl
         )
 
-        set_llm_cache(self.semantic_cache)
-        logger.info("Semantic cache initialized")
+        self.llm_cache = TieredLLMCache(
+            semantic_cache=self.semantic_cache,
+            max_size=settings.exact_cache_size,
+            exact_ttl=settings.exact_cache_ttl,
+        )
+
+        set_llm_cache(self.llm_cache)
+        logger.info("Exact and semantic LLM caches initialized")
 
     def clear_cache(self):
         try:
-            self.semantic_cache.clear()
-            logger.info("Semantic cache cleared")
+            self.llm_cache.clear()
+            logger.info("LLM caches cleared")
             return True
 
         except Exception as e:
             logger.error(f"Error clearing cache: {str(e)}")
             return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.llm_cache.stats()
@@ -1,4 +1,5 @@
 from typing import List, Dict, Any
+import hashlib
 import logging
 
 from langchain.schema import Document
@@ -31,13 +32,15 @@ class DocumentService:
             for i, (text, metadata) in enumerate(zip(texts, metadatas)):
                 chunks = self.text_splitter.split_text(text)
 
+                source = metadata.get("source", f"text+{i}")
                 for j, chunk in enumerate(chunks):
                     doc = Document(
                         page_content=chunk,
                         metadata={
                             **metadata,
-                            "chunk_id": f"{i}_{j}",
-                            "source": metadata.get("source", f"text+{i}"),
+                            "chunk_id": self.chunk_id(source, chunk),
+                            "chunk_index": j,
+                            "source": source,
                         },
                     )
                     documents.append(doc)
@@ -48,6 +51,13 @@ class DocumentService:
             logger.error(f"Error creating documents: {str(e)}")
             return []
 
+    @staticmethod
+    def chunk_id(source: str, chunk: str) -> str:
+        # Content addressed: the same text from the same source always maps to
+        # the same id, so unchanged chunks are recognised on re-ingestion.
+        normalized = " ".join(chunk.split())
+        return hashlib.sha256(f"{source}\x00{normalized}".encode()).hexdigest()[:32]
+
     def get_sample_documents(self) -> List[Document]:
         """Get sample documents for testing"""
         sample_texts = [
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingEmbeddings(Embeddings):
+    """Coalesces concurrent single-text encodes into one batched forward pass.
+
+    Callers enqueue texts and wait on a future; a worker thread collects up to
+    ``max_batch_size`` texts or waits at most ``max_wait_ms`` after the first
+    one, then runs a single ``embed_documents`` call and resolves every future.
+    """
+
+    def __init__(self, underlying: Embeddings, max_batch_size: int, max_wait_ms: float):
+        self.underlying = underlying
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "items": 0, "max_batch": 0}
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._worker.start()
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        # Drop requests whose caller already gave up.
+        return [(text, f) for text, f in batch if f.set_running_or_notify_cancel()]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            try:
+                vectors = self.underlying.embed_documents([text for text, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched embedding failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["items"] += len(batch)
+                self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Calls that already fill a batch gain nothing from waiting in the queue.
+        if len(texts) >= self.max_batch_size:
+            return self.underlying.embed_documents(texts)
+
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) >= self.max_batch_size:
+            return await asyncio.to_thread(self.underlying.embed_documents, texts)
+
+        return list(
+            await asyncio.gather(
+                *(asyncio.wrap_future(self.submit(text)) for text in texts)
+            )
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch"] = (
+            round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        )
+        return stats
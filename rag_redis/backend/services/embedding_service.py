@@ -1,15 +1,189 @@
+import hashlib
 import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
 
+import numpy as np
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 
+from backend.services.embedding_batcher import BatchingEmbeddings
+from backend.services.redis_pool import RedisPool
 from backend.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Vectors computed during the current request, keyed by text digest. The dict is
+# shared by reference with the executor threads LangChain copies the context to.
+_request_vectors: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "request_vectors", default=None
+)
+
+
+@contextmanager
+def query_vector_scope() -> Iterator[None]:
+    """Embed each distinct text at most once for the duration of a request.
+
+    A nested scope shares the outer one, so vectors a batch request embeds up
+    front are reused by the per-item work it fans out.
+    """
+    if _request_vectors.get() is not None:
+        yield
+        return
+
+    token = _request_vectors.set({})
+    try:
+        yield
+    finally:
+        _request_vectors.reset(token)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an in-process LRU backed by a Redis vector store."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        max_size: int,
+        ttl: int,
+        key_prefix: str = "emb",
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"request_hits": 0, "memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def _digest(self, text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _redis_key(self, digest: str) -> str:
+        return f"{self.key_prefix}:{self.model_name}:{digest}"
+
+    def _lru_get(self, digest: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(digest)
+            if vector is None:
+                return None
+            self._lru.move_to_end(digest)
+        return vector.tolist()
+
+    def _lru_put(self, digest: str, vector: List[float]) -> None:
+        with self._lock:
+            # float32 arrays take a quarter of the memory of Python float lists.
+            self._lru[digest] = np.asarray(vector, dtype=np.float32)
+            self._lru.move_to_end(digest)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def _redis_get_many(self, digests: List[str]) -> List[Optional[List[float]]]:
+        try:
+            client = RedisPool().client
+            values = client.mget([self._redis_key(d) for d in digests])
+            return [
+                np.frombuffer(value, dtype=np.float32).tolist() if value else None
+                for value in values
+            ]
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {str(e)}")
+            return [None] * len(digests)
+
+    def _redis_set_many(self, items: Dict[str, List[float]]) -> None:
+        try:
+            pipe = RedisPool().client.pipeline(transaction=False)
+            for digest, vector in items.items():
+                # float32 halves the footprint of the float64 lists Python produces.
+                blob = np.asarray(vector, dtype=np.float32).tobytes()
+                pipe.set(self._redis_key(digest), blob, ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests = [self._digest(text) for text in texts]
+        scope = _request_vectors.get()
+
+        vectors: List[Optional[List[float]]] = [
+            scope.get(d) if scope is not None else None for d in digests
+        ]
+        request_hits = sum(v is not None for v in vectors)
+
+        memory_hits = 0
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                vectors[i] = self._lru_get(digests[i])
+                memory_hits += vectors[i] is not None
+
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        redis_hits = 0
+        if missing:
+            cached = self._redis_get_many([digests[i] for i in missing])
+            for i, vector in zip(missing, cached):
+                if vector is not None:
+                    vectors[i] = vector
+                    self._lru_put(digests[i], vector)
+                    redis_hits += 1
+
+        # Encode each distinct uncached text once, even if repeated in the batch.
+        to_encode: Dict[str, str] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                to_encode.setdefault(digests[i], texts[i])
+
+        if to_encode:
+            encoded = dict(
+                zip(
+                    to_encode.keys(),
+                    self.underlying.embed_documents(list(to_encode.values())),
+                )
+            )
+            for digest, vector in encoded.items():
+                self._lru_put(digest, vector)
+            self._redis_set_many(encoded)
+
+            for i, vector in enumerate(vectors):
+                if vector is None:
+                    vectors[i] = encoded[digests[i]]
+
+        if scope is not None:
+            scope.update(zip(digests, vectors))
+
+        with self._lock:
+            self._stats["request_hits"] += request_hits
+            self._stats["memory_hits"] += memory_hits
+            self._stats["redis_hits"] += redis_hits
+            self._stats["misses"] += len(texts) - request_hits - memory_hits - redis_hits
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._lru)
+
+        hits = stats["request_hits"] + stats["memory_hits"] + stats["redis_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
 
 class EmbeddingService:
     _instance = None
     _embeddings = None
+    _model = None
+    _batcher = None
 
     model_name = None
     cache_folder = None
@@ -22,21 +196,138 @@ class EmbeddingService:
 
         return cls._instance
 
+    def _export_quantized_onnx(self, quantization: str) -> tuple:
+        from sentence_transformers import (
+            SentenceTransformer,
+            export_dynamic_quantized_onnx_model,
+        )
+
+        export_dir = os.path.join(
+            self.cache_folder, "onnx", self.model_name.replace("/", "--")
+        )
+        file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            logger.info(f"Exporting int8 ONNX model ({quantization}) to {export_dir}")
+            model = SentenceTransformer(
+                self.model_name, backend="onnx", cache_folder=self.cache_folder
+            )
+            model.save_pretrained(export_dir)
+            export_dynamic_quantized_onnx_model(model, quantization, export_dir)
+
+        return export_dir, file_name
+
+    def create_model(
+        self, backend: Optional[str] = None, quantize: Optional[bool] = None
+    ) -> HuggingFaceEmbeddings:
+        backend = backend or settings.embedding_backend
+        quantize = settings.embedding_onnx_quantize if quantize is None else quantize
+
+        if backend == "torch":
+            return HuggingFaceEmbeddings(
+                model_name=self.model_name,
+                cache_folder=self.cache_folder,
+            )
+
+        if backend != "onnx":
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+
+        # sentence-transformers exports the model to ONNX on first load and runs
+        # it through onnxruntime, behind the same HuggingFaceEmbeddings interface.
+        model_name = self.model_name
+        model_kwargs = {"backend": "onnx"}
+        if quantize:
+            model_name, file_name = self._export_quantized_onnx(
+                settings.embedding_onnx_quantization
+            )
+            model_kwargs["model_kwargs"] = {"file_name": file_name}
+
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            cache_folder=self.cache_folder,
+            model_kwargs=model_kwargs,
+        )
+
+    def cache_namespace(
+        self, backend: Optional[str] = None, quantize: Optional[bool] = None
+    ) -> str:
+        """Model name the embedding cache is keyed on. Backends and quantization
+        levels produce slightly different vectors, so each gets its own entries."""
+        backend = backend or settings.embedding_backend
+        quantize = settings.embedding_onnx_quantize if quantize is None else quantize
+        precision = (
+            f"qint8_{settings.embedding_onnx_quantization}"
+            if backend == "onnx" and quantize
+            else "fp32"
+        )
+        return f"{self.model_name}:{backend}:{precision}"
+
     @property
     def embeddings(self):
         if self._embeddings is None:
-            logger.info("Initializing shared embedding model...")
-            self._embeddings = HuggingFaceEmbeddings(
-                model_name=self.model_name,
-                cache_folder=self.cache_folder,
+            logger.info(
+                f"Initializing shared embedding model ({settings.embedding_backend} backend)..."
             )
+            embeddings = self.create_model()
+            self._model = embeddings
+
+            if settings.embedding_batching_enabled:
+                self._batcher = BatchingEmbeddings(
+                    embeddings,
+                    max_batch_size=settings.embedding_batch_max_size,
+                    max_wait_ms=settings.embedding_batch_window_ms,
+                )
+                embeddings = self._batcher
+
+            if settings.embedding_cache_enabled:
+                embeddings = CachedEmbeddings(
+                    embeddings,
+                    model_name=self.cache_namespace(),
+                    max_size=settings.embedding_cache_size,
+                    ttl=settings.embedding_cache_ttl,
+                )
+
+            self._embeddings = embeddings
             logger.info("Embedding model Initialized")
 
         return self._embeddings
 
+    @property
+    def uncached_embeddings(self):
+        """The shared model behind the batcher but not the cache. Bulk ingestion
+        encodes each chunk once, so caching its vectors would only evict the
+        query vectors the cache exists for."""
+        if self._model is None:
+            self.embeddings
+        return self._batcher if self._batcher is not None else self._model
+
+    def warmup(self, batch_size: int = 8) -> None:
+        # Encode through the raw model so the cache layers cannot short-circuit
+        # the forward pass that allocates the model's runtime buffers.
+        if self._model is None:
+            self.embeddings
+        self._model.embed_documents(
+            [f"warm-up sentence number {i}" for i in range(batch_size)]
+        )
+        logger.info(f"Embedding model warmed up with a batch of {batch_size}")
+
+    def get_cache_stats(self) -> Optional[Dict[str, int]]:
+        if isinstance(self._embeddings, CachedEmbeddings):
+            return self._embeddings.stats()
+        return None
+
+    def get_batcher_stats(self) -> Optional[Dict[str, float]]:
+        if self._batcher is not None:
+            return self._batcher.stats()
+        return None
+
     def get_model_info(self):
         return {
             "model_name": self.model_name,
             "cache_folder": self.cache_folder,
+            "backend": settings.embedding_backend,
+            "quantized": settings.embedding_onnx_quantize,
             "is_initialized": self._embeddings is not None,
+            "cache": self.get_cache_stats(),
+            "batcher": self.get_batcher_stats(),
         }
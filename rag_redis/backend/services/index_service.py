@@ -0,0 +1,274 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from redis.exceptions import ResponseError
+from redisvl.index import SearchIndex
+from redisvl.schema import IndexSchema
+
+from backend.services.redis_pool import RedisPool
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields indexed next to the vector so KNN queries can be pre-filtered
+# inside Redis, e.g. (@category:{ai})=>[KNN 10 @embedding $vector].
+METADATA_SCHEMA = [
+    {"name": "source", "type": "tag"},
+    {"name": "category", "type": "tag"},
+    {"name": "topic", "type": "tag"},
+]
+FILTER_FIELDS = tuple(field["name"] for field in METADATA_SCHEMA)
+
+CONTENT_FIELD = "text"
+EMBEDDING_FIELD = "embedding"
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def vector_attrs(
+    dims: int,
+    algorithm: Optional[str] = None,
+    distance_metric: Optional[str] = None,
+    datatype: Optional[str] = None,
+    m: Optional[int] = None,
+    ef_construction: Optional[int] = None,
+    ef_runtime: Optional[int] = None,
+    epsilon: Optional[float] = None,
+) -> Dict[str, Any]:
+    algorithm = (algorithm or settings.indexing).lower()
+    attrs = {
+        "dims": dims,
+        "algorithm": algorithm,
+        "distance_metric": (distance_metric or settings.distance_metric).lower(),
+        "datatype": (datatype or settings.vector_datatype).lower(),
+    }
+    if algorithm == "hnsw":
+        attrs.update(
+            {
+                "m": m or settings.hnsw_m,
+                "ef_construction": ef_construction or settings.hnsw_ef_construction,
+                "ef_runtime": ef_runtime or settings.hnsw_ef_runtime,
+                "epsilon": epsilon or settings.hnsw_epsilon,
+            }
+        )
+    return attrs
+
+
+def build_index_schema(
+    name: str,
+    prefix: str,
+    attrs: Dict[str, Any],
+    storage_type: str = "hash",
+    tag_separator: str = "|",
+) -> IndexSchema:
+    """Same layout RedisVectorStore builds by default, plus the vector parameters
+    it does not expose (HNSW M / EF_* / EPSILON)."""
+    return IndexSchema.from_dict(
+        {
+            "index": {
+                "name": name,
+                # RedisVectorStore writes keys as "{prefix}:{id}".
+                "prefix": f"{prefix}:",
+                "storage_type": storage_type,
+            },
+            "fields": [
+                {"name": CONTENT_FIELD, "type": "text"},
+                {"name": EMBEDDING_FIELD, "type": "vector", "attrs": attrs},
+                {"name": "_index_name", "type": "text"},
+                {"name": "_metadata_json", "type": "text"},
+                *(
+                    {**field, "attrs": {"separator": tag_separator}}
+                    for field in METADATA_SCHEMA
+                ),
+            ],
+        }
+    )
+
+
+class IndexService:
+    """Resolves the physical index behind ``settings.index_name`` and rebuilds it
+    blue/green: a new index is filled under a new key prefix, then the alias is
+    swapped to it in one command.
+    """
+
+    def __init__(self):
+        self.alias = settings.index_name
+        self.redis_client = RedisPool().client
+
+    def resolve(self) -> Tuple[str, str]:
+        """Physical index name and key prefix currently serving ``alias``.
+
+        Before the first reindex the alias does not exist and the index is
+        simply named after it. Connection errors are raised, so a failed lookup
+        is never mistaken for a missing alias.
+        """
+        try:
+            info = self.redis_client.ft(self.alias).info()
+        except ResponseError:
+            return self.alias, self.alias
+
+        name = _decode(info.get("index_name", self.alias))
+        definition = _decode(info.get("index_definition", []))
+        prefixes = definition[definition.index("prefixes") + 1] if "prefixes" in definition else []
+        prefix = prefixes[0] if prefixes else f"{name}:"
+        return name, prefix[:-1] if prefix.endswith(":") else prefix
+
+    def live_vector_attrs(self, name: str) -> Optional[Dict[str, Any]]:
+        """Vector parameters an existing index was built with, or None if the
+        index does not exist yet."""
+        try:
+            index = SearchIndex.from_existing(name, redis_client=self.redis_client)
+        except Exception:
+            return None
+        attrs = index.schema.fields[EMBEDDING_FIELD].attrs
+        return vector_attrs(
+            attrs.dims,
+            attrs.algorithm.value,
+            attrs.distance_metric.value,
+            attrs.datatype.value,
+            getattr(attrs, "m", None),
+            getattr(attrs, "ef_construction", None),
+            getattr(attrs, "ef_runtime", None),
+            getattr(attrs, "epsilon", None),
+        )
+
+    def _delete_matching(self, pattern: str, batch_size: int) -> int:
+        deleted = 0
+        keys = []
+        for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                deleted += self.redis_client.delete(*keys)
+                keys = []
+        if keys:
+            deleted += self.redis_client.delete(*keys)
+        return deleted
+
+    def _copy_documents(
+        self,
+        old_prefix: str,
+        new_prefix: str,
+        new_name: str,
+        old_dtype: str,
+        new_dtype: str,
+        batch_size: int,
+    ) -> int:
+        copied = 0
+        keys: List[bytes] = []
+        convert = old_dtype.lower() != new_dtype.lower()
+
+        def flush() -> None:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.hgetall(key)
+            records = pipe.execute()
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, record in zip(keys, records):
+                if not record:
+                    continue
+                if convert and EMBEDDING_FIELD.encode() in record:
+                    vector = np.frombuffer(record[EMBEDDING_FIELD.encode()], dtype=old_dtype.lower())
+                    record[EMBEDDING_FIELD.encode()] = vector.astype(new_dtype.lower()).tobytes()
+                record[b"_index_name"] = new_name.encode()
+                suffix = key.decode()[len(old_prefix):]
+                pipe.hset(f"{new_prefix}{suffix}", mapping=record)
+            pipe.execute()
+
+        for key in self.redis_client.scan_iter(match=f"{old_prefix}:*", count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                flush()
+                copied += len(keys)
+                keys = []
+        if keys:
+            flush()
+            copied += len(keys)
+
+        return copied
+
+    def _wait_until_indexed(self, name: str, timeout: float = 3600.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            info = self.redis_client.ft(name).info()
+            if float(_decode(info.get("percent_indexed", 1))) >= 1.0:
+                return
+            time.sleep(0.5)
+        raise TimeoutError(f"Index {name} was not fully indexed within {timeout}s")
+
+    def reindex(
+        self,
+        algorithm: Optional[str] = None,
+        distance_metric: Optional[str] = None,
+        datatype: Optional[str] = None,
+        m: Optional[int] = None,
+        ef_construction: Optional[int] = None,
+        ef_runtime: Optional[int] = None,
+        epsilon: Optional[float] = None,
+        batch_size: int = 500,
+        drop_old: bool = False,
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        old_name, old_prefix = self.resolve()
+        old_index = SearchIndex.from_existing(old_name, redis_client=self.redis_client)
+        if old_index.schema.index.storage_type.value != "hash":
+            raise ValueError("Reindexing is only supported for hash storage")
+
+        old_attrs = old_index.schema.fields[EMBEDDING_FIELD].attrs
+        attrs = vector_attrs(
+            old_attrs.dims, algorithm, distance_metric, datatype,
+            m, ef_construction, ef_runtime, epsilon,
+        )
+
+        new_name = f"{self.alias}-{time.strftime('%Y%m%d%H%M%S')}"
+        new_index = SearchIndex(
+            schema=build_index_schema(new_name, new_name, attrs),
+            redis_client=self.redis_client,
+        )
+        new_index.create(overwrite=False)
+        logger.info(f"Created index {new_name} with {attrs}")
+
+        copied = self._copy_documents(
+            old_prefix, new_name, new_name,
+            old_attrs.datatype.value, attrs["datatype"], batch_size,
+        )
+        self._wait_until_indexed(new_name)
+
+        if old_name == self.alias:
+            # The index still carries the alias name, so it has to go before the
+            # alias can exist; both happen in one MULTI. Its keys stay in place.
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.execute_command("FT.DROPINDEX", old_name)
+            pipe.execute_command("FT.ALIASADD", self.alias, new_name)
+            pipe.execute()
+        else:
+            self.redis_client.execute_command("FT.ALIASUPDATE", self.alias, new_name)
+        logger.info(f"Alias {self.alias} now points to {new_name} (was {old_name})")
+
+        if drop_old:
+            if old_name != self.alias:
+                self.redis_client.execute_command("FT.DROPINDEX", old_name)
+            deleted = self._delete_matching(f"{old_prefix}:*", batch_size)
+            if old_name != self.alias:
+                # Ingestion manifests written under the physical name before
+                # they were keyed on the alias.
+                self._delete_matching(f"manifest:{old_name}:*", batch_size)
+            logger.info(f"Dropped {old_name} and {deleted} of its documents")
+
+        return {
+            "alias": self.alias,
+            "old_index": old_name,
+            "new_index": new_name,
+            "vector": attrs,
+            "documents_copied": copied,
+            "old_dropped": drop_old,
+            "elapsed_seconds": round(time.perf_counter() - start, 2),
+        }
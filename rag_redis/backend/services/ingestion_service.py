@@ -0,0 +1,257 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain.schema import Document
+from redisvl.redis.utils import array_to_buffer
+
+from backend.services.document_service import DocumentService
+from backend.services.embedding_service import EmbeddingService
+from backend.services.redis_pool import RedisPool
+from backend.services.redis_service import RedisService
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".txt", ".md")
+
+
+class IngestPathError(ValueError):
+    """A requested path is outside ``ingest_root`` or not a supported file."""
+
+
+def _split_file(path: str, metadata: Dict[str, Any]) -> List[Document]:
+    # Runs inside a worker process, so it only takes picklable arguments.
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+
+    document_service = DocumentService()
+    return document_service.create_documents_from_texts(
+        [text], [{**metadata, "source": path}]
+    )
+
+
+class IngestionService:
+    def __init__(self):
+        self.batch_size = settings.ingest_batch_size
+        self.workers = settings.ingest_workers or os.cpu_count()
+        self.root = os.path.realpath(settings.ingest_root)
+
+        self.redis_client = RedisPool().client
+        self.redis_service = RedisService()
+        self.embeddings = EmbeddingService().uncached_embeddings
+
+    @property
+    def vector_store(self):
+        # Read on every use: after a reindex the store names another key prefix.
+        return self.redis_service.vector_store
+
+    def _inside_root(self, path: str) -> bool:
+        return os.path.commonpath([self.root, path]) == self.root
+
+    def expand_paths(self, paths: List[str]) -> List[str]:
+        """Resolve paths to the supported files they name or contain.
+
+        Paths are resolved through symlinks and must stay inside ``ingest_root``;
+        anything else raises IngestPathError rather than reading the file.
+        """
+        files = []
+        for path in paths:
+            resolved = os.path.realpath(path)
+            if not self._inside_root(resolved):
+                raise IngestPathError(f"Path is outside the ingest root: {path}")
+
+            if os.path.isdir(resolved):
+                for root, _, names in os.walk(resolved):
+                    for name in names:
+                        if not name.endswith(SUPPORTED_EXTENSIONS):
+                            continue
+                        # A symlink inside the root may still point out of it.
+                        target = os.path.realpath(os.path.join(root, name))
+                        if self._inside_root(target):
+                            files.append(target)
+                        else:
+                            logger.warning(f"Skipping link outside the ingest root: {name}")
+            elif os.path.isfile(resolved):
+                if not resolved.endswith(SUPPORTED_EXTENSIONS):
+                    raise IngestPathError(f"Unsupported file type: {path}")
+                files.append(resolved)
+            else:
+                logger.warning(f"Skipping missing path: {path}")
+
+        return sorted(set(files))
+
+    def _manifest_key(self, source: str) -> str:
+        # Keyed on the alias, not the physical index: a reindex copies chunks
+        # under the same ids, so the manifests stay valid across it.
+        return f"manifest:{settings.index_name}:{source}"
+
+    def _document_key(self, chunk_id: str) -> str:
+        return f"{self.vector_store.config.key_prefix}:{chunk_id}"
+
+    def _iter_file_documents(
+        self, files: List[str], metadata: Dict[str, Any]
+    ) -> Iterator[List[Document]]:
+        # Keep a bounded window of files in flight so chunking runs ahead of
+        # embedding without loading the whole corpus into memory.
+        # Spawned, not forked: the API process has embedding and batching
+        # threads whose held locks a forked child would inherit.
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            pending = deque()
+            file_iter = iter(files)
+
+            for path in file_iter:
+                pending.append(executor.submit(_split_file, path, metadata))
+                if len(pending) >= self.workers * 2:
+                    break
+
+            while pending:
+                documents = pending.popleft().result()
+                next_path = next(file_iter, None)
+                if next_path is not None:
+                    pending.append(executor.submit(_split_file, next_path, metadata))
+                yield documents
+
+    def _sync_manifest(self, source: str, documents: List[Document]) -> tuple:
+        """Split a source's chunks into new ones and drop chunks no longer present."""
+        current = {doc.metadata["chunk_id"]: doc for doc in documents}
+        manifest_key = self._manifest_key(source)
+        known = {m.decode() for m in self.redis_client.smembers(manifest_key)}
+
+        stale = known - current.keys()
+        unchanged = [doc for chunk_id, doc in current.items() if chunk_id in known]
+        is_json = self.vector_store.config.storage_type == "json"
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        if stale:
+            pipe.delete(*(self._document_key(chunk_id) for chunk_id in stale))
+            pipe.srem(manifest_key, *stale)
+        # An edit earlier in the source shifts the position of every chunk after
+        # it, so unchanged chunks get their metadata rewritten, without being
+        # embedded again, to keep chunk_index true for adjacent-chunk merging.
+        for document in unchanged:
+            key = self._document_key(document.metadata["chunk_id"])
+            fields = self._metadata_fields(document)
+            if is_json:
+                for name, value in fields.items():
+                    pipe.json().set(key, f"$.{name}", value)
+            else:
+                pipe.hset(key, mapping=fields)
+        if stale or unchanged:
+            pipe.execute()
+
+        new_documents = [doc for chunk_id, doc in current.items() if chunk_id not in known]
+        return new_documents, len(unchanged), len(stale)
+
+    def _metadata_fields(self, document: Document) -> Dict[str, Any]:
+        config = self.vector_store.config
+        fields = {"_metadata_json": json.dumps(document.metadata)}
+        for field_name, field_value in document.metadata.items():
+            if field_value is None:
+                continue
+            elif isinstance(field_value, list):
+                fields[field_name] = config.default_tag_separator.join(field_value)
+            else:
+                fields[field_name] = field_value
+
+        return fields
+
+    def _build_record(self, document: Document, vector: List[float]) -> Dict[str, Any]:
+        # Mirrors the record layout RedisVectorStore.add_texts writes, so
+        # documents ingested here are searchable through the same index.
+        config = self.vector_store.config
+        is_json = config.storage_type == "json"
+        return {
+            config.content_field: document.page_content,
+            config.embedding_field: (
+                vector if is_json else array_to_buffer(vector, dtype=config.vector_datatype)
+            ),
+            "_index_name": config.index_name,
+            **self._metadata_fields(document),
+        }
+
+    def _write_batch(self, documents: List[Document], vectors: List[List[float]]) -> None:
+        # A reindex may have moved the alias since the last batch; the chunks
+        # must land under the live index's prefix and in its datatype, or the
+        # manifest would mark them ingested in an index nobody queries.
+        self.redis_service.refresh_index()
+        is_json = self.vector_store.config.storage_type == "json"
+        # Chunks and their manifest entries land together, so after a crash a
+        # chunk is either fully written and known, or re-embedded on the next run.
+        pipe = self.redis_client.pipeline(transaction=True)
+        for document, vector in zip(documents, vectors):
+            chunk_id = document.metadata["chunk_id"]
+            key = self._document_key(chunk_id)
+            record = self._build_record(document, vector)
+            if is_json:
+                pipe.json().set(key, "$", record)
+            else:
+                pipe.hset(key, mapping=record)
+            pipe.sadd(self._manifest_key(document.metadata["source"]), chunk_id)
+        pipe.execute()
+
+    def _flush(self, batch: List[Document]) -> None:
+        vectors = self.embeddings.embed_documents([d.page_content for d in batch])
+        self._write_batch(batch, vectors)
+
+    def ingest(
+        self,
+        paths: List[str],
+        batch_size: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        batch_size = batch_size or self.batch_size
+        files = self.expand_paths(paths)
+        self.redis_service.refresh_index()
+
+        start_time = time.perf_counter()
+        chunks_written = 0
+        chunks_unchanged = 0
+        chunks_deleted = 0
+        batches_written = 0
+
+        batch = []
+        for documents in self._iter_file_documents(files, metadata or {}):
+            if not documents:
+                continue
+
+            source = documents[0].metadata["source"]
+            new_documents, unchanged, deleted = self._sync_manifest(source, documents)
+            chunks_unchanged += unchanged
+            chunks_deleted += deleted
+
+            for document in new_documents:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    self._flush(batch)
+                    chunks_written += len(batch)
+                    batches_written += 1
+                    logger.info(f"Ingest batch {batches_written} written ({len(batch)} chunks)")
+                    batch = []
+
+        if batch:
+            self._flush(batch)
+            chunks_written += len(batch)
+            batches_written += 1
+
+        elapsed = time.perf_counter() - start_time
+        stats = {
+            "files": len(files),
+            "chunks_written": chunks_written,
+            "chunks_unchanged": chunks_unchanged,
+            "chunks_deleted": chunks_deleted,
+            "batches_written": batches_written,
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_second": round(len(files) / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_second": round(chunks_written / elapsed, 2) if elapsed else 0.0,
+        }
+        logger.info(f"Ingestion finished: {stats}")
+
+        return stats
@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from backend.config import settings
+from backend.utils.metrics import (
+    LLM_ACTIVE,
+    LLM_QUEUE_DEPTH,
+    LLM_QUEUE_WAIT,
+    LLM_REJECTED,
+    record_stage,
+)
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_BACKGROUND = 20
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BATCH: "batch",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class AdmissionRejected(Exception):
+    """A generation was not admitted: the queue was full (429) or its deadline
+    passed while it was queued (503). ``retry_after`` is in whole seconds."""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(f"LLM {reason}, retry after {retry_after}s")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """Admission control in front of Ollama.
+
+    At most ``max_concurrency`` generations run at once, matching the server's
+    OLLAMA_NUM_PARALLEL so work waits here, where it can be prioritised and
+    given up on, rather than in Ollama's invisible queue. Waiters are served by
+    priority, then arrival order. A full queue rejects a newcomer immediately,
+    unless a waiter of lower priority is queued: then that waiter is rejected
+    instead, so background work cannot crowd out interactive requests. A
+    waiter whose deadline passes leaves the queue without ever reaching Ollama.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        self.max_queue = settings.llm_max_queue if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout or settings.llm_queue_timeout
+
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After estimates.
+        self._service_time = 1.0
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "expired": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    def _evictable(self, priority: int) -> Optional[asyncio.Future]:
+        """The queued waiter a newcomer of ``priority`` may displace: the latest
+        arrival of the lowest priority, if that is lower than the newcomer's."""
+        live = [entry for entry in self._waiters if not entry[2].done()]
+        if not live:
+            return None
+        lowest, _, waiter = max(live, key=lambda entry: (entry[0], entry[1]))
+        return waiter if lowest > priority else None
+
+    def saturated(self, priority: int = PRIORITY_INTERACTIVE) -> bool:
+        return (
+            self._active >= self.max_concurrency
+            and self.queue_depth >= self.max_queue
+            and self._evictable(priority) is None
+        )
+
+    def retry_after(self) -> int:
+        waves = (self.queue_depth + 1) / self.max_concurrency
+        return max(1, math.ceil(waves * self._service_time))
+
+    def _update_gauges(self) -> None:
+        LLM_ACTIVE.set(self._active)
+        LLM_QUEUE_DEPTH.set(self.queue_depth)
+
+    def _reject_full(self) -> AdmissionRejected:
+        self._count("rejected_full")
+        LLM_REJECTED.labels(reason="queue_full").inc()
+        return AdmissionRejected("queue full", 429, self.retry_after())
+
+    def check(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Fail fast, before any work is done, when a new request could not queue."""
+        if self.saturated(priority):
+            raise self._reject_full()
+
+    async def acquire(
+        self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None
+    ) -> None:
+        """Wait for a slot. ``deadline`` is a ``time.monotonic()`` timestamp;
+        without one the wait is bounded by ``llm_queue_timeout``."""
+        start = time.monotonic()
+        deadline = deadline or start + self.queue_timeout
+        label = PRIORITY_NAMES.get(priority, str(priority))
+
+        if self._active < self.max_concurrency and not self.queue_depth:
+            self._active += 1
+        else:
+            if self.queue_depth >= self.max_queue:
+                victim = self._evictable(priority)
+                if victim is None:
+                    raise self._reject_full()
+                # The displaced caller gets the same 429 it would have got had
+                # it arrived to a full queue.
+                victim.set_exception(self._reject_full())
+
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            self._count("queued")
+            self._update_gauges()
+            # A timer rather than wait_for: wait_for can swallow a cancellation
+            # that lands in the same tick as the hand-over, and the cancelled
+            # caller would then carry on holding the slot.
+            timer = loop.call_later(
+                max(0.0, deadline - time.monotonic()), self._expire, waiter
+            )
+            try:
+                await waiter
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                    # The slot was handed over just as the wait ended; pass it on.
+                    self._release_slot()
+                else:
+                    waiter.cancel()
+                self._update_gauges()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._count("expired")
+                LLM_REJECTED.labels(reason="deadline").inc()
+                raise AdmissionRejected(
+                    "queue wait exceeded deadline", 503, self.retry_after()
+                )
+            finally:
+                timer.cancel()
+
+        waited = time.monotonic() - start
+        self._count("admitted")
+        LLM_QUEUE_WAIT.labels(priority=label).observe(waited)
+        record_stage("llm_queue", waited)
+        self._update_gauges()
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is queued for it.
+
+        For extra work that is worth doing only on idle capacity, such as a
+        hedged copy of a request; it never waits and never jumps the queue.
+        """
+        if self._active < self.max_concurrency and not self.queue_depth:
+            self._active += 1
+            self._update_gauges()
+            return True
+        return False
+
+    @staticmethod
+    def _expire(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_exception(asyncio.TimeoutError())
+
+    def _release_slot(self) -> None:
+        # A freed slot goes straight to the next live waiter, so the active
+        # count only drops when nobody is queued.
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def release(self, held: Optional[float] = None) -> None:
+        """Free a slot. ``held`` feeds the Retry-After estimate; slots taken by
+        ``try_acquire`` pass None so they do not skew it."""
+        if held is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * held
+        self._release_slot()
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        await self.acquire(priority, deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(
+            {
+                "active": self._active,
+                "queue_depth": self.queue_depth,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "avg_slot_seconds": round(self._service_time, 3),
+            }
+        )
+        return stats
@@ -1,22 +1,34 @@
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
-from langchain_ollama import OllamaLLM
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.globals import get_llm_cache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration
+from langchain_ollama import ChatOllama
 
+from backend.services.llm_scheduler import PRIORITY_INTERACTIVE, LLMScheduler
+from backend.services.ollama_router import OllamaRouter, RoutedChatOllama
 from backend.config import settings
+from backend.utils.metrics import LLM_PREFILL_TOKENS, record_stage
 
 logger = logging.getLogger(__name__)
 
 
 class LLMService:
     _instance: Optional["LLMService"] = None
-    _llm: Optional[OllamaLLM] = None
+    _llm: Optional[ChatOllama] = None
+    _generation_llm: Optional[ChatOllama] = None
 
     base_url = None
     model_name = None
     temperature = None
     num_predict = None
+    keep_alive = None
+    base_urls = None
+    router = None
+    scheduler = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -25,46 +37,121 @@ class LLMService:
             cls._instance.model_name = settings.ollama_model
             cls._instance.temperature = settings.temperature
             cls._instance.num_predict = settings.max_tokens
-            logger.info(f"LLMService configured with model: {cls._instance.model_name}")
+            cls._instance.keep_alive = settings.ollama_keep_alive
+            cls._instance.base_urls = [
+                url.strip() for url in settings.ollama_base_urls.split(",") if url.strip()
+            ] or [settings.ollama_base_url]
+            # The concurrency cap is per backend, so the fleet admits the sum.
+            cls._instance.scheduler = LLMScheduler(
+                max_concurrency=settings.llm_max_concurrency * len(cls._instance.base_urls)
+            )
+            cls._instance.router = OllamaRouter(
+                cls._instance.base_urls,
+                cls._instance.model_name,
+                scheduler=cls._instance.scheduler,
+            )
+            logger.info(
+                f"LLMService configured with model: {cls._instance.model_name} "
+                f"on {len(cls._instance.base_urls)} backend(s)"
+            )
 
         return cls._instance
 
     @property
-    def llm(self) -> OllamaLLM:
+    def llm(self) -> ChatOllama:
         if self._llm is None:
             logger.info(f"Initializing Ollama LLM: {self.model_name}")
-            self._llm = OllamaLLM(
-                base_url=self.base_url,
+            # The chat endpoint keeps messages apart, so the constant system
+            # prompt and earlier turns form a prefix Ollama can serve from cache.
+            self._llm = RoutedChatOllama(
+                base_url=self.base_urls[0],
                 model=self.model_name,
                 temperature=self.temperature,
                 num_predict=self.num_predict,
-            )
+                keep_alive=self.keep_alive,
+            ).with_router(self.router)
             logger.info(f"Ollama LLM '{self.model_name}' initialized successfully")
 
         return self._llm
 
-    def _format_messages(self, messages: List[BaseMessage]) -> str:
-        formatted = []
-        for message in messages:
-            if isinstance(message, SystemMessage):
-                formatted.append(f"System: {message.content}")
-            elif isinstance(message, HumanMessage):
-                formatted.append(f"Human: {message.content}")
-            else:
-                formatted.append(f"Assistant: {message.content}")
-
-        return "\n".join(formatted)
+    @property
+    def generation_llm(self) -> ChatOllama:
+        """``llm`` without its built-in cache lookup, for callers that check the
+        cache with ``cached`` before taking a slot and fill it with ``store``."""
+        if self._generation_llm is None:
+            self._generation_llm = self.llm.model_copy(update={"cache": False})
+        return self._generation_llm
 
-    def generate(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+    async def cached(self, messages: List[BaseMessage]) -> Optional[BaseMessage]:
+        """The LLM cache's answer to ``messages``, under the same key ChatOllama
+        uses, looked up before admission so a hit never queues for a slot."""
+        cache = get_llm_cache()
+        if cache is None:
+            return None
         try:
-            prompt = self._format_messages(messages)
-            response = self.llm.invoke(prompt)
+            value = await cache.alookup(dumps(messages), self.llm._get_llm_string())
+        except Exception as e:
+            logger.error(f"Error reading LLM cache: {str(e)}")
+            return None
+        if not value:
+            return None
+        # Entries from the semantic tier may come back as plain Generations.
+        message = getattr(value[0], "message", None)
+        return message if message is not None else AIMessage(content=value[0].text)
 
-            return {"response": response, "success": True}
+    async def store(self, messages: List[BaseMessage], message: BaseMessage) -> None:
+        cache = get_llm_cache()
+        if cache is None:
+            return
+        try:
+            await cache.aupdate(
+                dumps(messages), self.llm._get_llm_string(), [ChatGeneration(message=message)]
+            )
         except Exception as e:
-            logger.error(f"Error generating response: {str(e)}")
+            logger.error(f"Error writing LLM cache: {str(e)}")
+
+    def admit(
+        self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None
+    ):
+        """Async context manager holding one generation slot; see LLMScheduler."""
+        return self.scheduler.slot(priority, deadline)
+
+    async def warmup(self) -> None:
+        # An empty prompt makes Ollama load the model without generating, and
+        # keep_alive keeps it resident for the requests that follow.
+        results = await asyncio.gather(
+            *(
+                backend.async_client.generate(
+                    model=self.model_name, prompt="", keep_alive=self.keep_alive
+                )
+                for backend in self.router.backends
+            ),
+            return_exceptions=True,
+        )
+        errors = []
+        for backend, result in zip(self.router.backends, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error loading model on {backend.url}: {str(result)}")
+                errors.append(result)
+        if len(errors) == len(results):
+            raise errors[0]
+        logger.info(f"Ollama model '{self.model_name}' loaded (keep_alive={self.keep_alive})")
+
+    def start_health_checks(self) -> None:
+        self.router.start_health_checks()
+
+    async def stop_health_checks(self) -> None:
+        await self.router.stop_health_checks()
+
+    def record_usage(self, metadata: Dict[str, Any]) -> None:
+        """Record the prefill Ollama reports in a response's metadata.
 
-            return {
-                "response": f"I apologize, but I encountered an error: {str(e)}",
-                "success": False,
-            }
+        ``prompt_eval_count`` only counts tokens that were evaluated, so a turn
+        whose prompt prefix was still in the KV cache shows a small count.
+        """
+        duration = metadata.get("prompt_eval_duration")
+        count = metadata.get("prompt_eval_count")
+        if duration is not None:
+            record_stage("llm_prefill", duration / 1e9)
+        if count is not None:
+            LLM_PREFILL_TOKENS.observe(count)
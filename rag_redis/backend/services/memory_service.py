@@ -1,92 +1,454 @@
+import asyncio
+import json
 import logging
-from typing import List
+import math
+import uuid
+import zlib
+from typing import Iterable, List, Optional, Set
 
+import msgpack
 from langchain_redis import RedisChatMessageHistory
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    message_to_dict,
+    messages_from_dict,
+)
 from langchain_core.messages.utils import count_tokens_approximately
-from langmem.short_term import SummarizationNode
+from redis.exceptions import ResponseError, WatchError
+from redisvl.query.filter import Tag
 
+from backend.services.llm_scheduler import PRIORITY_BACKGROUND
 from backend.services.llm_service import LLMService
+from backend.services.redis_pool import RedisPool
+from backend.services.single_flight import RELEASE_SCRIPT
 from backend.config import settings
 
 logger = logging.getLogger(__name__)
 
 OUTPUT_DIR = "output"
 
+# Leading byte of a stored message. JSON entries written before these formats
+# always start with "{", so the three can share a list.
+MSGPACK = b"\x01"
+MSGPACK_ZLIB = b"\x02"
+
+# Where RedisChatMessageHistory kept sessions before the list layout.
+LEGACY_INDEX = "idx:chat_history"
+
+
+def encode_message(
+    message: BaseMessage, serializer: str = "msgpack", compress_min_bytes: int = 0
+) -> bytes:
+    if serializer == "json":
+        return json.dumps(message_to_dict(message)).encode()
+
+    # Only what a chat turn needs: type, content and, rarely, extra kwargs.
+    fields = {"t": message.type, "c": message.content}
+    if message.additional_kwargs:
+        fields["k"] = message.additional_kwargs
+    packed = msgpack.packb(fields, use_bin_type=True)
+    if compress_min_bytes and len(packed) > compress_min_bytes:
+        compressed = zlib.compress(packed)
+        if len(compressed) < len(packed):
+            return MSGPACK_ZLIB + compressed
+    return MSGPACK + packed
+
+
+def decode_messages(items: Iterable[bytes]) -> List[BaseMessage]:
+    dicts = []
+    for item in items:
+        if isinstance(item, str):
+            item = item.encode()
+        tag, body = item[:1], item[1:]
+        if tag == MSGPACK_ZLIB:
+            tag, body = MSGPACK, zlib.decompress(body)
+        if tag == MSGPACK:
+            fields = msgpack.unpackb(body, raw=False)
+            dicts.append(
+                {
+                    "type": fields["t"],
+                    "data": {"content": fields["c"], "additional_kwargs": fields.get("k", {})},
+                }
+            )
+        else:
+            dicts.append(json.loads(item))
+    return messages_from_dict(dicts)
+
 class MemoryService:
-    def __init__(
-        self,
-        session_id: str,
-    ) -> None:
-        self.session_id = session_id
-
-        self.redis_url = settings.redis_url
-        self.ttl = settings.memory_ttl
-        self.memory_key = settings.memory_key
-
-        llm_service = LLMService()
-        self.llm = llm_service.llm
-
-        self._chat_history = RedisChatMessageHistory(
-            redis_url=self.redis_url,
-            session_id=self.session_id,
-            ttl=self.ttl,
+    _instance: Optional["MemoryService"] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(MemoryService, cls).__new__(cls)
+            instance.ttl = settings.memory_ttl
+            instance.memory_key = settings.memory_key
+            instance.key_prefix = settings.memory_key_prefix
+            instance.mode = settings.memory_mode
+            instance.max_turns = settings.memory_max_turns
+            instance.summary_batch_turns = settings.memory_summary_batch_turns
+            instance.max_tokens = settings.memory_max_tokens
+            # However long the conversation, at least half the budget is left
+            # for verbatim turns.
+            instance.summary_max_tokens = min(
+                settings.memory_summary_max_tokens, instance.max_tokens // 2
+            )
+            # A fold may wait for a background slot and then generate; its lock
+            # has to outlive both.
+            instance.summary_timeout = settings.llm_queue_timeout + settings.memory_summary_timeout
+            instance.summary_lock_ttl = math.ceil(instance.summary_timeout) + 10
+            instance.serializer = settings.memory_serializer
+            instance.compress_min_bytes = settings.memory_compress_min_bytes
+            instance.max_messages = settings.memory_max_messages
+            instance.legacy_fallback = settings.memory_legacy_fallback
+            # None until the legacy index has been looked at once.
+            instance._legacy_documents: Optional[bool] = None
+            if instance.max_messages and instance.mode == "bounded":
+                # The cap must leave room for turns waiting to be summarized, or
+                # it would drop them before they reach the summary.
+                instance.max_messages = max(
+                    instance.max_messages,
+                    (instance.max_turns + instance.summary_batch_turns * 2) * 2,
+                )
+            instance._background_tasks: Set[asyncio.Task] = set()
+
+            instance.llm_service = LLMService()
+            instance.llm = instance.llm_service.llm
+
+            # Sessions share the pooled client; each session's history is a Redis
+            # list addressed by key, so no per-session connection or index is built.
+            instance.redis_client = RedisPool().async_client
+            instance.sync_redis_client = RedisPool().client
+            cls._instance = instance
+
+        return cls._instance
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    def _summary_key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}:summary"
+
+    def _lock_key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}:summary_lock"
+
+    def _migrate_lock_key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}:migrate_lock"
+
+    def _legacy_history(self, session_id: str) -> RedisChatMessageHistory:
+        return RedisChatMessageHistory(
+            session_id=session_id, redis_client=self.sync_redis_client, ttl=self.ttl
         )
 
-        # self._memory = ConversationSummaryBufferMemory(
-        #     llm=self.llm,
-        #     chat_memory=self._chat_history,
-        #     memory_key=self.memory_key,
-        #     return_messages=True,
-        # )
+    async def _has_legacy(self, session_id: str) -> bool:
+        """Whether the old layout still holds messages for this session.
+
+        Nothing writes the old layout any more, so once its index is found
+        missing or empty the lookup is skipped for the life of the process.
+        Otherwise it is a single count against the index, far cheaper than
+        building a RedisChatMessageHistory, which also (re)creates the index.
+        """
+        if not self.legacy_fallback or self._legacy_documents is False:
+            return False
+        try:
+            if self._legacy_documents is None:
+                info = await self.redis_client.execute_command("FT.INFO", LEGACY_INDEX)
+                fields = {
+                    (k.decode() if isinstance(k, bytes) else k): v
+                    for k, v in zip(info[::2], info[1::2])
+                }
+                self._legacy_documents = int(float(fields.get("num_docs", 0))) > 0
+                if not self._legacy_documents:
+                    return False
+
+            result = await self.redis_client.execute_command(
+                "FT.SEARCH",
+                LEGACY_INDEX,
+                str(Tag("session_id") == session_id),
+                "LIMIT",
+                0,
+                0,
+            )
+            return bool(result and int(result[0]))
+        except ResponseError:
+            # No legacy index (or no search module): there is nothing to migrate.
+            self._legacy_documents = False
+            return False
 
-        # summarization_model = self.llm.bind(max_tokens=128)
+    async def _migrate_legacy(self, session_id: str) -> List[BaseMessage]:
+        """Move a session stored by RedisChatMessageHistory into the list layout.
 
-        # self._memory = SummarizationNode(
-        #     token_counter=count_tokens_approximately,
-        #     model=summarization_model,
-        #     max_tokens=256,
-        #     max_tokens_before_summary=256,
-        #     max_summary_tokens=128,
-        # ) 
+        Only called when the session's list is empty, so sessions that already
+        have a list never pay for the lookup.
+        """
+        try:
+            if not await self._has_legacy(session_id):
+                return []
+            history = await asyncio.to_thread(self._legacy_history, session_id)
+            messages = await asyncio.to_thread(lambda: history.messages)
+            if not messages:
+                return []
+            # The old service stored its answers as system messages.
+            messages = [
+                AIMessage(content=m.content) if isinstance(m, SystemMessage) else m
+                for m in messages
+            ]
+
+            # Concurrent first reads all see the old messages; one writes them.
+            if await self.redis_client.set(
+                self._migrate_lock_key(session_id), 1, nx=True, ex=60
+            ):
+                await self._append(session_id, messages)
+                await asyncio.to_thread(history.clear)
+                logger.info(
+                    f"Migrated {len(messages)} legacy messages for session {session_id}"
+                )
+            return messages
+        except Exception as e:
+            logger.error(f"Error reading legacy history for session {session_id}: {str(e)}")
+            return []
 
-    def add_message(self, message: BaseMessage) -> None:
+    async def _clear_legacy(self, session_id: str) -> None:
         try:
-            self._chat_history.add_message(message)
-            logger.info(f"Added message for session {self.session_id}")
+            if not await self._has_legacy(session_id):
+                return
+            history = await asyncio.to_thread(self._legacy_history, session_id)
+            await asyncio.to_thread(history.clear)
+        except Exception as e:
+            logger.error(f"Error clearing legacy history for session {session_id}: {str(e)}")
+
+    def _encode(self, message: BaseMessage) -> bytes:
+        return encode_message(message, self.serializer, self.compress_min_bytes)
+
+    async def _append(self, session_id: str, messages: List[BaseMessage]) -> None:
+        # Append, cap and TTL refresh go out as one MULTI: one round trip, and
+        # no reader sees the list past its cap.
+        key = self._key(session_id)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.rpush(key, *(self._encode(message) for message in messages))
+        if self.max_messages:
+            pipe.ltrim(key, -self.max_messages, -1)
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+            # The summary lives as long as the turns it precedes.
+            pipe.expire(self._summary_key(session_id), self.ttl)
+        await pipe.execute()
+
+    async def add_message(self, session_id: str, message: BaseMessage) -> None:
+        try:
+            await self._append(session_id, [message])
+            logger.info(f"Added message for session {session_id}")
         except Exception as e:
             logger.error(
-                f"Error adding message for session {self.session_id}: {str(e)}"
+                f"Error adding message for session {session_id}: {str(e)}"
             )
 
-    def get_message(self) -> List[BaseMessage]:
+    async def add_turn(self, session_id: str, question: str, answer: str) -> None:
+        """Store one question and its answer in a single round trip."""
         try:
-            return self._chat_history.messages
+            await self._append(
+                session_id, [HumanMessage(content=question), AIMessage(content=answer)]
+            )
+            logger.info(f"Added turn for session {session_id}")
+        except Exception as e:
+            logger.error(f"Error adding turn for session {session_id}: {str(e)}")
+
+    async def get_message(self, session_id: str) -> List[BaseMessage]:
+        try:
+            items = await self.redis_client.lrange(self._key(session_id), 0, -1)
+            if not items:
+                return await self._migrate_legacy(session_id)
+            return decode_messages(items)
         except Exception as e:
             logger.error(
-                f"Error getting message for session {self.session_id}: {str(e)}"
+                f"Error getting message for session {session_id}: {str(e)}"
             )
             return []
 
-    def clear_memory(self) -> None:
+    async def clear_memory(self, session_id: str) -> None:
         try:
-            self._chat_history.clear()
-            logger.info(f"Cleared chat history")
+            await self.redis_client.delete(
+                self._key(session_id), self._summary_key(session_id)
+            )
+            await self._clear_legacy(session_id)
+            logger.info(f"Cleared chat history for session {session_id}")
         except Exception as e:
             logger.error(f"Error clearnig chat history: {str(e)}")
 
-    def get_memory_variables(self) -> dict:
-        # try:
-        #     return self._memory.load_memory_variables({})
-        # except Exception as e:
-        #     logger.error(f"Error getting memory variables: {str(e)}")
-        #     return {self.memory_key: ""}
-    
+    async def _summarize(self, summary: str, messages: List[BaseMessage]) -> str:
+        transcript = "\n".join(f"{msg.type}: {msg.content}" for msg in messages)
+        # Roughly 0.75 words per token, with room for the model to overshoot.
+        max_words = self.summary_max_tokens * 3 // 5
+        prompt = (
+            "Progressively summarize the conversation, extending the existing summary "
+            "with the new lines. Keep facts, names and open questions; be concise, "
+            f"at most {max_words} words.\n\n"
+            f"Existing summary:\n{summary or '(none)'}\n\n"
+            f"New lines:\n{transcript}\n\n"
+            "New summary:"
+        )
+        # Summaries can wait; they queue behind every request a user is waiting on.
+        async with self.llm_service.admit(PRIORITY_BACKGROUND):
+            return self._cap_summary((await self.llm.ainvoke(prompt)).content.strip())
+
+    def _summary_message(self, summary: str) -> SystemMessage:
+        return SystemMessage(content=f"Summary of the earlier conversation: {summary}")
+
+    def _cap_summary(self, summary: str) -> str:
+        """Cut a summary the model let grow past ``summary_max_tokens``."""
+        def overshoot() -> int:
+            return count_tokens_approximately([self._summary_message(summary)]) - (
+                self.summary_max_tokens
+            )
+
+        excess = overshoot()
+        while summary and excess > 0:
+            # count_tokens_approximately charges about four characters per
+            # token; cut that much, then back up to a word boundary.
+            summary = summary[: max(0, len(summary) - excess * 4)].rsplit(" ", 1)[0]
+            excess = overshoot()
+        return summary
+
+    async def summarize_if_needed(self, session_id: str) -> None:
+        """Fold turns older than the verbatim window into the rolling summary."""
+        if self.mode != "bounded":
+            return
+
+        key = self._key(session_id)
+        window = self.max_turns * 2
         try:
-            messages = self._chat_history.messages
-            chat_history = "\n".join([f"{msg.type}: {msg.content}" for msg in messages])
-            return {self.memory_key: chat_history}
+            # Folding only once a whole batch has built up keeps the history
+            # prefix stable between folds and bounds summarization calls.
+            length = await self.redis_client.llen(key)
+            if length <= window + self.summary_batch_turns * 2:
+                return
+
+            lock_key = self._lock_key(session_id)
+            token = uuid.uuid4().hex
+            if not await self.redis_client.set(
+                lock_key, token, nx=True, ex=self.summary_lock_ttl
+            ):
+                return
+
+            try:
+                fold_count = length - window
+                items = await self.redis_client.lrange(key, 0, fold_count - 1)
+                summary = await self.redis_client.get(self._summary_key(session_id))
+                messages = decode_messages(items)
+
+                new_summary = await asyncio.wait_for(
+                    self._summarize(summary.decode() if summary else "", messages),
+                    timeout=self.summary_timeout,
+                )
+
+                if await self._commit_fold(session_id, token, fold_count, summary, new_summary):
+                    logger.info(
+                        f"Folded {fold_count} messages into summary for session {session_id}"
+                    )
+                else:
+                    logger.warning(f"Discarded a stale summary fold for session {session_id}")
+            finally:
+                await self._release_lock(lock_key, token)
 
         except Exception as e:
-            logger.error(f"Error getting memory variables: {str(e)}")
-            return {self.memory_key: ""}
+            logger.error(f"Error summarizing session {session_id}: {str(e)}")
+
+    async def _commit_fold(
+        self, session_id: str, token: str, fold_count: int, previous: Optional[bytes], summary: str
+    ) -> bool:
+        """Trim the folded turns and store their summary, unless the fold went stale.
+
+        WATCH on the lock and the summary aborts the MULTI if the lock expired
+        or changed hands, or another fold stored a summary in the meantime; in
+        either case the head of the list may no longer be what was summarized.
+        Appends at the tail do not matter, so the list itself is not watched.
+        """
+        key = self._key(session_id)
+        summary_key = self._summary_key(session_id)
+        lock_key = self._lock_key(session_id)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(lock_key, summary_key)
+                holder = await pipe.get(lock_key)
+                current = await pipe.get(summary_key)
+                length = await pipe.llen(key)
+                if holder != token.encode() or current != previous or length < fold_count:
+                    await pipe.unwatch()
+                    return False
+
+                # Messages are only appended at the tail, so trimming the head
+                # by fold_count drops exactly the messages that were summarized.
+                pipe.multi()
+                pipe.ltrim(key, fold_count, -1)
+                pipe.set(summary_key, summary, ex=self.ttl or None)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def _release_lock(self, lock_key: str, token: str) -> None:
+        try:
+            await self.redis_client.eval(RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.error(f"Error releasing summary lock {lock_key}: {str(e)}")
+
+    def schedule_summary(self, session_id: str) -> None:
+        task = asyncio.create_task(self.summarize_if_needed(session_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _get_bounded_history(self, session_id: str) -> List[BaseMessage]:
+        # Everything not yet folded is fetched, not a sliding window of the last
+        # turns: the history then starts at the same message on every turn until
+        # the next fold, and Ollama can reuse the cached prompt prefix. Folding
+        # keeps the list within this limit, so the tail read only cuts it when
+        # summarization falls behind.
+        limit = self.max_turns * 2 + self.summary_batch_turns * 2
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(self._summary_key(session_id))
+        pipe.lrange(self._key(session_id), -limit, -1)
+        summary, items = await pipe.execute()
+
+        summary = summary.decode() if summary else ""
+        if items or summary:
+            messages = decode_messages(items)
+        else:
+            messages = (await self._migrate_legacy(session_id))[-limit:]
+
+        # Summaries stored before the cap existed are cut on read as well.
+        summary_message = self._summary_message(self._cap_summary(summary)) if summary else None
+
+        # Over budget, the oldest turns go a whole fold batch at a time, which
+        # moves the start of the history as rarely as folding does.
+        budget = self.max_tokens - (
+            count_tokens_approximately([summary_message]) if summary_message else 0
+        )
+        step = max(self.summary_batch_turns * 2, 2)
+        while len(messages) > step and count_tokens_approximately(messages) > budget:
+            messages = messages[step:]
+        while messages and count_tokens_approximately(messages) > budget:
+            messages.pop(0)
+
+        if summary_message:
+            messages.insert(0, summary_message)
+        return messages
+
+    async def get_history(self, session_id: str) -> List[BaseMessage]:
+        """The session's history as chat messages, oldest first."""
+        try:
+            if self.mode == "bounded":
+                return await self._get_bounded_history(session_id)
+            return await self.get_message(session_id)
+
+        except Exception as e:
+            logger.error(f"Error getting history for session {session_id}: {str(e)}")
+            return []
+
+    @staticmethod
+    def format_history(messages: List[BaseMessage]) -> str:
+        return "\n".join(f"{msg.type}: {msg.content}" for msg in messages)
+
+    async def get_memory_variables(self, session_id: str) -> dict:
+        return {self.memory_key: self.format_history(await self.get_history(session_id))}
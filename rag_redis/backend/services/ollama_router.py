@@ -0,0 +1,459 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+from langchain_core.messages import BaseMessage
+from langchain_ollama import ChatOllama
+from ollama import AsyncClient, Client
+from pydantic import PrivateAttr
+
+from backend.config import settings
+from backend.services.llm_scheduler import LLMScheduler
+from backend.utils.metrics import (
+    OLLAMA_HEALTHY,
+    OLLAMA_HEDGES,
+    OLLAMA_OUTSTANDING,
+    OLLAMA_TTFT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying the same routing key (a chat session) go back to the backend
+# that served the previous one, where the shared prompt prefix is still cached.
+_routing_key: ContextVar[Optional[str]] = ContextVar("ollama_routing_key", default=None)
+
+
+@contextmanager
+def routing_key(key: Optional[str]) -> Iterator[None]:
+    # Restored with set() rather than reset(): a streaming generator holding
+    # the key may be closed from a different context than it was opened in.
+    previous = _routing_key.get()
+    _routing_key.set(key)
+    try:
+        yield
+    finally:
+        _routing_key.set(previous)
+
+
+class OllamaBackend:
+    def __init__(self, url: str, index: int, ttft_window: int = 200):
+        self.url = url.rstrip("/")
+        self.index = index
+        self.client = Client(host=self.url)
+        self.async_client = AsyncClient(host=self.url)
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.ttft: deque = deque(maxlen=ttft_window)
+        self.ttft_average = 0.0
+        self.requests = 0
+        self.errors = 0
+        OLLAMA_HEALTHY.labels(backend=self.url).set(1)
+
+    def opened(self) -> None:
+        self.outstanding += 1
+        self.requests += 1
+        OLLAMA_OUTSTANDING.labels(backend=self.url).set(self.outstanding)
+
+    def closed(self) -> None:
+        self.outstanding -= 1
+        OLLAMA_OUTSTANDING.labels(backend=self.url).set(self.outstanding)
+
+    def observe_ttft(self, seconds: float) -> None:
+        self.ttft.append(seconds)
+        self.ttft_average = (
+            seconds if len(self.ttft) == 1 else 0.8 * self.ttft_average + 0.2 * seconds
+        )
+        OLLAMA_TTFT.labels(backend=self.url).observe(seconds)
+
+
+class OllamaRouter:
+    """Spreads generations over several Ollama servers.
+
+    Each request goes to the healthy backend with the fewest requests in flight,
+    preferring the one with the faster recent time to first token on a tie.
+    A backend leaves rotation after ``failure_threshold`` consecutive failed
+    requests or a failed ``/api/tags`` probe, and rejoins on the next probe
+    that lists the model. A request that fails before its first part is retried
+    on another backend. With hedging on, a request whose first part is slower
+    than the fleet's ``hedge_percentile`` time to first token is duplicated to a
+    second backend, and whichever answers first is kept. Given a ``scheduler``,
+    the copy only goes out when it can take a free slot, so hedging never
+    pushes a backend past its OLLAMA_NUM_PARALLEL.
+
+    Requests made inside ``routing_key(session_id)`` stick to the backend that
+    served the session last, so Ollama can reuse the KV cache of the shared
+    prompt prefix, unless that backend is down, has all of its
+    ``backend_concurrency`` slots busy, or is busier than the least loaded one
+    by more than one request.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        model: str,
+        health_interval: Optional[float] = None,
+        health_timeout: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        hedge_enabled: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        affinity_size: int = 10000,
+        scheduler: Optional[LLMScheduler] = None,
+        backend_concurrency: Optional[int] = None,
+    ):
+        if not urls:
+            raise ValueError("At least one Ollama backend URL is required")
+
+        self.backends = [OllamaBackend(url, i) for i, url in enumerate(urls)]
+        self.model = model
+        self.health_interval = health_interval or settings.ollama_health_interval
+        self.health_timeout = health_timeout or settings.ollama_health_timeout
+        self.failure_threshold = failure_threshold or settings.ollama_failure_threshold
+        self.hedge_enabled = (
+            settings.ollama_hedge_enabled if hedge_enabled is None else hedge_enabled
+        )
+        self.hedge_percentile = hedge_percentile or settings.ollama_hedge_percentile
+        self.hedge_min_samples = hedge_min_samples or settings.ollama_hedge_min_samples
+
+        self.affinity_size = affinity_size
+        self.scheduler = scheduler
+        self.backend_concurrency = backend_concurrency or settings.llm_max_concurrency
+
+        self._turn = 0
+        self._affinity: "OrderedDict[str, int]" = OrderedDict()
+        self._health_task: Optional[asyncio.Task] = None
+        self._stats = {
+            "failovers": 0,
+            "hedged": 0,
+            "hedges_won": 0,
+            "hedges_skipped": 0,
+            "affinity_hits": 0,
+        }
+
+    def pick(
+        self, exclude: List[OllamaBackend] = (), key: Optional[str] = None
+    ) -> Optional[OllamaBackend]:
+        candidates = [b for b in self.backends if b not in exclude]
+        # With every backend marked down, trying one beats failing outright:
+        # the marks may be older than the outage.
+        healthy = [b for b in candidates if b.healthy] or candidates
+        if not healthy:
+            return None
+
+        if key is not None and key in self._affinity:
+            previous = self.backends[self._affinity[key]]
+            least = min(b.outstanding for b in healthy)
+            # A full backend would queue the request inside Ollama, which costs
+            # more than the prefill the cached prefix saves.
+            if (
+                previous in healthy
+                and previous.outstanding <= least + 1
+                and previous.outstanding < self.backend_concurrency
+            ):
+                self._affinity.move_to_end(key)
+                self._stats["affinity_hits"] += 1
+                return previous
+
+        # Backends without samples yet sort first; exact ties rotate.
+        self._turn += 1
+        count = len(self.backends)
+        return min(
+            healthy,
+            key=lambda b: (b.outstanding, b.ttft_average, (b.index - self._turn) % count),
+        )
+
+    def _remember(self, key: Optional[str], backend: OllamaBackend) -> None:
+        if key is None or len(self.backends) < 2:
+            return
+        self._affinity[key] = backend.index
+        self._affinity.move_to_end(key)
+        while len(self._affinity) > self.affinity_size:
+            self._affinity.popitem(last=False)
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge_enabled or len(self.backends) < 2:
+            return None
+        samples = [t for b in self.backends for t in b.ttft]
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return float(np.percentile(samples, self.hedge_percentile))
+
+    def _mark(self, backend: OllamaBackend, healthy: bool, reason: str = "") -> None:
+        if backend.healthy != healthy:
+            if healthy:
+                logger.info(f"Ollama backend {backend.url} is back in rotation")
+            else:
+                logger.warning(f"Ollama backend {backend.url} taken out of rotation: {reason}")
+        backend.healthy = healthy
+        OLLAMA_HEALTHY.labels(backend=backend.url).set(1 if healthy else 0)
+
+    def _succeeded(self, backend: OllamaBackend) -> None:
+        backend.failures = 0
+
+    def _failed(self, backend: OllamaBackend, error: BaseException) -> None:
+        backend.errors += 1
+        backend.failures += 1
+        logger.error(f"Ollama backend {backend.url} request failed: {str(error)}")
+        if backend.failures >= self.failure_threshold:
+            self._mark(backend, False, f"{backend.failures} consecutive failures")
+
+    async def _first_part(
+        self,
+        backend: OllamaBackend,
+        request: Callable[[AsyncClient], Awaitable[AsyncIterator[Any]]],
+    ) -> tuple:
+        start = time.perf_counter()
+        stream = await request(backend.async_client)
+        part = await stream.__anext__()
+        backend.observe_ttft(time.perf_counter() - start)
+        return stream, part
+
+    async def _race(
+        self,
+        backend: OllamaBackend,
+        request: Callable[[AsyncClient], Awaitable[AsyncIterator[Any]]],
+        tried: List[OllamaBackend],
+    ) -> tuple:
+        """Open the request on ``backend``, hedging to another backend if the
+        first part is late. Returns (backend, stream, first part) of the winner;
+        the other copy is cancelled."""
+        contenders: Dict[asyncio.Task, OllamaBackend] = {}
+
+        def launch(target: OllamaBackend) -> None:
+            target.opened()
+            contenders[asyncio.ensure_future(self._first_part(target, request))] = target
+
+        launch(backend)
+        reserved = False
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(contenders.keys(), timeout=delay)
+            if not done:
+                second = self.pick(tried)
+                # The copy occupies a generation slot until the race is decided,
+                # so it needs one of its own; without a free one it is skipped.
+                if second is not None and self.scheduler is not None:
+                    reserved = self.scheduler.try_acquire()
+                    if not reserved:
+                        self._stats["hedges_skipped"] += 1
+                        second = None
+                if second is not None:
+                    tried.append(second)
+                    self._stats["hedged"] += 1
+                    launch(second)
+
+        error: Optional[BaseException] = None
+        hedged = len(contenders) > 1
+        try:
+            while contenders:
+                done, _ = await asyncio.wait(
+                    contenders.keys(), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    target = contenders.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        self._failed(target, error)
+                        target.closed()
+                        continue
+
+                    stream, part = task.result()
+                    if hedged:
+                        won = target is not backend
+                        self._stats["hedges_won"] += int(won)
+                        OLLAMA_HEDGES.labels(winner="hedge" if won else "primary").inc()
+                    return target, stream, part
+        finally:
+            # Losers are cancelled; a loser that also got its first part in the
+            # same wakeup has its stream closed, which ends the generation.
+            try:
+                for task, target in contenders.items():
+                    task.cancel()
+                    if task.done() and not task.cancelled() and task.exception() is None:
+                        await task.result()[0].aclose()
+                    target.closed()
+            finally:
+                # With one copy left, the request is back on the caller's slot.
+                if reserved:
+                    self.scheduler.release()
+
+        raise error
+
+    async def astream(
+        self, request: Callable[[AsyncClient], Awaitable[AsyncIterator[Any]]]
+    ) -> AsyncIterator[Any]:
+        """Yield the parts of ``request(client)`` from the chosen backend."""
+        key = _routing_key.get()
+        tried: List[OllamaBackend] = []
+        error: Optional[BaseException] = None
+        while True:
+            backend = self.pick(tried, key)
+            if backend is None:
+                raise error or RuntimeError("No Ollama backend available")
+            tried.append(backend)
+            if error is not None:
+                self._stats["failovers"] += 1
+
+            try:
+                winner, stream, part = await self._race(backend, request, tried)
+            except Exception as e:
+                error = e
+                continue
+
+            self._remember(key, winner)
+            try:
+                yield part
+                async for part in stream:
+                    yield part
+                self._succeeded(winner)
+            except Exception as e:
+                # Parts already reached the caller, so this cannot be retried.
+                self._failed(winner, e)
+                raise
+            finally:
+                winner.closed()
+                await stream.aclose()
+            return
+
+    def stream(self, request: Callable[[Client], Iterator[Any]]) -> Iterator[Any]:
+        """Blocking counterpart of ``astream``, with failover but no hedging."""
+        key = _routing_key.get()
+        tried: List[OllamaBackend] = []
+        error: Optional[BaseException] = None
+        while True:
+            backend = self.pick(tried, key)
+            if backend is None:
+                raise error or RuntimeError("No Ollama backend available")
+            tried.append(backend)
+
+            started = False
+            backend.opened()
+            try:
+                for part in request(backend.client):
+                    if not started:
+                        started = True
+                        self._remember(key, backend)
+                    yield part
+                self._succeeded(backend)
+                return
+            except Exception as e:
+                self._failed(backend, e)
+                if started:
+                    raise
+                error = e
+            finally:
+                backend.closed()
+
+    async def check_health(self) -> None:
+        names = {self.model, f"{self.model}:latest"}
+
+        async def probe(client: httpx.AsyncClient, backend: OllamaBackend) -> None:
+            try:
+                response = await client.get(f"{backend.url}/api/tags")
+                response.raise_for_status()
+                models = response.json().get("models", [])
+                listed = any(
+                    names & {m.get("name"), m.get("model")} for m in models
+                )
+                if not listed:
+                    self._mark(backend, False, f"model {self.model} not available")
+                    return
+                backend.failures = 0
+                self._mark(backend, True)
+            except Exception as e:
+                self._mark(backend, False, f"health check failed: {str(e)}")
+
+        async with httpx.AsyncClient(timeout=self.health_timeout) as client:
+            await asyncio.gather(*(probe(client, backend) for backend in self.backends))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    def start_health_checks(self) -> None:
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop_health_checks(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        return {
+            **self._stats,
+            "hedge_delay_ms": round(delay * 1000, 2) if delay is not None else None,
+            "sessions_pinned": len(self._affinity),
+            "backends": [
+                {
+                    "url": b.url,
+                    "healthy": b.healthy,
+                    "outstanding": b.outstanding,
+                    "requests": b.requests,
+                    "errors": b.errors,
+                    "ttft_p50_ms": (
+                        round(float(np.percentile(b.ttft, 50)) * 1000, 2) if b.ttft else None
+                    ),
+                }
+                for b in self.backends
+            ],
+        }
+
+
+async def _once(part: Any) -> AsyncIterator[Any]:
+    yield part
+
+
+class RoutedChatOllama(ChatOllama):
+    """ChatOllama whose requests go through an OllamaRouter instead of the single
+    client built from ``base_url``. Messages go to ``/api/chat`` as they are, so
+    Ollama applies the model's own chat template and a prompt that only grows at
+    the end keeps its cached prefix between turns."""
+
+    _router: Optional[OllamaRouter] = PrivateAttr(default=None)
+
+    def with_router(self, router: OllamaRouter) -> "RoutedChatOllama":
+        self._router = router
+        return self
+
+    async def _acreate_chat_stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Any]:
+        params = self._chat_params(messages, stop, **kwargs)
+
+        async def request(client: AsyncClient) -> AsyncIterator[Any]:
+            response = await client.chat(**params)
+            return response if params["stream"] else _once(response)
+
+        async for part in self._router.astream(request):
+            yield part
+
+    def _create_chat_stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Iterator[Any]:
+        params = self._chat_params(messages, stop, **kwargs)
+
+        def request(client: Client) -> Iterator[Any]:
+            response = client.chat(**params)
+            return response if params["stream"] else iter([response])
+
+        yield from self._router.stream(request)
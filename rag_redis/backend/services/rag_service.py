@@ -1,82 +1,271 @@
+import asyncio
 import logging
-from typing import Dict, Any
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, Runnable
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain.schema import Document
 
+from backend.services.answer_cache import AnswerCache
+from backend.services.embedding_service import query_vector_scope
+from backend.services.llm_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AdmissionRejected,
+)
 from backend.services.llm_service import LLMService
+from backend.services.ollama_router import routing_key
 from backend.services.redis_service import RedisService
+from backend.services.retrieval_service import RetrievalService, count_tokens
+from backend.services.single_flight import SingleFlight
 from backend.services.memory_service import MemoryService
+from backend.config import settings
+from backend.utils.metrics import current_timings, record_stage, stage, timed
 
 logger = logging.getLogger(__name__)
 
+# Identical on every turn and first in every prompt, so Ollama keeps it cached.
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant. Answer the user's question accurately and "
+    "helpfully, taking the conversation so far into account. When the question "
+    "comes with context, base the answer on it; if the context doesn't contain "
+    "relevant information, say so politely."
+)
+CONTEXT_TURN = "Context:\n{context}\n\nQuestion: {question}"
+
 
 class RAGService:
-    def __init__(self, session_id: str):
-        self.session_id = session_id
+    _instance: Optional["RAGService"] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(RAGService, cls).__new__(cls)
+            instance.llm_service = LLMService()
+            instance.redis_service = RedisService()
+            instance.retrieval_service = RetrievalService()
+            instance.memory_service = MemoryService()
+            instance.answer_cache = AnswerCache()
+            instance.single_flight = SingleFlight()
+            instance.batch_concurrency = settings.batch_max_concurrency
 
-        self.llm_service = LLMService()
-        self.redis_service = RedisService()
-        self.memory_service = MemoryService(self.session_id)
+            # Retrieval, history and the answer cache run before the LLM, each as
+            # its own timed stage; the prompt variants and the LLM are session
+            # independent and built once per process.
+            instance.prompts = instance._create_prompts()
+            # Uncached: the LLM cache is checked before admission instead, so a
+            # hit never waits for or holds a generation slot.
+            instance.llm = instance.llm_service.generation_llm
+            cls._instance = instance
+            logger.info("RAGService initialized")
 
-        self.rag_chain = self._create_qa_chain()
-        logger.info(f"RAGService initialized for session: {session_id}")
+        return cls._instance
 
-    def _create_qa_chain(self) -> Runnable:
-        prompt_template = ChatPromptTemplate.from_messages(
+    def _create_prompt(self, use_vector_search: bool = True) -> ChatPromptTemplate:
+        # Everything that changes between turns comes last: the prompt of one
+        # turn is the previous prompt plus the previous exchange, with only the
+        # new context and question differing, so Ollama re-evaluates little more
+        # than those. History is optional, so memory off needs no variant.
+        return ChatPromptTemplate.from_messages(
             [
-                (
-                    "system",
-                    """You are a helpful AI assistant. Use the following context and conversation history to answer the user's question.
-                Context: {context}
-                Conversation History: {chat_history}
-                Please provide a helpful, accurate response based on the context and conversation history. If the context doesn't contain relevant information, say so politely.""",
-                ),
-                ("human", "{question}"),
+                ("system", SYSTEM_PROMPT),
+                MessagesPlaceholder("chat_history", optional=True),
+                ("human", CONTEXT_TURN if use_vector_search else "{question}"),
             ]
         )
 
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
+    def _create_prompts(self) -> Dict[bool, ChatPromptTemplate]:
+        return {
+            use_vector_search: self._create_prompt(use_vector_search)
+            for use_vector_search in (True, False)
+        }
 
-        rag_chain = (
-            {
-                "context": self.redis_service.vector_store.as_retriever(
-                    search_kwargs={"k": 10}
-                )
-                | format_docs,
-                "question": RunnablePassthrough(),
-                "chat_history": lambda x: self.memory_service.get_memory_variables().get(
-                    "chat_history", ""
-                ),
-            }
-            | prompt_template
-            | self.llm_service.llm
-            | StrOutputParser()
+    @staticmethod
+    def _format_docs(docs: List[Document]) -> str:
+        return "\n\n".join(doc.page_content for doc in docs)
+
+    @timed("history_fetch")
+    async def _load_chat_history(self, session_id: str) -> List[BaseMessage]:
+        return await self.memory_service.get_history(session_id)
+
+    async def _no_docs(self) -> List[Document]:
+        return []
+
+    async def _no_history(self) -> List[BaseMessage]:
+        return []
+
+    async def _prepare(
+        self,
+        question: str,
+        session_id: str,
+        use_memory: bool = True,
+        use_vector_search: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        # Disabled sources are never fetched: no query embedding or KNN without
+        # vector search, no history round trip without memory. The two that do
+        # run are independent Redis round trips and go out concurrently.
+        docs, chat_history = await asyncio.gather(
+            self.retrieval_service.retrieve(question, filters=filters)
+            if use_vector_search
+            else self._no_docs(),
+            self._load_chat_history(session_id) if use_memory else self._no_history(),
+        )
+
+        inputs = {"question": question}
+        if use_vector_search:
+            inputs["context"] = self._format_docs(docs)
+        if use_memory:
+            inputs["chat_history"] = chat_history
+
+        history_text = self.memory_service.format_history(chat_history)
+        context_tokens = count_tokens(inputs.get("context", ""))
+        history_tokens = count_tokens(history_text)
+        logger.info(
+            f"Prompt for session {session_id}: documents={len(docs)} "
+            f"context_tokens={context_tokens} "
+            f"history_tokens={history_tokens} "
+            f"prompt_tokens={context_tokens + history_tokens + count_tokens(question)}"
+        )
+
+        cache_key = self.answer_cache.make_key(
+            question,
+            docs,
+            history_text,
+            model=self.llm_service.model_name,
+            variant=f"context={int(use_vector_search)},memory={int(use_memory)}",
         )
+        return {
+            "prompt": self.prompts[use_vector_search],
+            "inputs": inputs,
+            "cache_key": cache_key,
+            "session_id": session_id,
+        }
 
-        return rag_chain
+    async def _remember(self, session_id: str, question: str, response: str) -> None:
+        await self.memory_service.add_turn(session_id, question, response)
+        self.memory_service.schedule_summary(session_id)
 
-    def generate(
-        self, question: str, use_memory: bool = True, use_vector_search: bool = True
+    def _cache_lookup(
+        self, cache_key: str
+    ) -> Optional[Callable[[], Awaitable[Optional[str]]]]:
+        # Other workers' answers reach this one through the answer cache, so
+        # without it there is nothing to wait for across workers.
+        if not self.answer_cache.enabled:
+            return None
+        return lambda: self.answer_cache.peek(cache_key)
+
+    async def _answer(
+        self, prepared: Dict[str, Any], priority: int, deadline: Optional[float]
+    ) -> str:
+        with stage("prompt_build"):
+            prompt = await prepared["prompt"].ainvoke(prepared["inputs"])
+        messages = prompt.to_messages()
+
+        message = await self.llm_service.cached(messages)
+        if message is None:
+            async with self.llm_service.admit(priority, deadline):
+                with stage("llm"), routing_key(prepared["session_id"]):
+                    message = await self.llm.ainvoke(messages)
+            self.llm_service.record_usage(message.response_metadata)
+            await self.llm_service.store(messages, message)
+        response = message.content
+        # Written before the single-flight lock is released, so callers waiting
+        # in other workers find it.
+        await self.answer_cache.set(prepared["cache_key"], response)
+        return response
+
+    async def _answer_stream(
+        self, prepared: Dict[str, Any], priority: int, deadline: Optional[float]
+    ) -> AsyncIterator[str]:
+        with stage("prompt_build"):
+            prompt = await prepared["prompt"].ainvoke(prepared["inputs"])
+        messages = prompt.to_messages()
+
+        cached = await self.llm_service.cached(messages)
+        if cached is not None:
+            yield cached.content
+            await self.answer_cache.set(prepared["cache_key"], cached.content)
+            return
+
+        # The slot is held until the last token, like Ollama's own.
+        metadata: Dict[str, Any] = {}
+        async with self.llm_service.admit(priority, deadline):
+            llm_start = time.perf_counter()
+            first_token_time = None
+            chunks = []
+            with routing_key(prepared["session_id"]):
+                async for message in self.llm.astream(messages):
+                    # Ollama's counters arrive on the final, empty chunk.
+                    if message.response_metadata.get("done"):
+                        metadata = message.response_metadata
+                        self.llm_service.record_usage(metadata)
+                    chunk = message.content
+                    if not chunk:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                        record_stage("llm_ttft", first_token_time - llm_start)
+                    chunks.append(chunk)
+                    yield chunk
+            record_stage("llm", time.perf_counter() - llm_start)
+
+        response = "".join(chunks)
+        await self.llm_service.store(
+            messages, AIMessage(content=response, response_metadata=metadata)
+        )
+        await self.answer_cache.set(prepared["cache_key"], response)
+
+    async def generate(
+        self,
+        question: str,
+        session_id: str = "default",
+        use_memory: bool = True,
+        use_vector_search: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
     ) -> Dict[str, Any]:
+        """``deadline`` is a ``time.monotonic()`` timestamp bounding the wait for
+        an LLM slot; AdmissionRejected propagates so callers can answer 429/503."""
         try:
-            response = self.rag_chain.invoke(question)
+            # Retrieval, the semantic cache lookup and the cache write all embed
+            # through the same scope, so each distinct text is encoded once per turn.
+            with query_vector_scope():
+                prepared = await self._prepare(
+                    question, session_id, use_memory, use_vector_search, filters
+                )
+                with stage("answer_cache"):
+                    response = await self.answer_cache.get(prepared["cache_key"])
+                cache_hit = response is not None
+                coalesced = False
+                if not cache_hit:
+                    # Identical questions in flight at the same time share one
+                    # LLM call instead of all missing the cache together.
+                    wait_start = time.perf_counter()
+                    response, coalesced = await self.single_flight.do(
+                        prepared["cache_key"],
+                        lambda: self._answer(prepared, priority, deadline),
+                        self._cache_lookup(prepared["cache_key"]),
+                    )
+                    if coalesced:
+                        record_stage("single_flight_wait", time.perf_counter() - wait_start)
 
             if use_memory:
-                self.memory_service.add_message(HumanMessage(content=question))
-                self.memory_service.add_message(SystemMessage(content=response))
+                await self._remember(session_id, question, response)
 
             return {
                 "response": response,
+                "cache_hit": cache_hit,
+                "coalesced": coalesced,
                 "context_used": use_vector_search,
                 "memory_used": use_memory,
                 "model_used": self.llm_service.model_name,
                 "success": True,
             }
 
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Error in RAG response: {str(e)}")
 
@@ -87,3 +276,154 @@ class RAGService:
                 "model_used": self.llm_service.model_name,
                 "success": False,
             }
+
+    async def generate_batch(
+        self, items: List[Dict[str, Any]], max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Answer many questions, returning one result per item in input order.
+
+        All questions are embedded in one batched encode up front; the per-item
+        retrievals then hit the shared request scope. Items of the same session
+        run in order so their history stays consistent, different sessions run
+        concurrently up to ``max_concurrency`` LLM calls. Items queue for the LLM
+        behind interactive requests.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+
+        sessions: Dict[str, List[int]] = {}
+        for index, item in enumerate(items):
+            sessions.setdefault(item.get("session_id", "default"), []).append(index)
+
+        async def run_session(indexes: List[int]) -> None:
+            for index in indexes:
+                async with semaphore:
+                    try:
+                        result = await self.generate(
+                            **items[index],
+                            priority=PRIORITY_BATCH,
+                            deadline=time.monotonic() + settings.llm_batch_queue_timeout,
+                        )
+                    except AdmissionRejected as e:
+                        result = {
+                            "success": False,
+                            "error": str(e),
+                            "retry_after": e.retry_after,
+                        }
+                    except Exception as e:
+                        logger.error(f"Error in batch item {index}: {str(e)}")
+                        result = {"success": False, "error": str(e)}
+                results[index] = {"index": index, **result}
+
+        with query_vector_scope():
+            questions = [
+                item["question"] for item in items if item.get("use_vector_search", True)
+            ]
+            if questions:
+                await self.redis_service.embeddings.aembed_documents(questions)
+
+            await asyncio.gather(*(run_session(indexes) for indexes in sessions.values()))
+
+        return results
+
+    async def stream(
+        self,
+        question: str,
+        session_id: str = "default",
+        use_memory: bool = True,
+        use_vector_search: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        start_time = time.perf_counter()
+        first_token_time = None
+        tokens = 0
+        chunks = []
+
+        try:
+            with query_vector_scope():
+                prepared = await self._prepare(
+                    question, session_id, use_memory, use_vector_search, filters
+                )
+                with stage("answer_cache"):
+                    cached = await self.answer_cache.get(prepared["cache_key"])
+                cache_hit = cached is not None
+
+                coalesced = False
+                if cache_hit:
+                    first_token_time = time.perf_counter()
+                    tokens = 1
+                    chunks.append(cached)
+                    yield {"type": "token", "content": cached}
+                else:
+                    # Concurrent streams of the same answer replay one generation.
+                    coalesced = self.single_flight.in_flight(prepared["cache_key"])
+                    async for chunk in self.single_flight.stream(
+                        prepared["cache_key"],
+                        lambda: self._answer_stream(prepared, priority, deadline),
+                        self._cache_lookup(prepared["cache_key"]),
+                    ):
+                        if first_token_time is None:
+                            first_token_time = time.perf_counter()
+                        # Ollama streams roughly one token per chunk.
+                        tokens += 1
+                        chunks.append(chunk)
+                        yield {"type": "token", "content": chunk}
+
+            end_time = time.perf_counter()
+            response = "".join(chunks)
+
+            if use_memory:
+                await self._remember(session_id, question, response)
+
+            ttft = (first_token_time or end_time) - start_time
+            generation_time = end_time - (first_token_time or end_time)
+            metrics = {
+                "time_to_first_token_ms": round(ttft * 1000, 2),
+                "total_time_ms": round((end_time - start_time) * 1000, 2),
+                "tokens": tokens,
+                "tokens_per_second": (
+                    round(tokens / generation_time, 2) if generation_time > 0 else 0.0
+                ),
+                # Headers are sent before the first token, so the per-stage
+                # breakdown of a stream travels in the done event instead.
+                "stages_ms": {
+                    name: round(seconds * 1000, 2)
+                    for name, seconds in current_timings().items()
+                },
+            }
+            logger.info(f"Streamed response for session {session_id}: {metrics}")
+
+            yield {
+                "type": "done",
+                "response": response,
+                "cache_hit": cache_hit,
+                "coalesced": coalesced,
+                "context_used": use_vector_search,
+                "memory_used": use_memory,
+                "model_used": self.llm_service.model_name,
+                "success": True,
+                "metrics": metrics,
+            }
+
+        except AdmissionRejected as e:
+            # Headers have already gone out, so the rejection travels as an event.
+            yield {
+                "type": "error",
+                "response": str(e),
+                "status_code": e.status_code,
+                "retry_after": e.retry_after,
+                "model_used": self.llm_service.model_name,
+                "success": False,
+            }
+
+        except Exception as e:
+            logger.error(f"Error in RAG stream: {str(e)}")
+
+            yield {
+                "type": "error",
+                "response": f"I apologize, but I encountered an error: {str(e)}",
+                "model_used": self.llm_service.model_name,
+                "success": False,
+            }
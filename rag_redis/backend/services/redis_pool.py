@@ -0,0 +1,130 @@
+import logging
+import time
+from typing import Any, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from backend.config import settings
+from backend.utils.metrics import record_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _command_name(args: tuple) -> str:
+    name = args[0] if args else "UNKNOWN"
+    return (name.decode() if isinstance(name, bytes) else str(name)).upper()
+
+
+class TimedRedis(redis.Redis):
+    """Redis client that records every round trip in the redis latency histogram."""
+
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis(_command_name(args), time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Any = None) -> Any:
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        def timed_execute(raise_on_error: bool = True) -> Any:
+            start = time.perf_counter()
+            try:
+                return execute(raise_on_error)
+            finally:
+                record_redis("MULTI" if transaction else "PIPELINE", time.perf_counter() - start)
+
+        pipe.execute = timed_execute
+        return pipe
+
+
+class TimedAsyncRedis(aioredis.Redis):
+    """redis.asyncio counterpart of TimedRedis."""
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_redis(_command_name(args), time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Any = None) -> Any:
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        async def timed_execute(raise_on_error: bool = True) -> Any:
+            start = time.perf_counter()
+            try:
+                return await execute(raise_on_error)
+            finally:
+                record_redis("MULTI" if transaction else "PIPELINE", time.perf_counter() - start)
+
+        pipe.execute = timed_execute
+        return pipe
+
+
+class RedisPool:
+    _instance: Optional["RedisPool"] = None
+    _pool: Optional[redis.BlockingConnectionPool] = None
+    _client: Optional[redis.Redis] = None
+    _async_pool: Optional[aioredis.BlockingConnectionPool] = None
+    _async_client: Optional[aioredis.Redis] = None
+
+    redis_url = None
+    max_connections = None
+    timeout = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RedisPool, cls).__new__(cls)
+            cls._instance.redis_url = settings.redis_url
+            cls._instance.max_connections = settings.redis_max_connections
+            cls._instance.timeout = settings.redis_pool_timeout
+
+        return cls._instance
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            # A blocking pool makes callers wait for a free connection instead of
+            # opening new ones, so the process never exceeds max_connections.
+            self._pool = redis.BlockingConnectionPool.from_url(
+                self.redis_url,
+                max_connections=self.max_connections,
+                timeout=self.timeout,
+            )
+            self._client = TimedRedis(connection_pool=self._pool)
+            logger.info(
+                f"Redis connection pool initialized (max_connections={self.max_connections})"
+            )
+
+        return self._client
+
+    @property
+    def async_client(self) -> aioredis.Redis:
+        if self._async_client is None:
+            self._async_pool = aioredis.BlockingConnectionPool.from_url(
+                self.redis_url,
+                max_connections=self.max_connections,
+                timeout=self.timeout,
+            )
+            self._async_client = TimedAsyncRedis(connection_pool=self._async_pool)
+            logger.info(
+                f"Async Redis connection pool initialized (max_connections={self.max_connections})"
+            )
+
+        return self._async_client
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.disconnect()
+            logger.info("Redis connection pool closed")
+
+    async def aclose(self) -> None:
+        if self._async_pool is not None:
+            await self._async_pool.disconnect()
+            logger.info("Async Redis connection pool closed")
+        self.close()
@@ -1,40 +1,196 @@
+import asyncio
+import json
 import logging
-from typing import List
+import time
+from typing import Any, Callable, Dict, List, Optional
 
+import numpy as np
 from langchain.schema import Document
-from langchain_redis import RedisVectorStore
+from langchain_redis import RedisConfig, RedisVectorStore
+from redisvl.index import AsyncSearchIndex
+from redisvl.query import TextQuery, VectorQuery
+from redisvl.query.filter import FilterExpression, Tag
+from redis.commands.search.field import TagField
 
 from backend.services.embedding_service import EmbeddingService
+from backend.services.index_service import (
+    FILTER_FIELDS,
+    IndexService,
+    build_index_schema,
+    vector_attrs,
+)
+from backend.services.redis_pool import RedisPool
 from backend.config import settings
 
-import redis
-
 logger = logging.getLogger(__name__)
 
 OUTPUT_DIR = "models"
 
 
 class RedisService:
-    def __init__(self):
-        self.redis_url = settings.redis_url
-        self.index_name = settings.index_name
-        self.indexing = settings.indexing
+    _instance: Optional["RedisService"] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(RedisService, cls).__new__(cls)
+            instance.redis_url = settings.redis_url
+            instance.index_name = settings.index_name
+            instance.indexing = settings.indexing
+            instance.rrf_k = settings.retrieval_rrf_k
+            instance.index_refresh_interval = settings.index_refresh_interval
+            instance._index_checked = time.monotonic()
+
+            instance.redis_client = RedisPool().client
+
+            embedding_service = EmbeddingService()
+            instance.embeddings = embedding_service.embeddings
 
-        self.redis_client = redis.from_url(self.redis_url)
+            instance.vector_store = instance._create_vector_store()
+            instance.ensure_metadata_fields()
+            instance.async_index = instance._create_async_index()
+            cls._instance = instance
+            logger.info("RedisService initialized")
+
+        return cls._instance
+
+    def _create_vector_store(self) -> RedisVectorStore:
+        index_service = IndexService()
+        physical_name, key_prefix = index_service.resolve()
+
+        # An existing index keeps the parameters it was built with, so writes
+        # and query vectors follow it rather than the current settings; changed
+        # vector settings are applied with `python -m backend.cli reindex`.
+        attrs = index_service.live_vector_attrs(physical_name)
+        if attrs is None:
+            dims = settings.embedding_dimensions or len(
+                self.embeddings.embed_query("dimension probe")
+            )
+            attrs = vector_attrs(dims)
+        config = RedisConfig(
+            schema=build_index_schema(physical_name, key_prefix, attrs),
+            redis_client=self.redis_client,
+            indexing_algorithm=attrs["algorithm"].upper(),
+            distance_metric=attrs["distance_metric"].upper(),
+            vector_datatype=attrs["datatype"].upper(),
+            embedding_dimensions=attrs["dims"],
+        )
+        # The schema's prefix carries the trailing ":" of the index definition;
+        # keys themselves are written as "{key_prefix}:{id}".
+        config.key_prefix = key_prefix
+        logger.info(f"Vector index {physical_name} (alias {self.index_name}): {attrs}")
+        return RedisVectorStore(embeddings=self.embeddings, config=config)
 
-        embedding_service = EmbeddingService()
-        self.embeddings = embedding_service.embeddings
+    @property
+    def physical_index_name(self) -> str:
+        return self.vector_store.config.index_name
 
-        self.vector_store = RedisVectorStore(
-            redis_url=self.redis_url,
-            index_name=self.index_name,
-            indexing_algorithm=self.indexing,
-            embeddings=self.embeddings,
+    def _create_async_index(self) -> AsyncSearchIndex:
+        # Async view of the same index so KNN queries from request handlers go
+        # through redis.asyncio instead of blocking the event loop. It queries
+        # by the logical name, which after a reindex is an alias.
+        query_schema = self.vector_store.index.schema.model_copy(deep=True)
+        query_schema.index.name = self.index_name
+        return AsyncSearchIndex(
+            schema=query_schema,
+            redis_client=RedisPool().async_client,
         )
 
+    def refresh_index(self) -> bool:
+        """Follow the alias to the index it names now; True if that changed.
+
+        A reindex, usually run from the CLI in another process, moves the alias
+        to an index under a new key prefix and possibly another vector
+        datatype. Queries reach it through the alias right away, but their
+        vector blobs and every write must follow its prefix and datatype.
+        """
+        self._index_checked = time.monotonic()
+        try:
+            physical_name, _ = IndexService().resolve()
+            if physical_name == self.physical_index_name:
+                return False
+
+            previous = self.physical_index_name
+            # Request handlers read these from the event loop while this runs in
+            # a thread, so the new store is swapped in only once it is complete.
+            self.vector_store = self._create_vector_store()
+            self.async_index = self._create_async_index()
+            logger.info(
+                f"Index alias {self.index_name} moved from {previous} to "
+                f"{self.physical_index_name}"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error resolving index alias {self.index_name}: {str(e)}")
+            return False
+
+    async def _follow_alias(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self._index_checked < self.index_refresh_interval:
+            return
+        # Marked before the lookup so concurrent requests do not all repeat it.
+        self._index_checked = time.monotonic()
+        await asyncio.to_thread(self.refresh_index)
+
+    async def _aquery(self, build: Callable[[], Any]) -> List[Dict[str, Any]]:
+        """Run ``build()`` against the live index. A query that fails right
+        after an alias swap (its vector blob still in the old datatype) is
+        rebuilt and retried once against the new index."""
+        await self._follow_alias()
+        physical_name = self.physical_index_name
+        try:
+            return await self.async_index.query(build())
+        except Exception:
+            await self._follow_alias(force=True)
+            if self.physical_index_name == physical_name:
+                raise
+            return await self.async_index.query(build())
+
+    def ensure_metadata_fields(self) -> None:
+        # An index created before the metadata schema existed is extended in
+        # place; FT.ALTER re-scans existing keys so old documents become filterable.
+        try:
+            info = self.redis_client.ft(self.physical_index_name).info()
+            existing = set()
+            for attribute in info.get("attributes", []):
+                attribute = [
+                    a.decode() if isinstance(a, bytes) else a for a in attribute
+                ]
+                existing.add(attribute[attribute.index("attribute") + 1])
+
+            for name in FILTER_FIELDS:
+                if name not in existing:
+                    self.redis_client.ft(self.physical_index_name).alter_schema_add(
+                        [TagField(name, separator=self.vector_store.config.default_tag_separator)]
+                    )
+                    logger.info(
+                        f"Added TAG field '{name}' to index {self.physical_index_name}"
+                    )
+        except Exception as e:
+            logger.error(f"Error checking index metadata fields: {str(e)}")
+
+    @staticmethod
+    def build_filter(filters: Optional[Dict[str, Any]]) -> Optional[FilterExpression]:
+        """AND of TAG matches; a list value matches any of its entries."""
+        expression = None
+        for name, value in (filters or {}).items():
+            if value in (None, "", []):
+                continue
+            if name not in FILTER_FIELDS:
+                raise ValueError(f"Unsupported filter field: {name}")
+
+            condition = Tag(name) == value
+            expression = condition if expression is None else expression & condition
+
+        return expression
+
     def add_documents(self, documents: List[Document]):
         try:
-            self.vector_store.add_documents(documents)
+            # Keying by the content-addressed chunk id makes re-adding the same
+            # chunk overwrite it instead of creating a duplicate.
+            keys = [doc.metadata.get("chunk_id") for doc in documents]
+            self.refresh_index()
+            self.vector_store.add_documents(
+                documents, keys=keys if all(keys) else None
+            )
             logger.info(f"Added {len(documents)} documents to vector store")
         except Exception as e:
             logger.error(f"Error adding documents: {str(e)}")
@@ -57,6 +213,233 @@ class RedisService:
             logger.error(f"Error in similarity search with score: {str(e)}")
             return []
 
+    def _build_query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_runtime: Optional[int] = None,
+    ) -> VectorQuery:
+        config = self.vector_store.config
+        if ef_runtime and config.indexing_algorithm.upper() != "HNSW":
+            # EF_RUNTIME is an HNSW query parameter; FLAT is always exact.
+            ef_runtime = None
+        return VectorQuery(
+            vector=vector,
+            vector_field_name=config.embedding_field,
+            return_fields=[config.content_field, "_metadata_json"],
+            filter_expression=self.build_filter(filters),
+            num_results=top_k,
+            dtype=config.vector_datatype.lower(),
+            ef_runtime=ef_runtime,
+        )
+
+    def _build_text_query(
+        self, text: str, top_k: int, filters: Optional[Dict[str, Any]] = None
+    ) -> TextQuery:
+        config = self.vector_store.config
+        return TextQuery(
+            text=text,
+            text_field_name=config.content_field,
+            filter_expression=self.build_filter(filters),
+            return_fields=[config.content_field, "_metadata_json"],
+            num_results=top_k,
+            stopwords=None,
+        )
+
+    def _to_document(self, result: Dict[str, Any]) -> Document:
+        metadata = json.loads(result.get("_metadata_json") or "{}")
+        return Document(
+            page_content=result[self.vector_store.config.content_field],
+            metadata=metadata,
+        )
+
+    async def asimilarity_search_by_vector_with_score(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_runtime: Optional[int] = None,
+    ) -> List[tuple]:
+        try:
+            results = await self._aquery(
+                lambda: self._build_query(vector, top_k, filters, ef_runtime)
+            )
+            logger.info(f"Found {len(results)} similar documents with score")
+            return [
+                (self._to_document(result), float(result["vector_distance"]))
+                for result in results
+            ]
+        except Exception as e:
+            logger.error(f"Error in async similarity search: {str(e)}")
+            return []
+
+    async def _afetch_vectors(self, ids: List[str]) -> List[List[float]]:
+        config = self.vector_store.config
+        pipe = RedisPool().async_client.pipeline(transaction=False)
+        for doc_id in ids:
+            if config.storage_type == "json":
+                pipe.json().get(doc_id, f"$.{config.embedding_field}")
+            else:
+                pipe.hget(doc_id, config.embedding_field)
+        raw = await pipe.execute()
+
+        if config.storage_type == "json":
+            return [value[0] if value else [] for value in raw]
+        dtype = config.vector_datatype.lower()
+        return [np.frombuffer(value, dtype=dtype).tolist() for value in raw]
+
+    def _fuse(
+        self, vector_results: List[Dict[str, Any]], text_results: List[Dict[str, Any]], top_k: int
+    ) -> List[Dict[str, Any]]:
+        # Reciprocal rank fusion: rank positions are comparable across the KNN
+        # distance and the BM25 score, the raw values are not.
+        scores: Dict[str, float] = {}
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for results in (vector_results, text_results):
+            for rank, result in enumerate(results):
+                scores[result["id"]] = scores.get(result["id"], 0.0) + 1.0 / (
+                    self.rrf_k + rank + 1
+                )
+                by_id.setdefault(result["id"], result)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        return [by_id[doc_id] for doc_id in ranked]
+
+    async def asearch_candidates(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        return_vectors: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        text: Optional[str] = None,
+        ef_runtime: Optional[int] = None,
+    ) -> List[tuple]:
+        """KNN candidates as (document, distance, vector) tuples.
+
+        With ``text`` the KNN results are fused with a BM25 full-text query over
+        the same filter; documents found only by BM25 have a distance of None.
+        Vectors are read with one pipelined fetch after the query, since binary
+        vector fields do not survive FT.SEARCH result decoding.
+        """
+        try:
+            if text:
+                vector_results, text_results = await asyncio.gather(
+                    self._aquery(
+                        lambda: self._build_query(vector, top_k, filters, ef_runtime)
+                    ),
+                    self._aquery(lambda: self._build_text_query(text, top_k, filters)),
+                )
+                results = self._fuse(vector_results, text_results, top_k)
+            else:
+                results = await self._aquery(
+                    lambda: self._build_query(vector, top_k, filters, ef_runtime)
+                )
+
+            vectors = (
+                await self._afetch_vectors([result["id"] for result in results])
+                if return_vectors
+                else [None] * len(results)
+            )
+            logger.info(f"Found {len(results)} candidate documents")
+            return [
+                (
+                    self._to_document(result),
+                    float(result["vector_distance"]) if "vector_distance" in result else None,
+                    candidate,
+                )
+                for result, candidate in zip(results, vectors)
+            ]
+        except Exception as e:
+            logger.error(f"Error fetching search candidates: {str(e)}")
+            return []
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+        ef_runtime: Optional[int] = None,
+    ) -> List[tuple]:
+        # Encoding is CPU bound; aembed_query runs it in the default executor.
+        vector = await self.embeddings.aembed_query(query)
+        if hybrid:
+            results = await self.asearch_candidates(
+                vector, top_k, filters=filters, text=query, ef_runtime=ef_runtime
+            )
+            return [(doc, distance) for doc, distance, _ in results]
+        return await self.asimilarity_search_by_vector_with_score(
+            vector, top_k, filters, ef_runtime
+        )
+
+    async def asimilarity_search(
+        self, query: str, top_k: int = 10, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        results = await self.asimilarity_search_with_score(query, top_k, filters)
+        return [doc for doc, _ in results]
+
+    async def abatch_similarity_search_with_score(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_runtime: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search many queries with one batched encode and one pipelined round
+        trip of FT.SEARCH commands. Each item is {"results": [...]} or
+        {"error": "..."}, in input order."""
+        vectors = await self.embeddings.aembed_documents(queries)
+        await self._follow_alias()
+        physical_name = self.physical_index_name
+        built = [
+            self._build_query(vector, top_k, filters, ef_runtime) for vector in vectors
+        ]
+
+        try:
+            batches = await self.async_index.batch_query(built, batch_size=len(built))
+            items = [{"results": results} for results in batches]
+        except Exception as e:
+            # A pipeline fails as a whole; retry item by item so one bad query
+            # only fails its own slot.
+            logger.error(f"Error in batched search, retrying per query: {str(e)}")
+            await self._follow_alias(force=True)
+            if self.physical_index_name != physical_name:
+                built = [
+                    self._build_query(vector, top_k, filters, ef_runtime)
+                    for vector in vectors
+                ]
+
+            async def single(query: VectorQuery) -> Dict[str, Any]:
+                try:
+                    return {"results": await self.async_index.query(query)}
+                except Exception as item_error:
+                    return {"error": str(item_error)}
+
+            items = await asyncio.gather(*(single(query) for query in built))
+
+        logger.info(f"Batched search for {len(queries)} queries")
+        return [
+            {
+                "results": [
+                    (self._to_document(result), float(result["vector_distance"]))
+                    for result in item["results"]
+                ]
+            }
+            if "results" in item
+            else item
+            for item in items
+        ]
+
+    def document_count(self) -> int:
+        # FT.INFO is a metadata lookup; it needs no embedding or KNN query.
+        try:
+            info = self.redis_client.ft(self.index_name).info()
+            return int(info.get("num_docs", 0))
+        except Exception as e:
+            logger.error(f"Error reading index info: {str(e)}")
+            return 0
+
     def is_connected(self) -> bool:
         try:
             self.redis_client.ping()
@@ -0,0 +1,206 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.messages import HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from backend.services.answer_cache import AnswerCache
+from backend.services.redis_service import RedisService
+from backend.services.single_flight import SingleFlight
+from backend.config import settings
+from backend.utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+def count_tokens(text: str) -> int:
+    return count_tokens_approximately([HumanMessage(content=text)])
+
+
+class RetrievalService:
+    """Chooses the context for a question instead of always sending the top k.
+
+    Candidates from one KNN query go through a distance cutoff, optional MMR
+    re-ranking, de-duplication of chunks that repeat each other, and a token
+    budget for the final context block.
+    """
+
+    _instance: Optional["RetrievalService"] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(RetrievalService, cls).__new__(cls)
+            instance.redis_service = RedisService()
+            instance.single_flight = SingleFlight()
+            instance.strategy = settings.retrieval_strategy
+            instance.top_k = settings.retrieval_top_k
+            instance.fetch_k = settings.retrieval_fetch_k
+            instance.score_threshold = settings.retrieval_score_threshold
+            instance.mmr_lambda = settings.retrieval_mmr_lambda
+            instance.hybrid = settings.retrieval_hybrid
+            instance.max_context_tokens = settings.retrieval_max_context_tokens
+            instance.chunk_overlap = settings.chunk_overlap
+            cls._instance = instance
+            logger.info(f"RetrievalService initialized (strategy={instance.strategy})")
+
+        return cls._instance
+
+    def _mmr(
+        self, query_vector: List[float], candidates: List[Tuple[Document, float, Any]], k: int
+    ) -> List[Tuple[Document, float, Any]]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        vectors = np.asarray([vector for _, _, vector in candidates], dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+        relevance = vectors @ query
+        pairwise = vectors @ vectors.T
+        selected = [int(np.argmax(relevance))]
+        while len(selected) < min(k, len(candidates)):
+            redundancy = pairwise[:, selected].max(axis=1)
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+            scores[selected] = -np.inf
+            selected.append(int(np.argmax(scores)))
+
+        return [candidates[i] for i in selected]
+
+    def _merge_overlap(self, first: str, second: str) -> str:
+        # Adjacent chunks of a source share up to chunk_overlap characters; keep
+        # that shared span once.
+        limit = min(len(first), len(second), int(self.chunk_overlap * 1.5))
+        for size in range(limit, 0, -1):
+            if first.endswith(second[:size]):
+                return first + second[size:]
+        return f"{first}\n{second}"
+
+    def _deduplicate(self, docs: List[Document]) -> List[Document]:
+        seen_text = set()
+        unique = []
+        for doc in docs:
+            text = " ".join(doc.page_content.split())
+            if text in seen_text:
+                continue
+            seen_text.add(text)
+            unique.append(doc)
+
+        # Runs of consecutive chunks from one source become a single passage,
+        # placed at the rank of its best chunk.
+        rank = {id(doc): position for position, doc in enumerate(unique)}
+        by_source: Dict[Any, List[Document]] = {}
+        passages: List[Tuple[int, Document]] = []
+        for doc in unique:
+            source = doc.metadata.get("source")
+            if source is None or doc.metadata.get("chunk_index") is None:
+                passages.append((rank[id(doc)], doc))
+            else:
+                by_source.setdefault(source, []).append(doc)
+
+        for chunks in by_source.values():
+            chunks.sort(key=lambda doc: doc.metadata["chunk_index"])
+            run = [chunks[0]]
+            for doc in chunks[1:] + [None]:
+                if doc is not None and (
+                    doc.metadata["chunk_index"] == run[-1].metadata["chunk_index"] + 1
+                ):
+                    run.append(doc)
+                    continue
+
+                content = run[0].page_content
+                for chunk in run[1:]:
+                    content = self._merge_overlap(content, chunk.page_content)
+                metadata = dict(run[0].metadata)
+                metadata["chunk_span"] = [
+                    run[0].metadata["chunk_index"],
+                    run[-1].metadata["chunk_index"],
+                ]
+                best = min(rank[id(chunk)] for chunk in run)
+                passages.append((best, Document(page_content=content, metadata=metadata)))
+                run = [doc]
+
+        passages.sort(key=lambda item: item[0])
+        return [doc for _, doc in passages]
+
+    def _apply_budget(self, docs: List[Document]) -> Tuple[List[Document], int]:
+        if not self.max_context_tokens:
+            return docs, sum(count_tokens(doc.page_content) for doc in docs)
+
+        selected, used = [], 0
+        for doc in docs:
+            tokens = count_tokens(doc.page_content)
+            if used + tokens <= self.max_context_tokens:
+                selected.append(doc)
+                used += tokens
+            elif not selected:
+                # Never return an empty context because the best chunk is large;
+                # cut it down to the budget instead.
+                ratio = self.max_context_tokens / tokens
+                content = doc.page_content[: int(len(doc.page_content) * ratio)]
+                selected.append(Document(page_content=content, metadata=doc.metadata))
+                used = count_tokens(content)
+                break
+
+        return selected, used
+
+    async def retrieve(
+        self,
+        question: str,
+        top_k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        # Concurrent requests for the same question share one embedding and KNN
+        # query; each gets its own list since callers build prompts from it.
+        top_k = top_k or self.top_k
+        key = self.single_flight.make_key(
+            "retrieve", AnswerCache.normalize_question(question), top_k, filters or {}
+        )
+        docs, _ = await self.single_flight.do(
+            key, lambda: self._retrieve(question, top_k, filters)
+        )
+        return list(docs)
+
+    async def _retrieve(
+        self,
+        question: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        use_mmr = self.strategy == "mmr"
+        fetch_k = max(self.fetch_k, top_k) if use_mmr else top_k
+
+        with stage("embedding"):
+            vector = await self.redis_service.embeddings.aembed_query(question)
+        with stage("vector_search"):
+            candidates = await self.redis_service.asearch_candidates(
+                vector,
+                fetch_k,
+                return_vectors=use_mmr,
+                filters=filters,
+                text=question if self.hybrid else None,
+            )
+        fetched = len(candidates)
+
+        if self.score_threshold is not None:
+            # BM25-only hits carry no distance and are kept on their text match.
+            candidates = [
+                c for c in candidates if c[1] is None or c[1] <= self.score_threshold
+            ]
+        within_threshold = len(candidates)
+
+        if use_mmr and candidates:
+            candidates = self._mmr(vector, candidates, top_k)
+        else:
+            candidates = candidates[:top_k]
+
+        docs = self._deduplicate([doc for doc, _, _ in candidates])
+        deduplicated = len(docs)
+        docs, context_tokens = self._apply_budget(docs)
+
+        logger.info(
+            f"Retrieval strategy={self.strategy} hybrid={self.hybrid} "
+            f"filters={filters or {}} fetched={fetched} "
+            f"within_threshold={within_threshold} after_dedup={deduplicated} "
+            f"selected={len(docs)} context_tokens={context_tokens}"
+        )
+        return docs
@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.services.redis_pool import RedisPool
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Deletes the lock only while it still holds our token, so a holder whose lock
+# expired cannot release the next holder's lock.
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Broadcast:
+    """Chunks of one in-flight stream, replayed to every subscriber from the start."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._condition = asyncio.Condition()
+
+    async def publish(self, chunk: str) -> None:
+        async with self._condition:
+            self.chunks.append(chunk)
+            self._condition.notify_all()
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        async with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(
+                    lambda: len(self.chunks) > position or self.done
+                )
+                pending = self.chunks[position:]
+                done, error = self.done, self.error
+
+            for chunk in pending:
+                yield chunk
+            position += len(pending)
+
+            if done and position >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """Coalesces concurrent identical work into one execution.
+
+    The first caller for a key runs the work in a task; callers arriving while
+    it is in flight await the same task (or replay the same token stream) instead
+    of embedding, searching and generating again. The task is shielded, so the
+    first caller disconnecting does not cancel it for the others.
+
+    With ``single_flight_distributed`` the leader also takes a short Redis lock,
+    and leaders in other workers poll ``lookup`` (the answer cache) until the
+    holder has written its result, then use that.
+    """
+
+    _instance: Optional["SingleFlight"] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(SingleFlight, cls).__new__(cls)
+            instance.enabled = settings.single_flight_enabled
+            instance.distributed = settings.single_flight_distributed
+            instance.lock_prefix = settings.single_flight_lock_prefix
+            instance.lock_ttl_ms = settings.single_flight_lock_ttl_ms
+            instance.wait_timeout = settings.single_flight_wait_timeout
+            instance.poll_interval = settings.single_flight_poll_ms / 1000
+            instance.redis_client = RedisPool().async_client
+            instance._calls = {}
+            instance._streams = {}
+            instance._lock = threading.Lock()
+            instance._stats = {
+                "leaders": 0,
+                "coalesced": 0,
+                "remote_results": 0,
+                "lock_timeouts": 0,
+            }
+            cls._instance = instance
+            logger.info(
+                f"SingleFlight initialized (enabled={instance.enabled}, "
+                f"distributed={instance.distributed})"
+            )
+
+        return cls._instance
+
+    @staticmethod
+    def make_key(kind: str, *parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return f"{kind}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls or key in self._streams
+
+    async def _claim(
+        self, key: str, lookup: Optional[Callable[[], Awaitable[Any]]]
+    ) -> Tuple[Optional[str], Any]:
+        """Take the cross-worker lock for ``key`` or wait for its holder.
+
+        Returns ``(token, None)`` when this worker should compute, and
+        ``(None, result)`` when another worker's result became available. With
+        no lookup, distribution off, Redis failing or the wait timing out it
+        returns ``(None, None)`` and the caller computes without the lock.
+        """
+        if not (self.distributed and lookup):
+            return None, None
+
+        lock_key = f"{self.lock_prefix}{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                acquired = await self.redis_client.set(
+                    lock_key, token, nx=True, px=self.lock_ttl_ms
+                )
+            except Exception as e:
+                logger.error(f"Error taking single-flight lock: {str(e)}")
+                return None, None
+
+            # Checked after taking the lock too: the previous holder may have
+            # written its result and released the lock between our polls.
+            result = await lookup()
+            if result is not None:
+                if acquired:
+                    await self._release(key, token)
+                self._count("remote_results")
+                return None, result
+            if acquired:
+                return token, None
+
+            if time.monotonic() >= deadline:
+                logger.warning(f"Timed out waiting for single-flight lock {lock_key}")
+                self._count("lock_timeouts")
+                return None, None
+            await asyncio.sleep(self.poll_interval)
+
+    async def _release(self, key: str, token: Optional[str]) -> None:
+        if token is None:
+            return
+        try:
+            await self.redis_client.eval(
+                RELEASE_SCRIPT, 1, f"{self.lock_prefix}{key}", token
+            )
+        except Exception as e:
+            logger.error(f"Error releasing single-flight lock: {str(e)}")
+
+    async def _lead(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Awaitable[Any]]],
+    ) -> Tuple[Any, bool]:
+        token, result = await self._claim(key, lookup)
+        if result is not None:
+            return result, True
+        try:
+            return await func(), False
+        finally:
+            await self._release(key, token)
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Tuple[Any, bool]:
+        """Run ``func`` once for all concurrent callers with the same key.
+
+        Returns the result and whether it was shared, i.e. computed by another
+        caller. Exceptions are shared the same way.
+        """
+        if not self.enabled:
+            return await func(), False
+
+        task = self._calls.get(key)
+        if task is not None:
+            self._count("coalesced")
+            result, _ = await asyncio.shield(task)
+            return result, True
+
+        self._count("leaders")
+        task = asyncio.ensure_future(self._lead(key, func, lookup))
+        self._calls[key] = task
+
+        def forget(_: asyncio.Task) -> None:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+
+        task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    async def _produce(
+        self,
+        key: str,
+        broadcast: _Broadcast,
+        func: Callable[[], AsyncIterator[str]],
+        lookup: Optional[Callable[[], Awaitable[Any]]],
+    ) -> None:
+        token = None
+        try:
+            token, result = await self._claim(key, lookup)
+            if result is not None:
+                await broadcast.publish(result)
+            else:
+                async for chunk in func():
+                    await broadcast.publish(chunk)
+            await broadcast.close()
+        except Exception as e:
+            await broadcast.close(e)
+        finally:
+            await self._release(key, token)
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+
+    async def stream(
+        self,
+        key: str,
+        func: Callable[[], AsyncIterator[str]],
+        lookup: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> AsyncIterator[str]:
+        """Streaming form of ``do``: one producer, every caller gets all chunks.
+
+        Callers that join late first receive the chunks already produced. A
+        result found through ``lookup`` arrives as a single chunk.
+        """
+        if not self.enabled:
+            async for chunk in func():
+                yield chunk
+            return
+
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self._count("leaders")
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(
+                self._produce(key, broadcast, func, lookup)
+            )
+        else:
+            self._count("coalesced")
+
+        async for chunk in broadcast.subscribe():
+            yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls) + len(self._streams)
+        return stats
@@ -0,0 +1,152 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+logger = logging.getLogger(__name__)
+
+# Buckets span cache hits (sub-millisecond) to cold LLM generations (a minute).
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of a request",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trip time per command (pipelines count as one round trip)",
+    ["command"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth",
+    "Generations waiting for an LLM slot",
+)
+LLM_ACTIVE = Gauge(
+    "llm_active_generations",
+    "Generations currently holding an LLM slot",
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Time a generation waited for an LLM slot",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REJECTED = Counter(
+    "llm_rejected_total",
+    "Generations rejected by admission control",
+    ["reason"],
+)
+OLLAMA_OUTSTANDING = Gauge(
+    "ollama_backend_outstanding_requests",
+    "Requests in flight per Ollama backend",
+    ["backend"],
+)
+OLLAMA_HEALTHY = Gauge(
+    "ollama_backend_healthy",
+    "1 while an Ollama backend is in rotation",
+    ["backend"],
+)
+OLLAMA_TTFT = Histogram(
+    "ollama_time_to_first_token_seconds",
+    "Time to the first streamed part per Ollama backend",
+    ["backend"],
+    buckets=LATENCY_BUCKETS,
+)
+OLLAMA_HEDGES = Counter(
+    "ollama_hedged_requests_total",
+    "Requests duplicated to a second backend, by which copy answered first",
+    ["winner"],
+)
+LLM_PREFILL_TOKENS = Histogram(
+    "llm_prefill_tokens",
+    "Prompt tokens Ollama evaluated per generation; tokens reused from its KV cache are not counted",
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+
+# Stage durations of the current request, in seconds, summed per stage. Shared by
+# reference with tasks spawned while handling the request.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def request_timing_scope() -> Iterator[Dict[str, float]]:
+    timings = _request_timings.get()
+    if timings is not None:
+        yield timings
+        return
+
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def current_timings() -> Dict[str, float]:
+    return dict(_request_timings.get() or {})
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_DURATION.labels(stage=name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def record_redis(command: str, seconds: float) -> None:
+    REDIS_DURATION.labels(command=command).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings["redis"] = timings.get("redis", 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator form of ``stage`` for coroutine functions. Exceptions propagate."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()
+    )
+
+
+def render_metrics() -> tuple:
+    return generate_latest(), CONTENT_TYPE_LATEST
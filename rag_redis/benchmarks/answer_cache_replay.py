@@ -0,0 +1,160 @@
+"""Replay a chat traffic log and measure answer cache hit rates.
+
+Each entry is keyed twice: once the way the LLM cache sees it (the rendered
+prompt, which includes the session's history) and once with AnswerCache's key
+(normalized question + retrieved chunk ids, history only for follow-ups). No
+LLM is called; answers are placeholders.
+
+The log is JSON lines with ``session_id`` and ``question``. Without ``--log`` a
+synthetic log with repeated questions across sessions is generated.
+
+    python -m benchmarks.answer_cache_replay --log traffic.jsonl --retrieval redis
+    python -m benchmarks.answer_cache_replay --sessions 200 --retrieval fake
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from langchain.schema import Document
+
+from benchmarks.common import write_results
+from backend.services.answer_cache import AnswerCache
+
+QUESTIONS = [
+    "What is Python used for?",
+    "How does Redis store data?",
+    "What is machine learning?",
+    "Why is FastAPI fast?",
+    "What are vector databases used for?",
+    "How do embeddings work?",
+    "What is semantic search?",
+    "How does HNSW indexing work?",
+    "What is retrieval augmented generation?",
+    "How do I run Ollama locally?",
+    # Standalone, though they contain pronouns or demonstratives.
+    "What is a vector database and how does it work?",
+    "Explain this error: connection refused",
+    "How do I configure Redis so that it evicts old keys?",
+]
+
+FOLLOW_UPS = [
+    "Tell me more about that.",
+    "What about its performance?",
+    "Can you give an example of it?",
+]
+
+
+def synthetic_log(sessions: int, turns: int, seed: int) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    # Popular questions dominate, as with dashboard refreshes and retries.
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    queues = {}
+    for session in range(sessions):
+        session_id = f"session-{session}"
+        queue = []
+        for turn in range(turns):
+            if turn and rng.random() < 0.2:
+                question = rng.choice(FOLLOW_UPS)
+            else:
+                question = rng.choices(QUESTIONS, weights)[0]
+                if rng.random() < 0.3:
+                    question = question.lower().rstrip("?")
+            queue.append({"session_id": session_id, "question": question})
+        queues[session_id] = queue
+
+    # Interleave sessions while keeping each session's turns in order.
+    entries = []
+    while queues:
+        session_id = rng.choice(list(queues))
+        entries.append(queues[session_id].pop(0))
+        if not queues[session_id]:
+            del queues[session_id]
+    return entries
+
+
+def fake_retrieve(question: str, top_k: int = 4) -> List[Document]:
+    # Deterministic stand-in: chunk ids derived from the question's content words.
+    words = sorted({w for w in AnswerCache.normalize_question(question).split() if len(w) > 3})
+    return [
+        Document(
+            page_content=word,
+            metadata={"chunk_id": hashlib.sha256(word.encode()).hexdigest()[:32]},
+        )
+        for word in words[:top_k]
+    ]
+
+
+async def replay(entries: List[Dict[str, str]], retrieval: str) -> Dict[str, Any]:
+    cache = AnswerCache()
+    retrieve = None
+    if retrieval == "redis":
+        from backend.services.redis_service import RedisService
+
+        retrieve = RedisService().asimilarity_search
+
+    histories: Dict[str, List[str]] = defaultdict(list)
+    prompt_keys, answer_keys = set(), set()
+    prompt_hits = answer_hits = follow_ups = 0
+
+    for entry in entries:
+        question = entry["question"]
+        session_id = entry["session_id"]
+        docs = await retrieve(question, top_k=10) if retrieve else fake_retrieve(question)
+        context = "\n\n".join(doc.page_content for doc in docs)
+        history = "\n".join(histories[session_id])
+
+        prompt_key = hashlib.sha256(f"{context}\x00{history}\x00{question}".encode()).hexdigest()
+        answer_key = cache.make_key(question, docs, history)
+
+        prompt_hits += prompt_key in prompt_keys
+        answer_hits += answer_key in answer_keys
+        follow_ups += bool(history) and cache.is_follow_up(question)
+        prompt_keys.add(prompt_key)
+        answer_keys.add(answer_key)
+
+        histories[session_id].append(f"Human: {question}")
+        histories[session_id].append(f"AI: answer to {question}")
+
+    total = len(entries)
+    return {
+        "requests": total,
+        "follow_ups_keyed_on_history": follow_ups,
+        "prompt_key_hit_rate": round(prompt_hits / total, 4) if total else 0.0,
+        "answer_key_hit_rate": round(answer_hits / total, 4) if total else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", help="JSON lines file with session_id and question")
+    parser.add_argument("--retrieval", choices=["redis", "fake"], default="fake")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    else:
+        entries = synthetic_log(args.sessions, args.turns, args.seed)
+
+    results = asyncio.run(replay(entries, args.retrieval))
+    print(
+        f"requests={results['requests']} "
+        f"prompt-keyed hit rate={results['prompt_key_hit_rate']:.2%} "
+        f"answer-keyed hit rate={results['answer_key_hit_rate']:.2%}"
+    )
+
+    if args.output:
+        write_results(args.output, "answer_cache_replay", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Measure /chat throughput as the number of concurrent clients grows.
+
+Run it once against a server built from the previous revision and once against
+the current one, then compare the two result files:
+
+    python -m benchmarks.chat_concurrency --label before --output before.json
+    python -m benchmarks.chat_concurrency --label after --output after.json
+    python -m benchmarks.chat_concurrency --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.common import percentile
+
+QUESTIONS = [
+    "What is Python used for?",
+    "How does Redis store data?",
+    "What is machine learning?",
+    "Why is FastAPI fast?",
+    "What are vector databases used for?",
+]
+
+
+async def run_level(
+    client: httpx.AsyncClient, concurrency: int, requests_per_client: int
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(worker_id: int) -> None:
+        nonlocal errors
+        for i in range(requests_per_client):
+            question = QUESTIONS[(worker_id + i) % len(QUESTIONS)]
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/chat",
+                    params={
+                        "question": question,
+                        "session_id": f"bench-{worker_id}",
+                        "use_memory": False,
+                    },
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "mean_s": statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    levels = []
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+        for concurrency in args.concurrency:
+            result = await run_level(client, concurrency, args.requests_per_client)
+            print(
+                f"c={concurrency:<4} rps={result['throughput_rps']:.2f} "
+                f"p50={result['p50_s']:.3f}s p99={result['p99_s']:.3f}s "
+                f"errors={result['errors']}"
+            )
+            levels.append(result)
+
+    return {"label": args.label, "base_url": args.base_url, "levels": levels}
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    after_levels = {level["concurrency"]: level for level in after["levels"]}
+    print(f"{'clients':>8} {before['label']:>12} {after['label']:>12} {'speedup':>8}")
+    for level in before["levels"]:
+        other = after_levels.get(level["concurrency"])
+        if other is None:
+            continue
+        speedup = (
+            other["throughput_rps"] / level["throughput_rps"]
+            if level["throughput_rps"]
+            else float("inf")
+        )
+        print(
+            f"{level['concurrency']:>8} {level['throughput_rps']:>10.2f}/s "
+            f"{other['throughput_rps']:>10.2f}/s {speedup:>7.2f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-client", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
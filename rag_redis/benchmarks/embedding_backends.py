@@ -0,0 +1,133 @@
+"""Compare torch, ONNX and int8 ONNX embedding backends on CPU.
+
+Every backend runs in its own subprocess so cold start and resident memory are
+measured from a clean interpreter. The ONNX backends must agree with torch on a
+fixed corpus (cosine similarity per text) or the run is reported as failing.
+
+    python -m benchmarks.embedding_backends --output backends.json
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.common import percentile, write_results
+
+BACKENDS = {
+    "torch": {"backend": "torch", "quantize": False},
+    "onnx": {"backend": "onnx", "quantize": False},
+    "onnx-int8": {"backend": "onnx", "quantize": True},
+}
+
+CORPUS = [
+    "Python is a high-level programming language known for its readability.",
+    "Redis is an in-memory data structure store used as a cache and database.",
+    "Machine learning lets computers learn patterns from data.",
+    "FastAPI is a modern web framework for building APIs with Python.",
+    "Vector databases store embeddings for semantic similarity search.",
+    "The quick brown fox jumps over the lazy dog.",
+    "How do I reset my password?",
+    "HNSW graphs trade recall for query latency through the ef_runtime parameter.",
+    "Chunk overlap keeps sentences that straddle a boundary retrievable.",
+    "Ollama serves local large language models over an HTTP API.",
+] * 4
+
+
+def run_worker(name: str, queries: int) -> Dict[str, Any]:
+    from backend.services.embedding_service import EmbeddingService
+
+    options = BACKENDS[name]
+    start = time.perf_counter()
+    model = EmbeddingService().create_model(options["backend"], options["quantize"])
+    model.embed_query("cold start")
+    cold_start = time.perf_counter() - start
+
+    latencies: List[float] = []
+    for i in range(queries):
+        text = CORPUS[i % len(CORPUS)]
+        t0 = time.perf_counter()
+        model.embed_query(text)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    vectors = model.embed_documents(CORPUS)
+    batch_elapsed = time.perf_counter() - t0
+
+    # ru_maxrss is reported in kilobytes on Linux.
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return {
+        "backend": name,
+        "cold_start_s": round(cold_start, 3),
+        "query_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "query_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "batch_throughput_per_s": round(len(CORPUS) / batch_elapsed, 1),
+        "max_rss_mb": round(rss_mb, 1),
+        "vectors": vectors,
+    }
+
+
+def cosine_agreement(reference: List[List[float]], candidate: List[List[float]]) -> Dict[str, float]:
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    cosines = (a * b).sum(axis=1)
+    return {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--output")
+    parser.add_argument("--worker", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.queries)))
+        return
+
+    results = {}
+    for name in args.backends:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.embedding_backends", "--worker", name,
+             "--queries", str(args.queries)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    reference = results.get("torch", {}).get("vectors")
+    failed = False
+    for name, result in results.items():
+        vectors = result.pop("vectors")
+        if reference is not None and name != "torch":
+            result.update(cosine_agreement(reference, vectors))
+            result["agrees_with_torch"] = result["min_cosine"] >= args.min_cosine
+            failed |= not result["agrees_with_torch"]
+
+        print(
+            f"{name:<10} cold={result['cold_start_s']:>6.2f}s "
+            f"p50={result['query_p50_ms']:>7.2f}ms p99={result['query_p99_ms']:>7.2f}ms "
+            f"batch={result['batch_throughput_per_s']:>7.1f}/s rss={result['max_rss_mb']:>7.1f}MB "
+            + (f"min_cos={result['min_cosine']:.4f}" if "min_cosine" in result else "")
+        )
+
+    if args.output:
+        write_results(args.output, "embedding_backends", results)
+
+    if failed:
+        sys.exit(f"Backend disagreement below min cosine {args.min_cosine}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare QPS and tail latency of single-query encoding with micro-batching.
+
+Each configuration runs the same closed-loop workload: ``--clients`` threads
+each embed ``--queries-per-client`` short questions back to back.
+
+    python -m benchmarks.embedding_batching --windows 0 2 5 10 --sizes 8 32
+    python -m benchmarks.embedding_batching --model fake   # no model download
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import summarize, write_results
+from backend.services.embedding_batcher import BatchingEmbeddings
+
+
+class SimulatedEmbeddings(Embeddings):
+    """Stand-in with a fixed per-call cost plus a smaller per-text cost.
+
+    Calls are serialized, like forward passes competing for the same CPU cores.
+    """
+
+    def __init__(self, call_ms: float = 8.0, item_ms: float = 0.5, dims: int = 384):
+        self.call_s = call_ms / 1000
+        self.item_s = item_ms / 1000
+        self.dims = dims
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            time.sleep(self.call_s + self.item_s * len(texts))
+        return [[0.0] * self.dims for _ in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def load_model(kind: str) -> Embeddings:
+    if kind == "fake":
+        return SimulatedEmbeddings()
+
+    from backend.services.embedding_service import EmbeddingService
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    service = EmbeddingService()
+    return HuggingFaceEmbeddings(
+        model_name=service.model_name, cache_folder=service.cache_folder
+    )
+
+
+def run_config(
+    embeddings: Embeddings, clients: int, queries_per_client: int
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+
+    def client(client_id: int) -> List[float]:
+        timings = []
+        for i in range(queries_per_client):
+            start = time.perf_counter()
+            embeddings.embed_query(f"benchmark question {client_id} {i}")
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for timings in executor.map(client, range(clients)):
+            latencies.extend(timings)
+    elapsed = time.perf_counter() - start
+
+    return summarize(latencies, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=["real", "fake"], default="real")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--queries-per-client", type=int, default=20)
+    parser.add_argument("--windows", type=float, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    model.embed_query("warm up")
+
+    results = []
+    baseline = run_config(model, args.clients, args.queries_per_client)
+    results.append({"window_ms": None, "max_batch_size": 1, **baseline})
+    print(
+        f"{'unbatched':<22} qps={baseline['throughput_rps']:>8.1f} "
+        f"p99={baseline['p99_ms']:>8.2f}ms"
+    )
+
+    for window in args.windows:
+        for size in args.sizes:
+            batcher = BatchingEmbeddings(model, max_batch_size=size, max_wait_ms=window)
+            result = run_config(batcher, args.clients, args.queries_per_client)
+            result.update(batcher.stats())
+            results.append({"window_ms": window, "max_batch_size": size, **result})
+            print(
+                f"window={window:>5}ms size={size:<4} qps={result['throughput_rps']:>8.1f} "
+                f"p99={result['p99_ms']:>8.2f}ms avg_batch={result['avg_batch']}"
+            )
+
+    if args.output:
+        write_results(args.output, "embedding_batching", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Stand-in for the Ollama HTTP API with configurable latency.
+
+Implements the endpoints the backend uses (/api/generate, /api/chat, /api/tags)
+and streams a fixed number of tokens after a time-to-first-token delay, at a
+fixed token rate. Benchmarks then measure the service, not the model.
+
+With --prefill-ms-per-token the delay also grows with the prompt tokens that
+are not a prefix of a recent request's prompt and output, the way Ollama
+reuses a slot's KV cache, and prompt_eval_count reports only those tokens.
+
+    python -m benchmarks.fake_ollama --port 11435 --first-token-ms 150 --tokens-per-second 40
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "Redis keeps the working set in memory so retrieval stays fast while the "
+    "language model spends most of the request generating tokens for the answer"
+).split()
+
+
+class FakeOllamaConfig:
+    def __init__(
+        self,
+        model: str = "llama2",
+        first_token_ms: float = 100.0,
+        tokens_per_second: float = 50.0,
+        tokens: int = 64,
+        max_concurrency: int = 0,
+        prefill_ms_per_token: float = 0.0,
+        cache_slots: int = 4,
+    ):
+        self.model = model
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        # Ollama serves a limited number of requests per model in parallel
+        # (OLLAMA_NUM_PARALLEL); 0 means unlimited.
+        self.max_concurrency = max_concurrency
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.cache_slots = cache_slots
+
+
+def render(payload: Dict[str, Any], chat: bool) -> str:
+    """The prompt as the model would see it after templating."""
+    if not chat:
+        return payload.get("prompt", "")
+    return "".join(
+        f"<|{m.get('role')}|>{m.get('content', '')}<|end|>" for m in payload.get("messages", [])
+    )
+
+
+def common_prefix(a: str, b: str) -> int:
+    size = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        size += 1
+    return size
+
+
+def create_app(config: FakeOllamaConfig) -> FastAPI:
+    app = FastAPI(title="fake-ollama")
+    slots = asyncio.Semaphore(config.max_concurrency) if config.max_concurrency else None
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "prompt_tokens": 0, "cached_tokens": 0}
+    # Prompt plus output of recent requests, one per KV cache slot.
+    cache: deque = deque(maxlen=max(1, config.cache_slots))
+
+    def prefill_tokens(prompt: str) -> int:
+        cached = max((common_prefix(prompt, entry) for entry in cache), default=0)
+        total = max(1, len(prompt) // 4)
+        evaluated = max(1, (len(prompt) - cached) // 4)
+        stats["prompt_tokens"] += total
+        stats["cached_tokens"] += total - evaluated
+        return evaluated
+
+    def remember(prompt: str, output: str, chat: bool) -> None:
+        entry = prompt + (f"<|assistant|>{output}<|end|>" if chat else output)
+        # The slot that served a prefix of this prompt now holds the longer text.
+        for existing in list(cache):
+            if entry.startswith(existing):
+                cache.remove(existing)
+        cache.append(entry)
+
+    def final_fields(prompt_tokens: int, started: float, first_token_at: float) -> Dict[str, Any]:
+        now = time.perf_counter()
+        return {
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((now - started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((first_token_at - started) * 1e9),
+            "eval_count": config.tokens,
+            "eval_duration": int((now - first_token_at) * 1e9),
+        }
+
+    async def tokens(prompt_tokens: int) -> AsyncIterator[str]:
+        await asyncio.sleep(
+            (config.first_token_ms + prompt_tokens * config.prefill_ms_per_token) / 1000
+        )
+        for i in range(config.tokens):
+            if i:
+                await asyncio.sleep(1 / config.tokens_per_second)
+            yield WORDS[i % len(WORDS)] + " "
+
+    async def generate_stream(payload: Dict[str, Any], chat: bool) -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        first_token_at = None
+        prompt = render(payload, chat)
+        output: List[str] = []
+
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            if slots is not None:
+                await slots.acquire()
+            try:
+                prompt_tokens = prefill_tokens(prompt)
+                async for token in tokens(prompt_tokens):
+                    output.append(token)
+                    first_token_at = first_token_at or time.perf_counter()
+                    chunk = {"model": config.model, "created_at": _now(), "done": False}
+                    if chat:
+                        chunk["message"] = {"role": "assistant", "content": token}
+                    else:
+                        chunk["response"] = token
+                    yield (json.dumps(chunk) + "\n").encode()
+            finally:
+                if slots is not None:
+                    slots.release()
+            remember(prompt, "".join(output), chat)
+
+            final = {"model": config.model, "created_at": _now()}
+            final.update(final_fields(prompt_tokens, started, first_token_at or time.perf_counter()))
+            if chat:
+                final["message"] = {"role": "assistant", "content": ""}
+            else:
+                final["response"] = ""
+            yield (json.dumps(final) + "\n").encode()
+        finally:
+            stats["in_flight"] -= 1
+
+    async def respond(request: Request, chat: bool):
+        payload = await request.json()
+        is_load = not chat and not payload.get("prompt")
+        if is_load:
+            # An empty prompt only loads the model (used by the warm-up).
+            return JSONResponse(
+                {
+                    "model": config.model,
+                    "created_at": _now(),
+                    "response": "",
+                    "done": True,
+                    "done_reason": "load",
+                }
+            )
+
+        stream = generate_stream(payload, chat)
+        if payload.get("stream", True):
+            return StreamingResponse(stream, media_type="application/x-ndjson")
+
+        chunks = [json.loads(line) async for line in stream]
+        final = chunks[-1]
+        if chat:
+            final["message"]["content"] = "".join(c["message"]["content"] for c in chunks)
+        else:
+            final["response"] = "".join(c["response"] for c in chunks)
+        return JSONResponse(final)
+
+    @app.post("/api/generate")
+    async def api_generate(request: Request):
+        return await respond(request, chat=False)
+
+    @app.post("/api/chat")
+    async def api_chat(request: Request):
+        return await respond(request, chat=True)
+
+    @app.get("/api/tags")
+    async def api_tags():
+        return {
+            "models": [
+                {
+                    "name": config.model,
+                    "model": config.model,
+                    "modified_at": _now(),
+                    "size": 0,
+                    "digest": "fake",
+                    "details": {},
+                }
+            ]
+        }
+
+    @app.get("/api/version")
+    async def api_version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/stats")
+    async def api_stats():
+        return stats
+
+    @app.get("/")
+    async def root():
+        return "Ollama is running"
+
+    return app
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime())
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(config: FakeOllamaConfig, port: int = 0) -> str:
+    """Start the fake server on a daemon thread and return its base URL."""
+    import uvicorn
+
+    port = port or free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, name="fake-ollama", daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake Ollama server did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--first-token-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--cache-slots", type=int, default=4)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        args.model,
+        args.first_token_ms,
+        args.tokens_per_second,
+        args.tokens,
+        args.max_concurrency,
+        args.prefill_ms_per_token,
+        args.cache_slots,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Cost of storing chat turns: latency, Redis round trips and bytes per session.
+
+Compares the old write path (two add_message calls, each an RPUSH of a JSON
+message plus an EXPIRE) with MemoryService.add_turn, which sends both messages,
+the LTRIM cap and the TTL refresh as one MULTI, in JSON, msgpack and
+msgpack with zlib for long answers.
+
+    python -m benchmarks.history_writes --turns 100 --answer-chars 1500
+    python -m benchmarks.history_writes --fake-redis
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict
+
+from benchmarks.common import summarize, write_results
+from backend.services.memory_service import MemoryService
+from backend.utils.metrics import REDIS_DURATION
+
+VARIANTS = {
+    "two_calls_json": ("json", 0),
+    "add_turn_json": ("json", 0),
+    "add_turn_msgpack": ("msgpack", 0),
+    "add_turn_msgpack_zlib": ("msgpack", 512),
+}
+
+
+def round_trips() -> float:
+    return sum(
+        sample.value
+        for metric in REDIS_DURATION.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_count")
+    )
+
+
+def make_answer(turn: int, chars: int) -> str:
+    sentence = (
+        f"Turn {turn}: the service reads through the cache, falls back to Redis on a "
+        "miss and refreshes the entry when it expires. "
+    )
+    return (sentence * (chars // len(sentence) + 1))[:chars]
+
+
+async def legacy_add_message(memory: MemoryService, session_id: str, message) -> None:
+    key = memory._key(session_id)
+    await memory.redis_client.rpush(key, json.dumps(message_to_dict(message)))
+    await memory.redis_client.expire(key, memory.ttl)
+
+
+async def stored_bytes(memory: MemoryService, session_id: str) -> Dict[str, Any]:
+    key = memory._key(session_id)
+    items = await memory.redis_client.lrange(key, 0, -1)
+    try:
+        usage = await memory.redis_client.memory_usage(key)
+    except Exception:
+        usage = None
+    return {"payload_bytes": sum(len(item) for item in items), "memory_usage_bytes": usage}
+
+
+async def run_variant(
+    memory: MemoryService, name: str, args: argparse.Namespace
+) -> Dict[str, Any]:
+    memory.serializer, memory.compress_min_bytes = VARIANTS[name]
+    session_id = f"bench-history-{name}-{uuid.uuid4().hex[:8]}"
+    latencies: List[float] = []
+    trips_before = round_trips()
+
+    start = time.perf_counter()
+    try:
+        for turn in range(args.turns):
+            question = f"Question {turn}: when does the cache entry for service {turn % 5} expire?"
+            answer = make_answer(turn, args.answer_chars)
+            turn_start = time.perf_counter()
+            if name == "two_calls_json":
+                await legacy_add_message(memory, session_id, HumanMessage(content=question))
+                await legacy_add_message(memory, session_id, AIMessage(content=answer))
+            else:
+                await memory.add_turn(session_id, question, answer)
+            latencies.append(time.perf_counter() - turn_start)
+        elapsed = time.perf_counter() - start
+
+        trips = round_trips() - trips_before
+        read_start = time.perf_counter()
+        messages = await memory.get_message(session_id)
+        read_ms = (time.perf_counter() - read_start) * 1000
+        size = await stored_bytes(memory, session_id)
+    finally:
+        await memory.clear_memory(session_id)
+
+    return {
+        "variant": name,
+        **summarize(latencies, elapsed),
+        "round_trips_per_turn": round(trips / args.turns, 2),
+        "messages_kept": len(messages),
+        "read_ms": round(read_ms, 3),
+        **size,
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    memory = MemoryService()
+    memory.max_messages = args.max_messages
+
+    rows = []
+    print(
+        f"{'variant':<24} {'p50 ms':>8} {'p95 ms':>8} {'trips/turn':>10} "
+        f"{'kept':>6} {'payload B':>10} {'read ms':>8}"
+    )
+    for name in args.variants:
+        row = await run_variant(memory, name, args)
+        print(
+            f"{name:<24} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['round_trips_per_turn']:>10} "
+            f"{row['messages_kept']:>6} {row['payload_bytes']:>10} {row['read_ms']:>8}"
+        )
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--answer-chars", type=int, default=1500)
+    parser.add_argument("--max-messages", type=int, default=200)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--fake-redis", action="store_true", help="Use in-process fakeredis")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.fake_redis:
+        from benchmarks.suite import use_fake_redis
+
+        use_fake_redis()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, "history_writes", results)
+
+
+if __name__ == "__main__":
+    main()
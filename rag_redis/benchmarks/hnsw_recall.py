@@ -0,0 +1,193 @@
+"""Recall vs latency of HNSW settings, measured against FLAT ground truth.
+
+The corpus is loaded once under a scratch prefix; one FLAT index and one HNSW
+index per (M, EF_CONSTRUCTION) pair are built over the same keys. Every HNSW
+index is then queried at each EF_RUNTIME and compared with exact FLAT results.
+Vectors are synthetic and clustered (like embeddings of a topical corpus)
+unless --corpus points at the key prefix of an existing index to sample from.
+
+    python -m benchmarks.hnsw_recall --docs 200000 --m 16 32 --ef-construction 200 400 \\
+        --ef-runtime 10 50 100 200 --output hnsw.json
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from redisvl.index import SearchIndex
+from redisvl.query import VectorQuery
+
+from benchmarks.common import percentile, write_results
+from backend.services.index_service import vector_attrs
+from backend.services.redis_pool import RedisPool
+
+PREFIX = "bench:hnsw"
+
+
+def make_corpus(docs: int, dims: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dims)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=docs)
+    vectors = centers[labels] + 0.35 * rng.normal(size=(docs, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def sample_corpus(key_prefix: str, docs: int) -> np.ndarray:
+    client = RedisPool().client
+    vectors = []
+    for key in client.scan_iter(match=f"{key_prefix}:*", count=1000):
+        raw = client.hget(key, "embedding")
+        if raw:
+            vectors.append(np.frombuffer(raw, dtype=np.float32))
+        if len(vectors) >= docs:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def load(vectors: np.ndarray, dtype: str, batch_size: int = 1000) -> None:
+    client = RedisPool().client
+    for start in range(0, len(vectors), batch_size):
+        pipe = client.pipeline(transaction=False)
+        for i, vector in enumerate(vectors[start : start + batch_size], start):
+            pipe.hset(f"{PREFIX}:{i}", mapping={"embedding": vector.astype(dtype).tobytes()})
+        pipe.execute()
+
+
+def create_index(name: str, attrs: Dict[str, Any]) -> float:
+    index = SearchIndex.from_dict(
+        {
+            "index": {"name": name, "prefix": f"{PREFIX}:", "storage_type": "hash"},
+            "fields": [{"name": "embedding", "type": "vector", "attrs": attrs}],
+        },
+        redis_client=RedisPool().client,
+    )
+    start = time.perf_counter()
+    index.create(overwrite=True)
+    while float(index.info().get("percent_indexed", 1)) < 1.0:
+        time.sleep(0.2)
+    return time.perf_counter() - start
+
+
+def run_queries(
+    name: str, queries: np.ndarray, k: int, dtype: str, ef_runtime: int = None
+) -> Dict[str, Any]:
+    index = SearchIndex.from_existing(name, redis_client=RedisPool().client)
+    ids, latencies = [], []
+    for query in queries:
+        vector_query = VectorQuery(
+            vector=query.tolist(),
+            vector_field_name="embedding",
+            return_fields=["id"],
+            num_results=k,
+            dtype=dtype,
+            ef_runtime=ef_runtime,
+        )
+        start = time.perf_counter()
+        results = index.query(vector_query)
+        latencies.append(time.perf_counter() - start)
+        ids.append({result["id"] for result in results})
+    return {"ids": ids, "latencies": latencies}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--corpus", help="Sample FLOAT32 vectors from keys under this prefix")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--distance-metric", default="COSINE")
+    parser.add_argument("--m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[200])
+    parser.add_argument("--ef-runtime", type=int, nargs="+", default=[10, 20, 50, 100, 200])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Leave indexes and keys in Redis")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.corpus:
+        vectors = sample_corpus(args.corpus, args.docs + args.queries)
+        corpus, queries = vectors[: -args.queries], vectors[-args.queries :]
+    else:
+        corpus = make_corpus(args.docs, args.dims, args.clusters, args.seed)
+        queries = make_corpus(args.queries, args.dims, args.clusters, args.seed + 1)
+    dims = corpus.shape[1]
+
+    print(f"Loading {len(corpus)} vectors ({dims} dims, {args.dtype})")
+    load(corpus, args.dtype)
+
+    created: List[str] = []
+    results: List[Dict[str, Any]] = []
+    try:
+        flat_attrs = vector_attrs(dims, "FLAT", args.distance_metric, args.dtype)
+        created.append(f"{PREFIX}:flat")
+        flat_build = create_index(created[-1], flat_attrs)
+        truth = run_queries(created[-1], queries, args.k, args.dtype)
+        results.append(
+            {
+                "algorithm": "FLAT",
+                "build_s": round(flat_build, 2),
+                "recall": 1.0,
+                "p50_ms": round(percentile(truth["latencies"], 50) * 1000, 3),
+                "p99_ms": round(percentile(truth["latencies"], 99) * 1000, 3),
+            }
+        )
+        print(f"FLAT build={flat_build:.1f}s p50={results[-1]['p50_ms']}ms")
+
+        for m in args.m:
+            for ef_construction in args.ef_construction:
+                attrs = vector_attrs(
+                    dims, "HNSW", args.distance_metric, args.dtype,
+                    m=m, ef_construction=ef_construction,
+                )
+                created.append(f"{PREFIX}:hnsw:{m}:{ef_construction}")
+                build = create_index(created[-1], attrs)
+
+                for ef_runtime in args.ef_runtime:
+                    run = run_queries(created[-1], queries, args.k, args.dtype, ef_runtime)
+                    recall = float(
+                        np.mean(
+                            [
+                                len(found & expected) / max(len(expected), 1)
+                                for found, expected in zip(run["ids"], truth["ids"])
+                            ]
+                        )
+                    )
+                    row = {
+                        "algorithm": "HNSW",
+                        "m": m,
+                        "ef_construction": ef_construction,
+                        "ef_runtime": ef_runtime,
+                        "build_s": round(build, 2),
+                        "recall": round(recall, 4),
+                        "p50_ms": round(percentile(run["latencies"], 50) * 1000, 3),
+                        "p99_ms": round(percentile(run["latencies"], 99) * 1000, 3),
+                    }
+                    results.append(row)
+                    print(
+                        f"HNSW M={m:<3} EF_C={ef_construction:<4} EF_R={ef_runtime:<4} "
+                        f"recall@{args.k}={row['recall']:.4f} p50={row['p50_ms']}ms "
+                        f"p99={row['p99_ms']}ms build={row['build_s']}s"
+                    )
+    finally:
+        if not args.keep:
+            client = RedisPool().client
+            for name in created:
+                client.execute_command("FT.DROPINDEX", name)
+            keys = list(client.scan_iter(match=f"{PREFIX}:*", count=1000))
+            for start in range(0, len(keys), 1000):
+                client.delete(*keys[start : start + 1000])
+
+    if args.output:
+        write_results(
+            args.output,
+            "hnsw_recall",
+            {"docs": len(corpus), "dims": dims, "k": args.k, "dtype": args.dtype, "runs": results},
+        )
+
+
+if __name__ == "__main__":
+    main()
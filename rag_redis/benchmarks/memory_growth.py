@@ -0,0 +1,107 @@
+"""Replay long sessions through MemoryService in full and bounded mode.
+
+For every turn the script measures the history fetch latency and the size of
+the history block that would be sent to Ollama. Summaries are produced by a
+stand-in model so the run needs Redis but not Ollama.
+
+    python -m benchmarks.memory_growth --turns 200 --output memory.json
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from benchmarks.common import write_results
+from backend.services.memory_service import MemoryService
+
+
+class TruncatingSummarizer:
+    """Returns the tail of the prompt, standing in for an LLM summary."""
+
+    def __init__(self, max_chars: int = 1200):
+        self.max_chars = max_chars
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        return AIMessage(content=prompt[-self.max_chars:])
+
+
+def make_turn(turn: int) -> tuple:
+    question = f"Question {turn}: how does component {turn % 7} interact with cache layer {turn % 3}?"
+    answer = (
+        f"Answer {turn}: component {turn % 7} reads through the cache layer, "
+        "falls back to Redis on a miss and records the latency. " * 4
+    )
+    return HumanMessage(content=question), AIMessage(content=answer)
+
+
+async def replay(memory_service: MemoryService, mode: str, turns: int) -> List[Dict[str, Any]]:
+    memory_service.mode = mode
+    session_id = f"bench-memory-{mode}-{uuid.uuid4().hex[:8]}"
+    rows = []
+
+    try:
+        for turn in range(1, turns + 1):
+            start = time.perf_counter()
+            variables = await memory_service.get_memory_variables(session_id)
+            fetch_ms = (time.perf_counter() - start) * 1000
+
+            history = variables[memory_service.memory_key]
+            rows.append(
+                {
+                    "turn": turn,
+                    "fetch_ms": round(fetch_ms, 3),
+                    "history_chars": len(history),
+                    "history_tokens": count_tokens_approximately(
+                        [HumanMessage(content=history)]
+                    ),
+                }
+            )
+
+            question, answer = make_turn(turn)
+            await memory_service.add_turn(session_id, question.content, answer.content)
+            await memory_service.summarize_if_needed(session_id)
+    finally:
+        await memory_service.clear_memory(session_id)
+
+    return rows
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    memory_service = MemoryService()
+    memory_service.llm = TruncatingSummarizer()
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = await replay(memory_service, mode, args.turns)
+
+    checkpoints = [t for t in (1, 10, 50, 100, 150, 200, args.turns) if t <= args.turns]
+    print(f"{'turn':>5} " + " ".join(f"{m + ' tokens':>15} {m + ' ms':>10}" for m in args.modes))
+    for turn in sorted(set(checkpoints)):
+        cells = []
+        for mode in args.modes:
+            row = results[mode][turn - 1]
+            cells.append(f"{row['history_tokens']:>15} {row['fetch_ms']:>10.3f}")
+        print(f"{turn:>5} " + " ".join(cells))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["full", "bounded"])
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, "memory_growth", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Latency of routed generations over several fake Ollama backends, with and
+without hedging.
+
+Each --first-token-ms value starts one fake backend with that time to first
+token, so one slow node among fast ones shows what least-outstanding routing
+and hedging do to the tail. --dead adds an unreachable backend to exercise
+failover and health checks.
+
+    python -m benchmarks.ollama_routing --first-token-ms 50 50 400 --concurrency 1 4 8
+"""
+
+import argparse
+import asyncio
+from typing import Any, Dict, List
+
+from benchmarks.common import closed_loop, write_results
+from benchmarks.fake_ollama import FakeOllamaConfig, serve_in_thread
+from backend.services.llm_scheduler import LLMScheduler
+from backend.services.ollama_router import OllamaRouter, RoutedChatOllama
+
+
+async def run_config(
+    urls: List[str], hedge: bool, args: argparse.Namespace
+) -> List[Dict[str, Any]]:
+    # Admission as in the app: one slot per fake backend slot, and hedged
+    # copies only go out on a free one.
+    scheduler = LLMScheduler(
+        max_concurrency=args.slots * len(urls), max_queue=max(args.concurrency)
+    )
+    router = OllamaRouter(
+        urls,
+        args.model,
+        scheduler=scheduler,
+        backend_concurrency=args.slots,
+        hedge_enabled=hedge,
+        hedge_percentile=args.hedge_percentile,
+        hedge_min_samples=args.hedge_min_samples,
+    )
+    llm = RoutedChatOllama(base_url=urls[0], model=args.model).with_router(router)
+    await router.check_health()
+
+    # Gives the hedging percentile its samples before anything is measured.
+    for _ in range(args.hedge_min_samples):
+        await llm.ainvoke("warm-up")
+
+    levels = []
+    for concurrency in args.concurrency:
+        async def call(i: int) -> None:
+            async with scheduler.slot():
+                await llm.ainvoke(f"question {i}")
+
+        level = await closed_loop(call, concurrency, args.requests)
+        stats = router.stats()
+        level.update(
+            {
+                "hedge": hedge,
+                "hedged": stats["hedged"],
+                "hedges_won": stats["hedges_won"],
+                "hedges_skipped": stats["hedges_skipped"],
+                "failovers": stats["failovers"],
+                "requests_per_backend": [b["requests"] for b in stats["backends"]],
+            }
+        )
+        print(
+            f"hedge={str(hedge):<5} c={concurrency:<4} rps={level['throughput_rps']:<8} "
+            f"p50={level['p50_ms']}ms p95={level['p95_ms']}ms p99={level['p99_ms']}ms "
+            f"hedged={level['hedged']} skipped={level['hedges_skipped']} per_backend={level['requests_per_backend']}"
+        )
+        levels.append(level)
+    return levels
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    urls = [
+        serve_in_thread(
+            FakeOllamaConfig(
+                args.model, first_token_ms, args.tokens_per_second, args.tokens, args.slots
+            )
+        )
+        for first_token_ms in args.first_token_ms
+    ]
+    if args.dead:
+        urls.append("http://127.0.0.1:9")
+
+    results = {"backends": args.first_token_ms, "dead": args.dead, "runs": []}
+    for hedge in (False, True):
+        results["runs"].extend(await run_config(urls, hedge, args))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--first-token-ms", type=float, nargs="+", default=[50, 50, 400])
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--tokens", type=int, default=16)
+    parser.add_argument("--slots", type=int, default=4, help="Parallel requests per backend")
+    parser.add_argument("--dead", action="store_true")
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--hedge-percentile", type=float, default=95.0)
+    parser.add_argument("--hedge-min-samples", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, "ollama_routing", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Per-turn prefill of one chat session in the old and new prompt layouts.
+
+The old layout put the retrieved context and a sliding window of history in the
+system message and sent the flattened text to /api/generate, so every turn
+changed the prompt near its start. The new layout sends messages to /api/chat
+with a constant system prompt, append-only history and the context in the last
+turn. Ollama reports prompt_eval_count and prompt_eval_duration for what it had
+to evaluate, which is what a reused KV-cache prefix saves.
+
+Runs against the fake server (prefill simulated per uncached token) or a real
+Ollama given with --ollama:
+
+    python -m benchmarks.prefill_reuse --turns 12 --output prefill.json
+    python -m benchmarks.prefill_reuse --ollama http://localhost:11434 --model llama2
+"""
+
+import argparse
+import asyncio
+import statistics
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from benchmarks.common import write_results
+from benchmarks.fake_ollama import FakeOllamaConfig, serve_in_thread
+from backend.services.ollama_router import OllamaRouter, RoutedChatOllama
+from backend.services.rag_service import CONTEXT_TURN, SYSTEM_PROMPT
+
+OLD_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a helpful AI assistant. Use the following context and conversation history to answer the user's question.
+                Context: {context}
+                Conversation History: {chat_history}
+                Please provide a helpful, accurate response based on the context and conversation history. If the context doesn't contain relevant information, say so politely.""",
+        ),
+        ("human", "{question}"),
+    ]
+)
+
+NEW_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYSTEM_PROMPT),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", CONTEXT_TURN),
+    ]
+)
+
+
+def make_context(turn: int, chunks: int) -> str:
+    return "\n\n".join(
+        f"Document {turn}-{i}: section {turn * chunks + i} explains how service "
+        f"{(turn + i) % 5} caches results in Redis and when entries expire."
+        for i in range(chunks)
+    )
+
+
+def make_question(turn: int) -> str:
+    return f"Turn {turn}: how does service {turn % 5} decide when to refresh its cache?"
+
+
+async def run_old(urls: List[str], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    router = OllamaRouter(urls, args.model)
+    history: List[BaseMessage] = []
+    rows = []
+    for turn in range(1, args.turns + 1):
+        window = history[-args.window * 2:]
+        question = make_question(turn)
+        prompt = OLD_PROMPT.format_prompt(
+            context=make_context(turn, args.chunks),
+            chat_history="\n".join(f"{m.type}: {m.content}" for m in window),
+            question=question,
+        )
+        params = {
+            "model": args.model,
+            "prompt": prompt.to_string(),
+            "stream": True,
+            "options": {"num_predict": args.num_predict},
+            "keep_alive": "5m",
+        }
+        text = ""
+        async for part in router.astream(lambda client: client.generate(**params)):
+            text += part.response
+            if part.done:
+                metadata = part.model_dump()
+        rows.append(row(turn, metadata))
+        history.extend([HumanMessage(content=question), AIMessage(content=text)])
+    return rows
+
+
+async def run_new(urls: List[str], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    router = OllamaRouter(urls, args.model)
+    llm = RoutedChatOllama(
+        base_url=urls[0], model=args.model, num_predict=args.num_predict, keep_alive="5m"
+    ).with_router(router)
+    history: List[BaseMessage] = []
+    rows = []
+    for turn in range(1, args.turns + 1):
+        question = make_question(turn)
+        prompt = NEW_PROMPT.format_prompt(
+            context=make_context(turn, args.chunks),
+            chat_history=history,
+            question=question,
+        )
+        message = await llm.ainvoke(prompt)
+        rows.append(row(turn, message.response_metadata))
+        history.extend([HumanMessage(content=question), AIMessage(content=message.content)])
+    return rows
+
+
+def row(turn: int, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "turn": turn,
+        "prompt_eval_count": metadata.get("prompt_eval_count"),
+        "prompt_eval_ms": round(metadata.get("prompt_eval_duration", 0) / 1e6, 2),
+    }
+
+
+def summarize_layout(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # The first turn has nothing to reuse in either layout.
+    later = rows[1:] or rows
+    return {
+        "mean_prefill_tokens": round(statistics.mean(r["prompt_eval_count"] or 0 for r in later), 1),
+        "mean_prefill_ms": round(statistics.mean(r["prompt_eval_ms"] for r in later), 2),
+        "last_prefill_ms": rows[-1]["prompt_eval_ms"],
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.ollama == "fake":
+        urls = [
+            serve_in_thread(
+                FakeOllamaConfig(
+                    args.model,
+                    first_token_ms=20,
+                    tokens_per_second=500,
+                    tokens=args.num_predict,
+                    prefill_ms_per_token=args.prefill_ms_per_token,
+                )
+            )
+        ]
+    else:
+        urls = [args.ollama]
+
+    results: Dict[str, Any] = {"turns": args.turns, "chunks": args.chunks}
+    for layout, runner in (("old", run_old), ("new", run_new)):
+        rows = await runner(urls, args)
+        results[layout] = {"rows": rows, **summarize_layout(rows)}
+
+    print(f"{'turn':>5} {'old tokens':>11} {'old ms':>9} {'new tokens':>11} {'new ms':>9}")
+    for old, new in zip(results["old"]["rows"], results["new"]["rows"]):
+        print(
+            f"{old['turn']:>5} {old['prompt_eval_count']:>11} {old['prompt_eval_ms']:>9} "
+            f"{new['prompt_eval_count']:>11} {new['prompt_eval_ms']:>9}"
+        )
+    for layout in ("old", "new"):
+        summary = {k: v for k, v in results[layout].items() if k != "rows"}
+        print(f"{layout}: {summary}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ollama", default="fake", help="'fake' or an Ollama base URL")
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--chunks", type=int, default=4, help="Retrieved chunks per turn")
+    parser.add_argument("--window", type=int, default=6, help="Turns of history in the old layout")
+    parser.add_argument("--num-predict", type=int, default=48)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, "prefill_reuse", results)
+
+
+if __name__ == "__main__":
+    main()
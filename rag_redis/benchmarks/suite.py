@@ -0,0 +1,414 @@
+"""End-to-end benchmark suite: chunking, embedding, ingestion, /search and /chat.
+
+The API is exercised in process through httpx's ASGI transport (with the app's
+lifespan running, so warm-up, pools and caches behave as when served), or over
+HTTP with --base-url. Ollama is replaced by benchmarks.fake_ollama, which
+streams tokens at a fixed rate after a fixed time to first token, so /chat
+numbers measure the service and not the model. Redis is the local Redis Stack
+(``docker compose -f backend/docker-compose.yml up redis-stack``) or, with
+--redis fake, an in-process fakeredis server; fakeredis has no RediSearch, so
+only the scenarios that do not query an index run against it.
+
+    python -m benchmarks.suite --embeddings fake --output before.json
+    python -m benchmarks.suite --embeddings fake --output after.json
+    python -m benchmarks.suite --compare before.json after.json --threshold 0.1
+
+Against a running server, start the stand-in and point the server at it
+(OLLAMA_BASE_URL=http://127.0.0.1:11435):
+
+    python -m benchmarks.fake_ollama --port 11435
+    python -m benchmarks.suite --base-url http://localhost:8000 --scenarios search chat
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.common import closed_loop, summarize, write_results
+from benchmarks.embedding_batching import SimulatedEmbeddings
+from benchmarks.fake_ollama import FakeOllamaConfig, serve_in_thread
+from backend.config import settings
+
+SCENARIOS = ["chunking", "embedding", "ingestion", "search", "chat"]
+# Scenarios that need RediSearch, which fakeredis does not implement.
+INDEX_SCENARIOS = {"ingestion", "search", "chat"}
+
+TOPICS = {
+    "databases": "redis index query key value store memory persistence replication cluster shard",
+    "ml": "model training embedding vector gradient inference dataset feature network layer",
+    "web": "http request response server client latency cache header route middleware api",
+    "python": "function module package interpreter coroutine generator typing class object list",
+}
+
+
+class FakeEmbeddings(SimulatedEmbeddings):
+    """SimulatedEmbeddings that return deterministic unit vectors, so texts on
+    the same topic land near each other and KNN results are meaningful."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        super().embed_documents(texts)
+        return [self._vector(text) for text in texts]
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for word in text.lower().split():
+            seed = int.from_bytes(hashlib.sha256(word.encode()).digest()[:4], "little")
+            vector += np.random.default_rng(seed).standard_normal(self.dims).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+
+def make_corpus(docs: int, words: int, seed: int) -> List[Dict[str, str]]:
+    rng = np.random.default_rng(seed)
+    names = sorted(TOPICS)
+    corpus = []
+    for i in range(docs):
+        topic = names[i % len(names)]
+        vocabulary = TOPICS[topic].split() + "the a of and to in is for with on".split()
+        sentences = []
+        for _ in range(max(1, words // 12)):
+            sentence = " ".join(rng.choice(vocabulary, size=12))
+            sentences.append(sentence.capitalize() + ".")
+        corpus.append({"topic": topic, "text": " ".join(sentences)})
+    return corpus
+
+
+def make_questions(count: int, run_id: str) -> List[str]:
+    # Every question is unique within and across runs, so the answer, LLM and
+    # embedding caches never serve a result from a previous run.
+    names = sorted(TOPICS)
+    questions = []
+    for i in range(count):
+        words = TOPICS[names[i % len(names)]].split()
+        first, second = words[i % len(words)], words[(i + 3) % len(words)]
+        questions.append(f"How do {first} and {second} relate? ({run_id}-{i})")
+    return questions
+
+
+def use_fake_redis() -> None:
+    """Point the shared pools at one in-process fakeredis server."""
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("--redis fake needs fakeredis: pip install fakeredis")
+    import redis
+    import redis.asyncio as aioredis
+
+    from backend.services.redis_pool import RedisPool, TimedAsyncRedis, TimedRedis
+
+    server = fakeredis.FakeServer()
+    pool = RedisPool()
+    pool._pool = redis.BlockingConnectionPool(
+        connection_class=fakeredis.FakeConnection,
+        server=server,
+        max_connections=pool.max_connections,
+    )
+    pool._client = TimedRedis(connection_pool=pool._pool)
+    pool._async_pool = aioredis.BlockingConnectionPool(
+        connection_class=fakeredis.FakeAsyncConnection,
+        server=server,
+        max_connections=pool.max_connections,
+    )
+    pool._async_client = TimedAsyncRedis(connection_pool=pool._async_pool)
+
+
+def use_fake_embeddings(call_ms: float, item_ms: float, dims: int) -> None:
+    from backend.services.embedding_service import EmbeddingService
+
+    # The fake model still goes through the batching and caching layers.
+    service = EmbeddingService()
+    service.create_model = lambda *args, **kwargs: FakeEmbeddings(call_ms, item_ms, dims)
+
+
+@asynccontextmanager
+async def api_client(base_url: Optional[str], timeout: float) -> AsyncIterator[httpx.AsyncClient]:
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+            yield client
+        return
+
+    from backend.app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=timeout
+        ) as client:
+            yield client
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"Service was not ready within {timeout}s")
+
+
+async def bench_chunking(corpus: List[Dict[str, str]], requests: int) -> Dict[str, Any]:
+    from backend.services.document_service import DocumentService
+
+    service = DocumentService()
+    chunks = 0
+
+    async def call(i: int) -> None:
+        nonlocal chunks
+        doc = corpus[i % len(corpus)]
+        documents = service.create_documents_from_texts([doc["text"]], [{"source": f"bench-{i}"}])
+        chunks += len(documents)
+
+    # Splitting is CPU bound and holds the GIL, so only one level is meaningful.
+    level = await closed_loop(call, 1, requests)
+    level["chunks"] = chunks
+    return {"levels": [level]}
+
+
+async def bench_embedding(
+    questions: List[str], levels: List[int], requests: int
+) -> Dict[str, Any]:
+    from backend.services.embedding_service import EmbeddingService
+
+    embeddings = EmbeddingService().embeddings
+    loop = asyncio.get_running_loop()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(levels)) as executor:
+        for concurrency in levels:
+            offset = len(results) * requests
+
+            async def call(i: int) -> None:
+                await loop.run_in_executor(
+                    executor, embeddings.embed_query, questions[(offset + i) % len(questions)]
+                )
+
+            results.append(await closed_loop(call, concurrency, requests))
+            print_level("embedding", results[-1])
+    return {"levels": results}
+
+
+async def bench_ingestion(
+    client: httpx.AsyncClient, corpus: List[Dict[str, str]], run_id: str
+) -> Dict[str, Any]:
+    # The API only ingests under its ingest root; with --base-url the server
+    # must share this root on the same filesystem.
+    os.makedirs(settings.ingest_root, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="bench-ingest-", dir=settings.ingest_root) as directory:
+        for i, doc in enumerate(corpus):
+            with open(os.path.join(directory, f"{run_id}-{i}.txt"), "w") as f:
+                f.write(doc["text"])
+
+        start = time.perf_counter()
+        response = await client.post("/documents/ingest", json={"paths": [directory]})
+        response.raise_for_status()
+        elapsed = time.perf_counter() - start
+
+    stats = response.json()
+    level = {"concurrency": 1, **summarize([elapsed], elapsed), "errors": 0}
+    level["throughput_rps"] = round(len(corpus) / elapsed, 2) if elapsed else 0.0
+    print(
+        f"ingestion   files={stats.get('files')} chunks={stats.get('chunks_written')} "
+        f"docs/s={level['throughput_rps']} chunks/s={stats.get('chunks_per_second')}"
+    )
+    return {"levels": [level], "ingest": stats}
+
+
+async def bench_search(
+    client: httpx.AsyncClient, questions: List[str], levels: List[int], requests: int, k: int
+) -> Dict[str, Any]:
+    results = []
+    for n, concurrency in enumerate(levels):
+        async def call(i: int) -> None:
+            question = questions[(n * requests + i) % len(questions)]
+            response = await client.get("/search", params={"query": question, "k": k})
+            response.raise_for_status()
+
+        results.append(await closed_loop(call, concurrency, requests))
+        print_level("search", results[-1])
+    return {"levels": results}
+
+
+async def bench_chat(
+    client: httpx.AsyncClient, questions: List[str], levels: List[int], requests: int
+) -> Dict[str, Any]:
+    results = []
+    for n, concurrency in enumerate(levels):
+        async def call(i: int) -> None:
+            question = questions[(n * requests + i) % len(questions)]
+            response = await client.post(
+                "/chat",
+                params={
+                    "question": question,
+                    "session_id": f"bench-{i % concurrency}",
+                    "use_memory": False,
+                },
+            )
+            response.raise_for_status()
+            if not response.json().get("success", True):
+                raise RuntimeError(response.json().get("response"))
+
+        results.append(await closed_loop(call, concurrency, requests))
+        print_level("chat", results[-1])
+    return {"levels": results}
+
+
+def print_level(name: str, level: Dict[str, Any]) -> None:
+    print(
+        f"{name:<11} c={level['concurrency']:<4} rps={level['throughput_rps']:<9} "
+        f"p50={level['p50_ms']}ms p95={level['p95_ms']}ms p99={level['p99_ms']}ms "
+        f"errors={level['errors']}"
+    )
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex[:8]
+    scenarios = [s for s in SCENARIOS if s in args.scenarios]
+    if args.redis == "fake" and not args.base_url:
+        skipped = [s for s in scenarios if s in INDEX_SCENARIOS]
+        if skipped:
+            print(f"Skipping {', '.join(skipped)}: fakeredis has no RediSearch")
+        scenarios = [s for s in scenarios if s not in INDEX_SCENARIOS]
+
+    corpus = make_corpus(args.docs, args.words, args.seed)
+    total = args.requests * len(args.concurrency)
+    questions = make_questions(total, run_id)
+    results: Dict[str, Any] = {}
+
+    if "chunking" in scenarios:
+        results["chunking"] = await bench_chunking(corpus, args.requests)
+        print_level("chunking", results["chunking"]["levels"][0])
+    if "embedding" in scenarios:
+        results["embedding"] = await bench_embedding(questions, args.concurrency, args.requests)
+
+    api_scenarios = [s for s in scenarios if s in ("ingestion", "search", "chat")]
+    if api_scenarios:
+        async with api_client(args.base_url, args.timeout) as client:
+            await wait_until_ready(client, args.ready_timeout)
+            if "ingestion" in api_scenarios:
+                results["ingestion"] = await bench_ingestion(client, corpus, run_id)
+            if "search" in api_scenarios:
+                results["search"] = await bench_search(
+                    client, questions, args.concurrency, args.requests, args.k
+                )
+            if "chat" in api_scenarios:
+                results["chat"] = await bench_chat(
+                    client, questions, args.concurrency, args.requests
+                )
+
+    return results
+
+
+def compare(before_path: str, after_path: str, threshold: float) -> bool:
+    """Print per-level deltas and return True if any level regressed by more
+    than ``threshold`` in throughput or p95 latency."""
+    with open(before_path) as f:
+        before = json.load(f)["results"]["scenarios"]
+    with open(after_path) as f:
+        after = json.load(f)["results"]["scenarios"]
+
+    regressed = False
+    print(f"{'scenario':<11} {'c':>4} {'rps before':>11} {'rps after':>10} {'p95 before':>11} {'p95 after':>10}")
+    for name, scenario in before.items():
+        other_levels = {
+            level["concurrency"]: level for level in after.get(name, {}).get("levels", [])
+        }
+        for level in scenario["levels"]:
+            other = other_levels.get(level["concurrency"])
+            if other is None:
+                continue
+            slower = level["throughput_rps"] and (
+                other["throughput_rps"] < level["throughput_rps"] * (1 - threshold)
+            )
+            later = level["p95_ms"] and other["p95_ms"] > level["p95_ms"] * (1 + threshold)
+            flag = "  REGRESSION" if slower or later else ""
+            regressed = regressed or bool(flag)
+            print(
+                f"{name:<11} {level['concurrency']:>4} {level['throughput_rps']:>11} "
+                f"{other['throughput_rps']:>10} {level['p95_ms']:>11} {other['p95_ms']:>10}{flag}"
+            )
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per concurrency level")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--redis", default="stack", help="'stack' (REDIS_URL), 'fake', or a Redis URL")
+    parser.add_argument("--index-name", default="bench", help="Index used by the in-process app")
+    parser.add_argument("--embeddings", choices=["fake", "model"], default="model")
+    parser.add_argument("--embed-call-ms", type=float, default=8.0)
+    parser.add_argument("--embed-item-ms", type=float, default=0.5)
+    parser.add_argument("--embed-dims", type=int, default=384)
+    parser.add_argument("--ollama", default="fake", help="'fake' or the URL of a real Ollama")
+    parser.add_argument("--first-token-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--ollama-concurrency", type=int, default=0, help="Fake Ollama parallel slots, 0 = unlimited")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    # Settings are read when the services are first created, which happens in
+    # the app's lifespan, so they can still be overridden here.
+    if not args.base_url:
+        settings.index_name = args.index_name
+        if args.redis == "fake":
+            use_fake_redis()
+        elif args.redis != "stack":
+            settings.redis_url = args.redis
+        if args.ollama == "fake":
+            settings.ollama_base_url = serve_in_thread(
+                FakeOllamaConfig(
+                    settings.ollama_model,
+                    args.first_token_ms,
+                    args.tokens_per_second,
+                    args.tokens,
+                    args.ollama_concurrency,
+                )
+            )
+        else:
+            settings.ollama_base_url = args.ollama
+    if args.embeddings == "fake":
+        # A separate model name keeps fake vectors out of the real embedding cache.
+        settings.embedding_model = "bench-fake-embeddings"
+        use_fake_embeddings(args.embed_call_ms, args.embed_item_ms, args.embed_dims)
+
+    scenarios = asyncio.run(run(args))
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "compare", "threshold")
+    }
+    if args.output:
+        write_results(args.output, "suite", {"label": args.label, "config": config, "scenarios": scenarios})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""A reindex run while the service is up: queries and writes must follow the
+alias to the new index, including a change of vector datatype."""
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+import redis
+from langchain.schema import Document
+
+from benchmarks.suite import FakeEmbeddings
+from backend.config import settings
+from backend.services.index_service import IndexService
+from backend.services.redis_pool import RedisPool
+from backend.services.redis_service import RedisService
+
+pytestmark = [pytest.mark.integration, pytest.mark.redis, pytest.mark.asyncio]
+
+DIMS = 16
+
+
+def redis_stack_available() -> bool:
+    try:
+        redis.Redis.from_url(settings.redis_url).execute_command("FT._LIST")
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def live_service(monkeypatch):
+    if not redis_stack_available():
+        pytest.skip(f"needs Redis Stack at {settings.redis_url}")
+
+    alias = f"test-reindex-{uuid.uuid4().hex[:8]}"
+    embeddings = FakeEmbeddings(0, 0, DIMS)
+    monkeypatch.setattr(settings, "index_name", alias)
+    monkeypatch.setattr(settings, "vector_datatype", "FLOAT32")
+    # Only a failed query may trigger the alias check, so the test covers the
+    # path a request takes right after the swap.
+    monkeypatch.setattr(settings, "index_refresh_interval", 3600.0)
+    monkeypatch.setattr(
+        "backend.services.redis_service.EmbeddingService",
+        lambda: SimpleNamespace(embeddings=embeddings),
+    )
+    monkeypatch.setattr(
+        "backend.services.ingestion_service.EmbeddingService",
+        lambda: SimpleNamespace(uncached_embeddings=embeddings),
+    )
+    monkeypatch.setattr(RedisService, "_instance", None)
+
+    service = RedisService()
+    yield service, embeddings
+
+    client = RedisPool().client
+    try:
+        client.execute_command("FT.DROPINDEX", service.physical_index_name, "DD")
+    except redis.ResponseError:
+        pass
+    try:
+        client.execute_command("FT.ALIASDEL", alias)
+    except redis.ResponseError:
+        pass
+    for key in client.scan_iter(match=f"{alias}*"):
+        client.delete(key)
+    for key in client.scan_iter(match=f"manifest:{alias}:*"):
+        client.delete(key)
+
+
+def chunk(chunk_id: str, text: str) -> Document:
+    return Document(page_content=text, metadata={"chunk_id": chunk_id, "source": "test"})
+
+
+async def test_queries_and_writes_follow_a_reindex(live_service):
+    service, embeddings = live_service
+    service.add_documents(
+        [
+            chunk("a", "redis index query key value store"),
+            chunk("b", "model training embedding vector gradient"),
+        ]
+    )
+    vector = embeddings.embed_query("redis index query")
+
+    before = await service.asimilarity_search_by_vector_with_score(vector, 2)
+    assert [doc.metadata["chunk_id"] for doc, _ in before][0] == "a"
+
+    stats = IndexService().reindex(datatype="float16", drop_old=True)
+    new_index = stats["new_index"]
+
+    after = await service.asimilarity_search_by_vector_with_score(vector, 2)
+    assert [doc.metadata["chunk_id"] for doc, _ in after][0] == "a"
+    assert service.physical_index_name == new_index
+    assert service.vector_store.config.vector_datatype.upper() == "FLOAT16"
+
+    service.add_documents([chunk("c", "http request response server cache")])
+    client = RedisPool().client
+    assert client.exists(f"{new_index}:c")
+    found = await service.asimilarity_search_by_vector_with_score(
+        embeddings.embed_query("http request response"), 1
+    )
+    assert found[0][0].metadata["chunk_id"] == "c"
+
+
+async def test_ingestion_writes_under_the_live_prefix(live_service):
+    from backend.services.ingestion_service import IngestionService
+
+    service, _ = live_service
+    ingestion = IngestionService()
+    service.add_documents([chunk("a", "redis index query key value store")])
+
+    stats = IndexService().reindex(datatype="float16", drop_old=True)
+    ingestion._write_batch(
+        [chunk("d", "python function module package")], [[0.25] * DIMS]
+    )
+
+    assert RedisPool().client.exists(f"{stats['new_index']}:d")
+    assert ingestion._document_key("d") == f"{stats['new_index']}:d"
@@ -0,0 +1,57 @@
+import pytest
+from langchain.schema import Document
+
+from backend.services.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def answer_cache():
+    AnswerCache._instance = None
+    yield AnswerCache()
+    AnswerCache._instance = None
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What is my name?",
+        "What did I ask you before?",
+        "Remind me what my budget was",
+        "what was my first question",
+        "What have we covered so far?",
+        "Summarize our conversation",
+        "What did you say earlier about eviction?",
+        "How does it work?",
+        "And what about replicas?",
+    ],
+)
+def test_questions_about_the_user_or_conversation_are_follow_ups(question):
+    assert AnswerCache.is_follow_up(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What is a vector database and how does it work?",
+        "How does Redis persistence work?",
+        "Explain this error: connection refused",
+    ],
+)
+def test_standalone_questions_are_not_follow_ups(question):
+    assert not AnswerCache.is_follow_up(question)
+
+
+def test_personal_question_is_keyed_on_history(answer_cache):
+    docs = [Document(page_content="Budgets are set per project.", metadata={"chunk_id": "c1"})]
+    alice = "human: my budget is 500\nai: noted"
+    bob = "human: my budget is 900\nai: noted"
+
+    question = "Remind me what my budget was"
+    assert answer_cache.make_key(question, docs, alice) != answer_cache.make_key(
+        question, docs, bob
+    )
+
+    standalone = "How are budgets set?"
+    assert answer_cache.make_key(standalone, docs, alice) == answer_cache.make_key(
+        standalone, docs, bob
+    )
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from langchain.globals import set_llm_cache
+from langchain_core.caches import InMemoryCache
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from backend.services.llm_scheduler import AdmissionRejected, LLMScheduler
+from backend.services.llm_service import LLMService
+from backend.services.rag_service import RAGService
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def rag():
+    set_llm_cache(InMemoryCache())
+    llm_service = LLMService()
+    saved = llm_service.scheduler
+    # Every slot busy and no room to queue.
+    llm_service.scheduler = LLMScheduler(max_concurrency=1, max_queue=0, queue_timeout=1)
+    llm_service.scheduler._active = 1
+
+    async def remember(key, value):
+        written[key] = value
+
+    written = {}
+    rag = object.__new__(RAGService)
+    rag.llm_service = llm_service
+    rag.llm = llm_service.generation_llm
+    rag.answer_cache = SimpleNamespace(set=remember, written=written)
+    yield rag
+    llm_service.scheduler = saved
+    set_llm_cache(None)
+
+
+def prepared():
+    return {
+        "prompt": ChatPromptTemplate.from_messages([("human", "{question}")]),
+        "inputs": {"question": "What is Redis?"},
+        "cache_key": "answer:1",
+        "session_id": "s",
+    }
+
+
+async def store_answer(rag: RAGService, text: str) -> None:
+    request = prepared()
+    prompt = await request["prompt"].ainvoke(request["inputs"])
+    await rag.llm_service.store(prompt.to_messages(), AIMessage(content=text))
+
+
+async def test_cache_hit_is_answered_without_a_slot(rag):
+    await store_answer(rag, "An in-memory store.")
+
+    assert await rag._answer(prepared(), 0, None) == "An in-memory store."
+    assert rag.answer_cache.written == {"answer:1": "An in-memory store."}
+    assert rag.llm_service.scheduler.stats()["rejected_full"] == 0
+
+
+async def test_streamed_cache_hit_is_answered_without_a_slot(rag):
+    await store_answer(rag, "An in-memory store.")
+
+    chunks = [chunk async for chunk in rag._answer_stream(prepared(), 0, None)]
+    assert chunks == ["An in-memory store."]
+    assert rag.llm_service.scheduler.stats()["rejected_full"] == 0
+
+
+async def test_cache_miss_still_needs_a_slot(rag):
+    with pytest.raises(AdmissionRejected) as rejected:
+        await asyncio.wait_for(rag._answer(prepared(), 0, None), timeout=1)
+    assert rejected.value.status_code == 429
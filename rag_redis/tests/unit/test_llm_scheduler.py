@@ -0,0 +1,178 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.services.llm_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AdmissionRejected,
+    LLMScheduler,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def queued(scheduler: LLMScheduler, count: int) -> None:
+    """Let pending acquire() calls reach the wait queue."""
+    for _ in range(100):
+        if scheduler.queue_depth >= count:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"expected {count} waiters, found {scheduler.queue_depth}")
+
+
+async def test_full_queue_is_rejected_with_429():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout=5)
+    await scheduler.acquire()
+    waiter = asyncio.ensure_future(scheduler.acquire())
+    await queued(scheduler, 1)
+
+    assert scheduler.saturated()
+    with pytest.raises(AdmissionRejected) as rejected:
+        await scheduler.acquire()
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+    with pytest.raises(AdmissionRejected):
+        scheduler.check()
+
+    scheduler.release(0.0)
+    await waiter
+    scheduler.release(0.0)
+    assert scheduler.stats()["active"] == 0
+
+
+async def test_deadline_expiry_is_rejected_with_503():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=4, queue_timeout=5)
+    await scheduler.acquire()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await scheduler.acquire(deadline=time.monotonic() + 0.05)
+    assert rejected.value.status_code == 503
+    assert scheduler.queue_depth == 0
+    assert scheduler.stats()["expired"] == 1
+
+    scheduler.release(0.0)
+    assert scheduler.stats()["active"] == 0
+
+
+async def test_cancelled_waiter_does_not_keep_the_slot():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=4, queue_timeout=5)
+    await scheduler.acquire()
+    first = asyncio.ensure_future(scheduler.acquire())
+    second = asyncio.ensure_future(scheduler.acquire())
+    await queued(scheduler, 2)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert scheduler.queue_depth == 1
+
+    scheduler.release(0.0)
+    await asyncio.wait_for(second, timeout=1)
+    assert scheduler.stats()["active"] == 1
+
+    scheduler.release(0.0)
+    assert scheduler.stats()["active"] == 0
+
+
+async def test_slot_handed_to_a_waiter_cancelled_in_the_same_tick_is_passed_on():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=4, queue_timeout=5)
+    await scheduler.acquire()
+    first = asyncio.ensure_future(scheduler.acquire())
+    second = asyncio.ensure_future(scheduler.acquire())
+    await queued(scheduler, 2)
+
+    # The slot goes to the first waiter, which is cancelled before it wakes up.
+    scheduler.release(0.0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    await asyncio.wait_for(second, timeout=1)
+    assert scheduler.stats()["active"] == 1
+    scheduler.release(0.0)
+    assert scheduler.stats()["active"] == 0
+
+
+async def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=8, queue_timeout=5)
+    await scheduler.acquire()
+    order = []
+
+    async def run(name: str, priority: int) -> None:
+        async with scheduler.slot(priority):
+            order.append(name)
+
+    arrivals = [
+        ("background", PRIORITY_BACKGROUND),
+        ("batch", PRIORITY_BATCH),
+        ("interactive-1", PRIORITY_INTERACTIVE),
+        ("interactive-2", PRIORITY_INTERACTIVE),
+    ]
+    tasks = []
+    for name, priority in arrivals:
+        tasks.append(asyncio.ensure_future(run(name, priority)))
+        await queued(scheduler, len(tasks))
+
+    scheduler.release(0.0)
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+
+    assert order == ["interactive-1", "interactive-2", "batch", "background"]
+    assert scheduler.stats()["active"] == 0
+
+
+async def test_try_acquire_only_takes_idle_capacity():
+    scheduler = LLMScheduler(max_concurrency=2, max_queue=4, queue_timeout=5)
+    assert scheduler.try_acquire()
+    assert scheduler.try_acquire()
+    assert not scheduler.try_acquire()
+
+    scheduler.release()
+    waiter = asyncio.ensure_future(scheduler.acquire())
+    await waiter
+    # A queued waiter is never overtaken.
+    blocked = asyncio.ensure_future(scheduler.acquire())
+    await queued(scheduler, 1)
+    assert not scheduler.try_acquire()
+
+    scheduler.release()
+    await blocked
+    scheduler.release()
+    scheduler.release()
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.stats()["avg_slot_seconds"] == 1.0
+
+
+async def test_full_queue_evicts_lower_priority_waiter_for_interactive():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=2, queue_timeout=5)
+    await scheduler.acquire()
+    batch = asyncio.ensure_future(scheduler.acquire(PRIORITY_BATCH))
+    await queued(scheduler, 1)
+    background = asyncio.ensure_future(scheduler.acquire(PRIORITY_BACKGROUND))
+    await queued(scheduler, 2)
+
+    # Room for an interactive request, none for more background work.
+    scheduler.check(PRIORITY_INTERACTIVE)
+    with pytest.raises(AdmissionRejected):
+        scheduler.check(PRIORITY_BACKGROUND)
+
+    interactive = asyncio.ensure_future(scheduler.acquire(PRIORITY_INTERACTIVE))
+    with pytest.raises(AdmissionRejected) as evicted:
+        await background
+    assert evicted.value.status_code == 429
+    assert evicted.value.retry_after >= 1
+    assert scheduler.queue_depth == 2
+
+    # Same priority as the lowest queued: the newcomer is the one rejected.
+    with pytest.raises(AdmissionRejected):
+        await scheduler.acquire(PRIORITY_BATCH)
+
+    scheduler.release(0.0)
+    await asyncio.wait_for(interactive, timeout=1)
+    assert not batch.done()
+    scheduler.release(0.0)
+    await asyncio.wait_for(batch, timeout=1)
+    scheduler.release(0.0)
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from benchmarks.suite import use_fake_redis
+from backend.services.memory_service import MemoryService
+from backend.services.redis_pool import RedisPool
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def memory():
+    pool = RedisPool()
+    saved = (pool._pool, pool._client, pool._async_pool, pool._async_client)
+    use_fake_redis()
+    MemoryService._instance = None
+    memory = MemoryService()
+    memory.legacy_fallback = True
+    yield memory
+    MemoryService._instance = None
+    pool._pool, pool._client, pool._async_pool, pool._async_client = saved
+
+
+def no_legacy_history(session_id):
+    raise AssertionError("built a RedisChatMessageHistory for a session without legacy data")
+
+
+async def test_new_sessions_skip_the_legacy_lookup(memory):
+    # fakeredis has no search module, as a Redis without the old index would not.
+    memory._legacy_history = no_legacy_history
+
+    assert await memory.get_message("new-1") == []
+    assert await memory.get_message("new-2") == []
+    assert memory._legacy_documents is False
+
+
+async def test_empty_legacy_index_is_checked_once(memory):
+    commands = []
+    execute = memory.redis_client.execute_command
+
+    async def execute_command(*args, **options):
+        if not str(args[0]).startswith("FT."):
+            return await execute(*args, **options)
+        commands.append(args[0])
+        return [b"index_name", b"idx:chat_history", b"num_docs", b"0"]
+
+    memory.redis_client.execute_command = execute_command
+    memory._legacy_history = no_legacy_history
+
+    for session_id in ("a", "b", "c"):
+        assert await memory.get_message(session_id) == []
+    assert commands == ["FT.INFO"]
+
+
+async def test_legacy_answers_are_migrated_as_ai_messages(memory):
+    cleared = []
+    history = SimpleNamespace(
+        messages=[HumanMessage(content="What is Redis?"), SystemMessage(content="A store.")],
+        clear=lambda: cleared.append(True),
+    )
+
+    async def has_legacy(session_id):
+        return True
+
+    memory._has_legacy = has_legacy
+    memory._legacy_history = lambda session_id: history
+
+    messages = await memory.get_message("old")
+    assert [type(m) for m in messages] == [HumanMessage, AIMessage]
+    assert cleared == [True]
+
+    # Stored in the list layout, so the next read no longer needs the old keys.
+    memory._has_legacy = None
+    stored = await memory.get_message("old")
+    assert [(type(m), m.content) for m in stored] == [
+        (HumanMessage, "What is Redis?"),
+        (AIMessage, "A store."),
+    ]
@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.messages.utils import count_tokens_approximately
+
+from benchmarks.suite import use_fake_redis
+from backend.services.memory_service import MemoryService
+from backend.services.redis_pool import RedisPool
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def memory():
+    pool = RedisPool()
+    saved = (pool._pool, pool._client, pool._async_pool, pool._async_client)
+    use_fake_redis()
+    MemoryService._instance = None
+    memory = MemoryService()
+    memory.mode = "bounded"
+    memory.max_turns = 2
+    memory.summary_batch_turns = 1
+    memory.max_messages = 0
+    yield memory
+    MemoryService._instance = None
+    pool._pool, pool._client, pool._async_pool, pool._async_client = saved
+
+
+async def add_turns(memory: MemoryService, count: int) -> None:
+    for i in range(count):
+        await memory.add_turn("s", f"q{i}", f"a{i}")
+
+
+async def test_fold_trims_what_it_summarized(memory):
+    await add_turns(memory, 5)
+    folded = []
+
+    async def summarize(summary, messages):
+        folded.extend(m.content for m in messages)
+        return "summary of q0-q2"
+
+    memory._summarize = summarize
+    await memory.summarize_if_needed("s")
+
+    assert folded == ["q0", "a0", "q1", "a1", "q2", "a2"]
+    history = await memory.get_history("s")
+    assert [m.content for m in history[1:]] == ["q3", "a3", "q4", "a4"]
+    assert "summary of q0-q2" in history[0].content
+
+
+async def test_fold_is_discarded_when_its_lock_was_lost(memory):
+    await add_turns(memory, 5)
+    client = memory.redis_client
+
+    async def summarize(summary, messages):
+        # The lock expires mid-generation and another worker folds first.
+        await client.set(memory._lock_key("s"), "other-worker")
+        await client.ltrim(memory._key("s"), 6, -1)
+        await client.set(memory._summary_key("s"), "their summary")
+        await memory.add_turn("s", "q5", "a5")
+        return "stale summary"
+
+    memory._summarize = summarize
+    await memory.summarize_if_needed("s")
+
+    history = await memory.get_history("s")
+    assert history[0].content.endswith("their summary")
+    assert [m.content for m in history[1:]] == ["q3", "a3", "q4", "a4", "q5", "a5"]
+    # Someone else's lock is left alone.
+    assert await client.get(memory._lock_key("s")) == b"other-worker"
+
+
+async def test_long_summary_is_capped_and_leaves_room_for_turns(memory):
+    memory.max_tokens = 200
+    memory.summary_max_tokens = 100
+    await add_turns(memory, 2)
+    await memory.redis_client.set(memory._summary_key("s"), "word " * 2000)
+
+    history = await memory.get_history("s")
+    assert count_tokens_approximately(history[:1]) <= 100
+    assert [m.content for m in history[1:]] == ["q0", "a0", "q1", "a1"]
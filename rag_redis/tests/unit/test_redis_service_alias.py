@@ -0,0 +1,81 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from redis.exceptions import ResponseError
+
+from backend.services.redis_service import RedisService
+
+pytestmark = pytest.mark.asyncio
+
+
+class LiveIndex:
+    """Stands in for the index behind the alias; rejects blobs of another dtype."""
+
+    def __init__(self, name: str, dtype: str):
+        self.name = name
+        self.dtype = dtype
+        self.queries = 0
+
+    async def query(self, dtype: str):
+        self.queries += 1
+        if dtype != self.dtype:
+            raise ResponseError("query vector blob size does not match the index")
+        return [{"index": self.name}]
+
+
+def store(name: str, dtype: str) -> SimpleNamespace:
+    return SimpleNamespace(config=SimpleNamespace(index_name=name, vector_datatype=dtype))
+
+
+@pytest.fixture
+def service():
+    # Only the alias-following state; no Redis or embedding model behind it.
+    service = object.__new__(RedisService)
+    service.index_refresh_interval = 3600.0
+    service._index_checked = time.monotonic()
+    service.vector_store = store("docs", "FLOAT32")
+    service.live = LiveIndex("docs", "FLOAT32")
+    service.async_index = service.live
+    service.refreshes = 0
+
+    def refresh_index() -> bool:
+        service.refreshes += 1
+        if service.live.name == service.physical_index_name:
+            return False
+        service.vector_store = store(service.live.name, service.live.dtype)
+        return True
+
+    service.refresh_index = refresh_index
+    return service
+
+
+def build(service: RedisService):
+    return lambda: service.vector_store.config.vector_datatype
+
+
+async def test_query_after_alias_swap_is_rebuilt_for_the_new_index(service):
+    assert await service._aquery(build(service)) == [{"index": "docs"}]
+
+    # A reindex in another process moves the alias to a FLOAT16 index.
+    service.live.name, service.live.dtype = "docs-2", "FLOAT16"
+
+    assert await service._aquery(build(service)) == [{"index": "docs-2"}]
+    assert service.physical_index_name == "docs-2"
+    assert service.refreshes == 1
+
+
+async def test_failure_without_a_swap_is_raised(service):
+    service.vector_store = store("docs", "FLOAT16")
+    with pytest.raises(ResponseError):
+        await service._aquery(build(service))
+    assert service.live.queries == 1
+
+
+async def test_alias_is_checked_once_the_interval_passes(service):
+    service.index_refresh_interval = 0.0
+    service.live.name = "docs-2"
+
+    await service._aquery(build(service))
+    assert service.refreshes == 1
+    assert service.live.queries == 1
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from backend.services.single_flight import SingleFlight
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def single_flight():
+    SingleFlight._instance = None
+    instance = SingleFlight()
+    instance.enabled = True
+    instance.distributed = False
+    yield instance
+    SingleFlight._instance = None
+
+
+async def test_concurrent_callers_share_one_execution(single_flight):
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "answer"
+
+    callers = [
+        asyncio.ensure_future(single_flight.do("key", work)) for _ in range(10)
+    ]
+    await asyncio.sleep(0)
+    assert single_flight.in_flight("key")
+    release.set()
+    results = await asyncio.gather(*callers)
+
+    assert calls == 1
+    assert [result for result, _ in results] == ["answer"] * 10
+    assert sorted(shared for _, shared in results) == [False] + [True] * 9
+    assert not single_flight.in_flight("key")
+    assert single_flight.stats()["coalesced"] == 9
+
+
+async def test_error_is_shared_by_every_caller(single_flight):
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        raise RuntimeError("generation failed")
+
+    callers = [
+        asyncio.ensure_future(single_flight.do("key", work)) for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not single_flight.in_flight("key")
+
+
+async def test_stream_error_reaches_every_subscriber(single_flight):
+    subscribed = asyncio.Event()
+    produced = 0
+
+    async def generate():
+        nonlocal produced
+        produced += 1
+        yield "first "
+        await subscribed.wait()
+        raise RuntimeError("stream failed")
+
+    async def consume():
+        chunks = []
+        try:
+            async for chunk in single_flight.stream("key", generate):
+                chunks.append(chunk)
+        except RuntimeError as e:
+            return chunks, str(e)
+        return chunks, None
+
+    consumers = [asyncio.ensure_future(consume()) for _ in range(3)]
+    for _ in range(10):
+        await asyncio.sleep(0)
+    subscribed.set()
+    results = await asyncio.gather(*consumers)
+
+    assert produced == 1
+    assert results == [(["first "], "stream failed")] * 3
+    assert not single_flight.in_flight("key")
+
+
+async def test_late_stream_subscriber_replays_from_the_start(single_flight):
+    halfway = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def generate():
+        yield "a"
+        yield "b"
+        halfway.set()
+        await finish.wait()
+        yield "c"
+
+    async def consume():
+        return [chunk async for chunk in single_flight.stream("key", generate)]
+
+    early = asyncio.ensure_future(consume())
+    await halfway.wait()
+    late = asyncio.ensure_future(consume())
+    await asyncio.sleep(0)
+    finish.set()
+
+    assert await early == ["a", "b", "c"]
+    assert await late == ["a", "b", "c"]